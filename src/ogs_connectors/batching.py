@@ -0,0 +1,35 @@
+from collections.abc import Sequence
+from itertools import islice
+from typing import Iterable, Iterator, List, Any
+
+
+def iter_batches(iterable: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    Given an iterable, yield lists of at most batch_size consecutive items, without materializing the iterable
+    @param iterable: iterable to split in batches
+    @param batch_size: int, maximum number of items per batch
+    @return: iterator of lists
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size must be a positive integer, got: %s' % batch_size)
+
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_records(items: Iterable[Any]) -> Iterator[Any]:
+    """
+    Given streamed data, yield its records one by one. Streamed data (e.g. the output of a streaming connector) is an
+    iterable of records or of record batches (lists, or other sequences of records), batches being flattened.
+    @param items: iterable of records or of sequences of records
+    @return: iterator of records
+    """
+    for item in items:
+        if isinstance(item, Sequence):
+            yield from item
+        else:
+            yield item
@@ -56,7 +56,7 @@ FROM_NODES_HELP = """A list of node names which should be used as a starting poi
 TO_NODES_HELP = """A list of node names which should be used as an end point."""
 NODE_ARG_HELP = """Run only nodes with specified names."""
 RUNNER_ARG_HELP = """Specify a runner that you want to run the pipeline with.
-Available runners: `SequentialRunner`, `ParallelRunner` and `ThreadRunner`.
+Available runners: `SequentialRunner`, `ParallelRunner`, `ThreadRunner` and `HybridRunner`.
 This option cannot be used together with --parallel."""
 PARALLEL_ARG_HELP = """Run the pipeline using the `ParallelRunner`.
 If not specified, use the `SequentialRunner`. This flag cannot be used together
@@ -221,7 +221,8 @@ def run(
     runner = runner or "SequentialRunner"
     if parallel:
         runner = "ParallelRunner"
-    runner_class = load_obj(runner, "kedro.runner")
+    # Runner names resolve to the project runners (see runner.py)
+    runner_class = load_obj(runner, "ogs_connectors.runner")
 
     tag = _get_values_as_tuple(tag) if tag else tag
     node_names = _get_values_as_tuple(node_names) if node_names else node_names
@@ -0,0 +1,27 @@
+from typing import Dict, Any
+
+from kedro.io.core import AbstractDataSet, DataSetError
+
+
+class CredentialsDataSet(AbstractDataSet):
+    """Read only dataset loading its credentials, so that nodes get credentials as an input (e.g. mongodb
+    credentials) instead of reading them from the kedro session, which is not available in ParallelRunner workers.
+    """
+
+    def __init__(self, credentials: Dict[str, Any] = None):
+        """Creates a new instance of CredentialsDataSet.
+
+        Args:
+            credentials: Credentials, as declared in the credentials configuration.
+        """
+        self._credentials = credentials or {}
+
+    def _describe(self) -> Dict[str, Any]:
+        """Returns a dict that describes the attributes of the dataset, credentials excluded."""
+        return dict(keys=sorted(self._credentials))
+
+    def _load(self) -> Dict[str, Any]:
+        return dict(self._credentials)
+
+    def _save(self, data: Any) -> None:
+        raise DataSetError('CredentialsDataSet is read only')
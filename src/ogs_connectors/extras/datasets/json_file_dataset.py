@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from pathlib import PurePosixPath
 
@@ -16,18 +16,24 @@ import json
 class JSONFileDataSet(AbstractVersionedDataSet):
     _version = False
 
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, credentials: Optional[Dict[str, Any]] = None):
         """Creates a new instance of JsonFileDataSet.
         Simple json file
 
         Args:
             filepath: The location of the json file to load / save data.
+            credentials: Credentials passed to the underlying filesystem (e.g. s3 key and secret).
         """
         # parse the path and protocol (e.g. file, http, s3, etc.)
+        super().__init__(filepath, None)
         protocol, path = get_protocol_and_path(filepath)
         self._protocol = protocol
         self._filepath = PurePosixPath(path)
-        self._fs = fsspec.filesystem(self._protocol)
+        fs_args = dict(credentials or {})
+        if protocol == 'file':
+            # Partitions are saved in directories that may not exist yet (e.g. gcp/year=1990/)
+            fs_args.setdefault('auto_mkdir', True)
+        self._fs = fsspec.filesystem(self._protocol, **fs_args)
 
     def _describe(self) -> Dict[str, Any]:
         """Returns a dict that describes the attributes of the dataset."""
@@ -48,5 +54,5 @@ class JSONFileDataSet(AbstractVersionedDataSet):
         """Saves dict to json to the specified filepath."""
         # using get_filepath_str ensures that the protocol and path are appended correctly for different filesystems
         save_path = get_filepath_str(self._get_save_path(), self._protocol)
-        with self._fs.open(save_path, "wb") as f:
-            json.dump(data, save_path)
+        with self._fs.open(save_path, "w", encoding="utf8") as f:
+            json.dump(data, f)
@@ -1,6 +1,14 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Union, Callable, Tuple
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import PurePosixPath
+import logging
+import math
+import mmap
+import multiprocessing
+import os
 
 from kedro.io.core import (
     AbstractVersionedDataSet,
@@ -8,51 +16,272 @@ from kedro.io.core import (
     get_protocol_and_path, Version,
 )
 
+from ogs_connectors.batching import iter_batches, iter_records
+
 import fsspec
+from fsspec.compression import compr
 import numpy as np
 import json
 
+try:
+    import orjson
+except ImportError:  # optional, faster (de)serialization of the lines
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 10000
+DEFAULT_BLOCK_SIZE = 2 ** 22
+DEFAULT_RANGE_SIZE = 2 ** 26
+
+# Compression inferred from the file extension, as named by fsspec (zstd requires the zstandard package)
+COMPRESSION_EXTENSIONS = {
+    'gz': 'gzip',
+    'bz2': 'bz2',
+    'xz': 'lzma',
+    'zst': 'zstd',
+}
+
+
+def orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj).encode('utf8')
+
+
+def json_backend(name: str = 'auto') -> Tuple[Callable[[bytes], Any], Callable[[Any], bytes]]:
+    """
+    Given a json backend name, return its functions parsing and serializing one line. Module level functions are
+    returned, so that datasets stay picklable (e.g. by the ParallelRunner).
+    @param name: str, 'orjson', 'json', or 'auto' (orjson if installed, json otherwise)
+    @return: tuple, (loads taking bytes, dumps returning bytes)
+    """
+    if name == 'auto':
+        name = 'json' if orjson is None else 'orjson'
+
+    if name == 'orjson':
+        if orjson is None:
+            raise ValueError('json backend orjson is not installed')
+        return orjson.loads, orjson_dumps
+    if name == 'json':
+        return json.loads, json_dumps
+    raise ValueError('Unknown json backend: %s' % name)
+
+
+def infer_compression(path: str) -> Optional[str]:
+    """
+    @param path: str, file path
+    @return: str, compression of the file according to its extension, None if not compressed
+    """
+    return COMPRESSION_EXTENSIONS.get(PurePosixPath(path).suffix.lstrip('.'))
+
+
+def _parse_lines(lines: Iterable[bytes], loads: Callable[[bytes], Any]) -> List[dict]:
+    return [loads(line) for line in lines if line.strip()]
+
+
+def _line_start(mm: mmap.mmap, offset: int) -> int:
+    """
+    @return: int, position of the first line starting at or after offset
+    """
+    if offset <= 0:
+        return 0
+    end_of_line = mm.find(b'\n', offset - 1)
+    return len(mm) if end_of_line == -1 else end_of_line + 1
+
+
+def parse_context() -> multiprocessing.context.BaseContext:
+    """
+    @return: multiprocessing context of the parsing pools. Workers are not forked from the loading process, which may
+    run other threads (e.g. the partition writers of mongodb_write): forking them could deadlock on their locks.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _parse_local_range(path: str, offset: int, length: int, backend: str) -> List[dict]:
+    """
+    Given a local file and a byte range, parse the lines starting in the range. The file is memory-mapped,
+    so that lines are parsed from the page cache without reading the file into a buffer.
+    @param path: str, local file path
+    @param offset: int, range start
+    @param length: int, range length
+    @param backend: str, json backend (see json_backend)
+    @return: list of dicts, lines objects
+    """
+    loads, _ = json_backend(backend)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start, end = _line_start(mm, offset), _line_start(mm, offset + length)
+        lines = []
+        while start < end:
+            end_of_line = mm.find(b'\n', start, end)
+            if end_of_line == -1:
+                end_of_line = end
+            lines.append(mm[start:end_of_line])
+            start = end_of_line + 1
+    return _parse_lines(lines, loads)
+
+
+def _parse_remote_range(protocol: str, credentials: Dict[str, Any], path: str, offset: int, length: int,
+                        backend: str) -> List[dict]:
+    """
+    Given a file and a byte range, parse the lines of the range, read with a fsspec ranged read aligned on newlines
+    @param protocol: str, fsspec protocol
+    @param credentials: dict, filesystem credentials
+    @param path: str, file path
+    @param offset: int, range start
+    @param length: int, range length
+    @param backend: str, json backend (see json_backend)
+    @return: list of dicts, lines objects
+    """
+    loads, _ = json_backend(backend)
+    fs = fsspec.filesystem(protocol, **credentials)
+    return _parse_lines(fs.read_block(path, offset, length, delimiter=b'\n').split(b'\n'), loads)
+
 
 class JSONLinesDataSet(AbstractVersionedDataSet):
     _version = False
 
-    def __init__(self, filepath: str, version: Optional[Version] = 0, credentials: Dict[str, Any] = None):
+    def __init__(self, filepath: str, version: Optional[Version] = 0, credentials: Dict[str, Any] = None,
+                 load_args: Dict[str, Any] = None, save_args: Dict[str, Any] = None,
+                 compression: Optional[str] = 'infer', backend: str = 'auto'):
         """Creates a new instance of JSONLinesDataSet.
         Each line of the file is a json object
 
         Args:
             filepath: The location of the image file to load / save data.
+            credentials: Credentials passed to the underlying filesystem (e.g. s3 key and secret).
+            load_args: Load options. ``lazy``: if true, load returns an iterator over the lines objects,
+                reading the file as it is consumed, instead of a list. ``block_size``: number of bytes read at once.
+                ``workers``: if more than 1 (null for the number of cpus), an uncompressed file is split in byte
+                ranges of ``range_size`` bytes, aligned on newlines, which are parsed by a pool of processes (at most
+                one per range, started by a forkserver) and put back together in order. Local files are
+                memory-mapped, other ones read with ranged reads.
+            save_args: Save options. ``buffer_size``: number of lines serialized before each write.
+            compression: Compression of the file (gzip, zstd, ...), inferred from the file extension by default
+                (e.g. data.json.gz). None for an uncompressed file.
+            backend: JSON backend, ``orjson`` or ``json``. By default orjson is used if installed.
+                Note that orjson writes NaN values as null.
         """
         # parse the path and protocol (e.g. file, http, s3, etc.)
         super().__init__(filepath, version)
         protocol, path = get_protocol_and_path(filepath)
         self._protocol = protocol
         self._filepath = PurePosixPath(path)
-        self._fs = fsspec.filesystem(self._protocol, **credentials)
+        self._credentials = credentials or {}
+        fs_args = dict(self._credentials)
+        if protocol == 'file':
+            # Partitions are saved in directories that may not exist yet (e.g. gcp/year=1990/)
+            fs_args.setdefault('auto_mkdir', True)
+        self._fs = fsspec.filesystem(self._protocol, **fs_args)
+        self._load_args = load_args or {}
+        self._save_args = save_args or {}
+
+        self._compression = infer_compression(path) if compression == 'infer' else compression
+        if self._compression is not None and self._compression not in compr:
+            raise ValueError('Compression %s is not available, its library may not be installed'
+                             % self._compression)
+        self._backend = backend
+        self._loads, self._dumps = json_backend(backend)
 
     def _describe(self) -> Dict[str, Any]:
         """Returns a dict that describes the attributes of the dataset."""
-        return dict(filepath=self._filepath, protocol=self._protocol)
+        return dict(filepath=self._filepath, protocol=self._protocol, load_args=self._load_args,
+                    save_args=self._save_args, compression=self._compression)
+
+    @contextmanager
+    def _open(self, path: str, mode: str):
+        """Opens the file in binary mode, (de)compressing it if needed."""
+        with self._fs.open(path, mode) as f:
+            if self._compression is None:
+                yield f
+            else:
+                with compr[self._compression](f, mode=mode[0]) as compressed_f:
+                    yield compressed_f
+
+    def _iter_lines(self, load_path: str) -> Iterator[dict]:
+        # Blocks of bytes are read and split in lines, the last (partial) line being carried to the next block
+        block_size = self._load_args.get('block_size', DEFAULT_BLOCK_SIZE)
+        loads = self._loads
+        with self._open(load_path, 'rb') as f:
+            remainder = b''
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                lines = (remainder + block).split(b'\n')
+                remainder = lines.pop()
+                for line in lines:
+                    if line.strip():
+                        yield loads(line)
+            if remainder.strip():
+                yield loads(remainder)
+
+    def _parse_workers(self, load_path: str) -> int:
+        """Returns the number of processes parsing the file, 1 if it is parsed sequentially. There are no more
+        processes than byte ranges: a file of a single range is parsed sequentially, without starting a pool."""
+        workers = self._load_args.get('workers', 1)
+        if workers is None:
+            workers = os.cpu_count()
+        if workers <= 1:
+            return 1
+        if self._compression is not None:
+            logger.warning('%s is compressed, its lines are parsed sequentially', load_path)
+            return 1
+        range_size = self._load_args.get('range_size', DEFAULT_RANGE_SIZE)
+        return max(1, min(workers, math.ceil(self._fs.size(load_path) / range_size)))
 
-    def _load(self) -> List[dict]:
+    def _iter_ranges(self, load_path: str, workers: int) -> Iterator[dict]:
+        # Byte ranges are parsed by the pool, at most 2 ranges per worker being parsed or held ahead of consumption
+        range_size = self._load_args.get('range_size', DEFAULT_RANGE_SIZE)
+        size = self._fs.size(load_path)
+        if self._protocol == 'file':
+            parse_range, args = _parse_local_range, (load_path,)
+        else:
+            parse_range, args = _parse_remote_range, (self._protocol, self._credentials, load_path)
+
+        ranges = iter(range(0, size, range_size))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=parse_context()) as executor:
+            pending = deque()
+            for offset in ranges:
+                pending.append(executor.submit(parse_range, *args, offset, range_size, self._backend))
+                if len(pending) >= 2 * workers:
+                    break
+            while pending:
+                yield from pending.popleft().result()
+                offset = next(ranges, None)
+                if offset is not None:
+                    pending.append(executor.submit(parse_range, *args, offset, range_size, self._backend))
+
+    def _load(self) -> Union[List[dict], Iterator[dict]]:
         """Loads list of dict from the file.
 
         Returns:
-            Data from the file as a list of dicts
+            Data from the file as a list of dicts, or as an iterator of dicts in lazy mode
         """
         # using get_filepath_str ensures that the protocol and path are appended correctly for different filesystems
         load_path = get_filepath_str(self._get_load_path(), self._protocol)
-        data = []
-        with self._fs.open(load_path) as f:
-            for line in f:
-                data.append(json.loads(line))
-        return data
-
-    def _save(self, data: List[dict]) -> None:
-        """Saves list of dicts to the specified filepath."""
+        workers = self._parse_workers(load_path)
+        lines = self._iter_lines(load_path) if workers == 1 else self._iter_ranges(load_path, workers)
+        if self._load_args.get('lazy', False):
+            return lines
+        return list(lines)
+
+    def _save(self, data: Iterable[Union[dict, List[dict]]]) -> None:
+        """Saves dicts to the specified filepath.
+        Data can be a list of dicts, or streamed data: any iterable of dicts or of lists of dicts (batches),
+        consumed as it is written. Lines are serialized and written by buffers of buffer_size lines."""
+        if callable(data):
+            # Lazy partition, see partitioning_node.partition_function_constructor
+            data = data()
         # using get_filepath_str ensures that the protocol and path are appended correctly for different filesystems
         save_path = get_filepath_str(self._get_save_path(), self._protocol)
+        buffer_size = self._save_args.get('buffer_size', DEFAULT_BUFFER_SIZE)
+        dumps = self._dumps
 
-        with self._fs.open(save_path, "w", encoding="utf8") as f:
-            for sample in data:
-                f.write(json.dumps(sample) + "\n")
+        with self._open(save_path, "wb") as f:
+            for samples in iter_batches(iter_records(data), buffer_size):
+                f.write(b''.join([dumps(sample) + b'\n' for sample in samples]))
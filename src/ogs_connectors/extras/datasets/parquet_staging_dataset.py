@@ -0,0 +1,228 @@
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, Union
+
+import os
+import tempfile
+from pathlib import PurePosixPath
+
+from kedro.io.core import (
+    AbstractVersionedDataSet,
+    get_protocol_and_path, Version,
+)
+
+from ogs_connectors.batching import iter_batches, iter_records
+from ogs_connectors.pipelines.staging_table import StagingColumns, PATH_SEPARATOR
+
+import fsspec
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_ROW_GROUP_SIZE = 100000
+DEFAULT_BATCH_SIZE = 10000
+
+# pyarrow filters operators, as expressions on a column
+FILTER_OPERATORS = {
+    '=': lambda column, value: column == value,
+    '==': lambda column, value: column == value,
+    '!=': lambda column, value: column != value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    'in': lambda column, value: column.isin(value),
+    'not in': lambda column, value: ~column.isin(value),
+}
+
+
+def to_filters(filters: Optional[List]) -> Optional[List]:
+    """
+    Given filters as read from the catalog (lists), return pyarrow filters (DNF of tuples)
+    @param filters: list of [column, op, value], or list of such lists (OR of ANDs), None if no filter
+    @return: list of tuples, or list of lists of tuples
+    """
+    if not filters:
+        return None
+    if isinstance(filters[0][0], (list, tuple)):
+        return [[tuple(condition) for condition in conjunction] for conjunction in filters]
+    return [tuple(condition) for condition in filters]
+
+
+def to_expression(filters: Optional[List]) -> Optional[ds.Expression]:
+    """
+    Given filters as read from the catalog (see to_filters), return the equivalent dataset expression, used to scan
+    the file batch by batch
+    @param filters: list of [column, op, value], or list of such lists (OR of ANDs), None if no filter
+    @return: pyarrow dataset Expression, None if no filter
+    """
+    filters = to_filters(filters)
+    if filters is None:
+        return None
+
+    conjunctions = filters if isinstance(filters[0], list) else [filters]
+    expression = None
+    for conjunction in conjunctions:
+        conjunction_expression = None
+        for column, operator, value in conjunction:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError('Unknown filter operator: %s (expected one of %s)' % (
+                    operator, list(FILTER_OPERATORS)
+                ))
+            condition = FILTER_OPERATORS[operator](ds.field(column), value)
+            conjunction_expression = condition if conjunction_expression is None else conjunction_expression & condition
+        expression = conjunction_expression if expression is None else expression | conjunction_expression
+    return expression
+
+
+def select_columns(names: List[str], fields: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Given the columns of a staging table and record fields, return the columns of the fields
+    @param names: list of str, column names (leaf paths)
+    @param fields: list of str, leaf paths or sub record paths (e.g. emission.sector), None for all columns
+    @return: list of str, column names
+    """
+    if fields is None:
+        return None
+    return [
+        name for name in names
+        if any(name == field or name.startswith(field + PATH_SEPARATOR) for field in fields)
+    ]
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """
+    Given a row group and the file schema, return the row group with the columns and types of the schema
+    @param table: pyarrow Table, row group, its columns are a subset of the schema fields
+    @param schema: pyarrow Schema, unified schema of the row groups
+    @return: pyarrow Table
+    """
+    columns = [
+        table.column(field.name).cast(field.type) if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class ParquetStagingDataSet(AbstractVersionedDataSet):
+    _version = False
+
+    def __init__(self, filepath: str, version: Optional[Version] = 0, credentials: Dict[str, Any] = None,
+                 load_args: Dict[str, Any] = None, save_args: Dict[str, Any] = None):
+        """Creates a new instance of ParquetStagingDataSet.
+        Staging records stored in a Parquet file, flattened in one column per leaf (e.g. emission.gas,
+        geo_component.identifier.id). Column types are inferred from the records, and unified across row groups.
+
+        Args:
+            filepath: The location of the Parquet file to load / save data.
+            credentials: Credentials passed to the underlying filesystem (e.g. s3 key and secret).
+            load_args: Load options. ``columns``: record fields to read, leaves or sub records (e.g.
+                [date, emission]), all by default. ``filters``: pyarrow filters on the columns, pushed down to the
+                row groups, e.g. [[emission.gas, in, [CO2]], [date, '>=', '2000-01-01']]. ``lazy``: if true, load
+                returns an iterator of StagingColumns batches of ``batch_size`` records instead of a list of records.
+            save_args: Save options. ``row_group_size``: number of records per row group, also the number of
+                records held in memory while saving. ``compression``: Parquet compression codec (snappy by default).
+        """
+        # parse the path and protocol (e.g. file, http, s3, etc.)
+        super().__init__(filepath, version)
+        protocol, path = get_protocol_and_path(filepath)
+        self._protocol = protocol
+        self._filepath = PurePosixPath(path)
+        fs_args = dict(credentials or {})
+        if protocol == 'file':
+            # Partitions are saved in directories that may not exist yet (e.g. gcp/year=1990/)
+            fs_args.setdefault('auto_mkdir', True)
+        self._fs = fsspec.filesystem(self._protocol, **fs_args)
+        self._load_args = load_args or {}
+        self._save_args = save_args or {}
+
+    def _describe(self) -> Dict[str, Any]:
+        """Returns a dict that describes the attributes of the dataset."""
+        return dict(filepath=self._filepath, protocol=self._protocol, load_args=self._load_args,
+                    save_args=self._save_args)
+
+    def _read_table(self, load_path: str) -> pa.Table:
+        with self._fs.open(load_path, 'rb') as f:
+            names = pq.ParquetFile(f).schema_arrow.names
+
+        return pq.read_table(
+            load_path,
+            columns=select_columns(names, self._load_args.get('columns')),
+            filters=to_filters(self._load_args.get('filters')),
+            filesystem=self._fs
+        )
+
+    def _iter_batches(self, load_path: str) -> Iterator[StagingColumns]:
+        """
+        Scan the file row group by row group, in batches of at most batch_size records: only the selected columns of
+        the current batch are held in memory, and row groups whose statistics do not match the filters are skipped
+        """
+        dataset = ds.dataset(load_path, format='parquet', filesystem=self._fs)
+        for batch in dataset.to_batches(
+            columns=select_columns(dataset.schema.names, self._load_args.get('columns')),
+            filter=to_expression(self._load_args.get('filters')),
+            batch_size=self._load_args.get('batch_size', DEFAULT_BATCH_SIZE)
+        ):
+            if batch.num_rows:
+                yield StagingColumns(batch.to_pydict())
+
+    def _load(self) -> Union[List[dict], Iterator[StagingColumns]]:
+        """Loads the staging records from the Parquet file.
+
+        Returns:
+            Records as a list of dicts, or as an iterator of StagingColumns batches in lazy mode
+        """
+        load_path = str(self._get_load_path())
+        if self._load_args.get('lazy', False):
+            return self._iter_batches(load_path)
+        return StagingColumns(self._read_table(load_path).to_pydict()).records()
+
+    def _spill_row_groups(self, data: Iterable[Union[dict, List[dict]]],
+                          spill_dir: str) -> Tuple[List[str], Optional[pa.Schema]]:
+        """
+        Given records, write them by row groups to local Arrow files, each with the types inferred from its records
+        @param data: iterable of dicts, or of batches of dicts
+        @param spill_dir: str, local directory of the row group files
+        @return: list of str, paths of the row group files, and the schema unifying theirs (None without records)
+        """
+        row_group_size = self._save_args.get('row_group_size', DEFAULT_ROW_GROUP_SIZE)
+        paths = []
+        schemas = []
+        for records in iter_batches(iter_records(data), row_group_size):
+            table = pa.Table.from_pydict(StagingColumns.from_records(records).columns)
+            path = os.path.join(spill_dir, '%s.arrow' % len(paths))
+            with pa.OSFile(path, 'wb') as sink:
+                writer = pa.ipc.new_file(sink, table.schema)
+                writer.write_table(table)
+                writer.close()
+            paths.append(path)
+            schemas.append(table.schema)
+
+        try:
+            return paths, pa.unify_schemas(schemas) if schemas else None
+        except pa.ArrowInvalid as e:
+            raise ValueError('Row groups of %s have conflicting column types: %s' % (self._filepath, e)) from e
+
+    def _save(self, data: Iterable[Union[dict, List[dict]]]) -> None:
+        """Saves staging records to the specified filepath, one row group at a time.
+        Data can be a list of dicts, or streamed data: any iterable of dicts or of batches of dicts. Row groups are
+        first spilled to a local temporary directory, so that the file schema covers the fields of every row group
+        (e.g. fields missing or null in the first ones)."""
+        if callable(data):
+            # Lazy partition, see partitioning_node.partition_function_constructor
+            data = data()
+        save_path = str(self._get_save_path())
+
+        with tempfile.TemporaryDirectory() as spill_dir:
+            paths, schema = self._spill_row_groups(data, spill_dir)
+            with self._fs.open(save_path, 'wb') as f:
+                if schema is None:
+                    pq.write_table(pa.table({}), f)
+                    return
+
+                writer = pq.ParquetWriter(f, schema, compression=self._save_args.get('compression', 'snappy'))
+                try:
+                    for path in paths:
+                        with pa.memory_map(path) as source:
+                            writer.write_table(conform_table(pa.ipc.open_file(source).read_all(), schema))
+                finally:
+                    writer.close()
@@ -27,13 +27,44 @@
 # limitations under the License.
 
 """Project hooks."""
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
+from pathlib import Path
+import hashlib
+import logging
+import os
+import pickle
+import threading
 
 from kedro.config import ConfigLoader
 from kedro.framework.hooks import hook_impl
-from kedro.io import DataCatalog
+from kedro.io import AbstractDataSet, DataCatalog, MemoryDataSet, PartitionedDataSet
+from kedro.io.core import AbstractVersionedDataSet, get_filepath_str
+from kedro.pipeline.node import Node
 from kedro.versioning import Journal
 
+logger = logging.getLogger(__name__)
+
+# Local cache of the memoized nodes outputs, see NodeMemoizationHooks
+MEMOIZATION_CACHE_DIR = 'data/memoization'
+
+# Tag of the nodes with external side effects (e.g. mongodb writes), never skipped by NodeMemoizationHooks
+SIDE_EFFECT_TAG = 'side_effect'
+
+
+def data_fingerprint(data: Any) -> Optional[str]:
+    """
+    Given node input data, return a hash of its content, None if it can not be hashed (e.g. generators, partition
+    loaders)
+    @param data: any, node input
+    @return: str, hex digest
+    """
+    if isinstance(data, dict) and any(callable(value) for value in data.values()):
+        return None
+    try:
+        return hashlib.sha1(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+
 
 class ProjectHooks:
     @hook_impl
@@ -54,3 +85,245 @@ class ProjectHooks:
         return DataCatalog.from_config(
             catalog, credentials, load_versions, save_version, journal
         )
+
+
+class InputMutationGuardHooks:
+    """
+    Check that nodes do not mutate their inputs: intermediate datasets are not copied between nodes (see runner.py),
+    so a mutation would leak into the other nodes reading the same dataset. Inputs are hashed before and after each
+    node run, which is costly on large inputs: enable it in settings.py while developing a pipeline.
+    """
+
+    def __init__(self):
+        self._fingerprints = {}
+
+    @hook_impl
+    def before_node_run(self, node: Node, inputs: Dict[str, Any]) -> None:
+        self._fingerprints[node.name] = {name: data_fingerprint(data) for name, data in inputs.items()}
+
+    @hook_impl
+    def after_node_run(self, node: Node, inputs: Dict[str, Any]) -> None:
+        fingerprints = self._fingerprints.pop(node.name, {})
+        mutated = [
+            name for name, data in inputs.items()
+            if fingerprints.get(name) is not None and data_fingerprint(data) != fingerprints[name]
+        ]
+        if mutated:
+            raise RuntimeError('Node %s mutated its inputs: %s' % (node.name, mutated))
+
+
+def package_source_fingerprint() -> str:
+    """
+    @return: str, hex digest of the source files of the project package, so that any code change invalidates the
+    memoized nodes (a node function calls code from other modules, e.g. records.py for the connectors)
+    """
+    package_path = Path(__file__).parent
+    digest = hashlib.sha1()
+    for path in sorted(package_path.rglob('*.py')):
+        digest.update(str(path.relative_to(package_path)).encode('utf8'))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def file_stamp(info: Dict[str, Any]) -> str:
+    """
+    @param info: dict, file info of an fsspec filesystem
+    @return: str, ETag (s3) or modification time, and size of the file
+    """
+    modified = info.get('ETag') or info.get('mtime') or info.get('LastModified') or info.get('created')
+    return '%s:%s' % (modified, info.get('size'))
+
+
+def data_set_stamp(data_set: AbstractDataSet) -> Optional[str]:
+    """
+    Given a persisted dataset, return a stamp of its files computed from their metadata, without loading them
+    @param data_set: kedro dataset, partitioned dataset or file dataset exposing its fsspec filesystem (as kedro
+    datasets do)
+    @return: str, None if the dataset files are not known or do not exist
+    """
+    try:
+        if isinstance(data_set, PartitionedDataSet):
+            files = data_set._filesystem.find(data_set._normalized_path, detail=True)
+            stamps = ['%s=%s' % (path, file_stamp(info)) for path, info in sorted(files.items())]
+            return hashlib.sha1('\n'.join(stamps).encode('utf8')).hexdigest()
+
+        fs = getattr(data_set, '_fs', None)
+        filepath = getattr(data_set, '_filepath', None)
+        if fs is None or filepath is None:
+            return None
+        if isinstance(data_set, AbstractVersionedDataSet):
+            filepath = data_set._get_load_path()
+        return file_stamp(fs.info(get_filepath_str(filepath, getattr(data_set, '_protocol', 'file'))))
+    except (FileNotFoundError, AttributeError):
+        return None
+
+
+def partitions_exist(data_set: PartitionedDataSet, partitions: List[str]) -> bool:
+    """
+    @param data_set: PartitionedDataSet
+    @param partitions: list of str, partition ids
+    @return: bool, whether every partition is saved in the dataset
+    """
+    data_set._invalidate_caches()  # pylint: disable=protected-access
+    saved_partitions = {
+        data_set._path_to_partition(path)  # pylint: disable=protected-access
+        for path in data_set._list_partitions()  # pylint: disable=protected-access
+    }
+    return set(partitions) <= saved_partitions
+
+
+def node_fingerprint(node: Node, catalog: DataCatalog, inputs: Dict[str, Any], source_fingerprint: str) \
+        -> Optional[str]:
+    """
+    Given a node and its loaded inputs, return a hash of the node function (its state and the package source), of the
+    persisted inputs files metadata and of the other inputs values (parameters, memory datasets)
+    @param node: kedro Node
+    @param catalog: DataCatalog
+    @param inputs: dict, dataset name -> loaded data
+    @param source_fingerprint: str, see package_source_fingerprint
+    @return: str, hex digest, None if an input or the function can not be hashed (e.g. generators)
+    """
+    fingerprints = [source_fingerprint, data_fingerprint(node.func)]
+    for name in sorted(inputs):
+        data_set = catalog._data_sets.get(name)  # pylint: disable=protected-access
+        stamp = None
+        if data_set is not None and not isinstance(data_set, MemoryDataSet):
+            stamp = data_set_stamp(data_set)
+        fingerprints.append(stamp or data_fingerprint(inputs[name]))
+
+    if None in fingerprints:
+        return None
+    return hashlib.sha1('\n'.join([node.name] + fingerprints).encode('utf8')).hexdigest()
+
+
+class CachedOutputs:
+    """
+    Node function returning the cached outputs of a memoized node in place of running it
+    """
+
+    def __init__(self, node: Node, outputs: Dict[str, Any]):
+        """
+        @param node: kedro Node
+        @param outputs: dict, dataset name -> cached data
+        """
+        self._outputs = node._outputs  # pylint: disable=protected-access
+        self._data = outputs
+
+    def __call__(self, *args, **kwargs) -> Any:
+        if self._outputs is None:
+            return None
+        if isinstance(self._outputs, str):
+            return self._data[self._outputs]
+        if isinstance(self._outputs, dict):
+            return {key: self._data[name] for key, name in self._outputs.items()}
+        return [self._data[name] for name in self._outputs]
+
+
+class NodeMemoizationHooks:
+    """
+    Skip the nodes whose function and inputs did not change since their last run, their cached outputs being saved
+    instead. Inputs are fingerprinted from their files metadata (ETag on s3, modification time otherwise) and from the
+    values of the parameters and memory datasets; the function from its state and the source of the package.
+    Outputs are cached in cache_dir once saved: partitioned datasets are kept as saved (nothing is saved again, each
+    of their saved partitions must still exist), other outputs are pickled (e.g. quarantine records). Nodes with
+    unpicklable inputs or outputs (e.g. streamed records between unfused nodes), and nodes with external side effects
+    (tagged SIDE_EFFECT_TAG, e.g. mongodb_write), always run. Delete cache_dir to run every node again.
+    """
+
+    def __init__(self, cache_dir: str = MEMOIZATION_CACHE_DIR):
+        """
+        @param cache_dir: str, local directory of the cached outputs
+        """
+        self._cache_dir = Path(cache_dir)
+        self._source_fingerprint = None
+        self._functions = {}
+        self._fingerprints = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _cache_path(self, node_name: str) -> Path:
+        return self._cache_dir / ('%s.pkl' % hashlib.sha1(node_name.encode('utf8')).hexdigest())
+
+    def _load_cache(self, node: Node, fingerprint: str, catalog: DataCatalog) -> Optional[Dict[str, Any]]:
+        """
+        @return: dict, cached outputs of the node if its fingerprint did not change and the partitions it saved exist
+        """
+        try:
+            with open(self._cache_path(node.name), 'rb') as f:
+                cache = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        if cache['fingerprint'] != fingerprint or set(cache['outputs']) != set(node.outputs):
+            return None
+        for name, partitions in cache['partitioned'].items():
+            if not partitions_exist(catalog._data_sets[name], partitions):  # pylint: disable=protected-access
+                return None
+        return cache['outputs']
+
+    def _write_cache(self, node_name: str, fingerprint: str, outputs: Dict[str, Any],
+                     partitioned: Dict[str, List[str]]) -> None:
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cache_path(node_name)
+        with open(str(path) + '.tmp', 'wb') as f:
+            pickle.dump(dict(fingerprint=fingerprint, outputs=outputs, partitioned=partitioned), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(str(path) + '.tmp', path)
+
+    @hook_impl
+    def before_node_run(self, node: Node, catalog: DataCatalog, inputs: Dict[str, Any]) -> None:
+        if self._source_fingerprint is None:
+            self._source_fingerprint = package_source_fingerprint()
+
+        if SIDE_EFFECT_TAG in node.tags:
+            return
+
+        fingerprint = node_fingerprint(node, catalog, inputs, self._source_fingerprint)
+        if fingerprint is None:
+            return
+
+        cached_outputs = self._load_cache(node, fingerprint, catalog)
+        if cached_outputs is None:
+            self._fingerprints[node.name] = fingerprint
+            return
+
+        logger.info('Node %s skipped, inputs unchanged since its last run: cached outputs restored', node.name)
+        self._functions[node.name] = node.func
+        node.func = CachedOutputs(node, cached_outputs)
+
+    @hook_impl
+    def after_node_run(self, node: Node, catalog: DataCatalog, outputs: Dict[str, Any]) -> None:
+        if node.name in self._functions:
+            node.func = self._functions.pop(node.name)
+            return
+
+        fingerprint = self._fingerprints.pop(node.name, None)
+        if fingerprint is None:
+            return
+
+        cached_outputs = {}
+        partitioned = {}
+        for name, data in outputs.items():
+            if isinstance(catalog._data_sets.get(name), PartitionedDataSet):  # pylint: disable=protected-access
+                # Partitions stay in the dataset: restored as no partition to save
+                cached_outputs[name] = {}
+                partitioned[name] = sorted(data)
+            elif data_fingerprint(data) is not None:
+                cached_outputs[name] = data
+            else:
+                return
+
+        # Outputs are only cached once saved: streamed outputs are produced while they are saved
+        with self._lock:
+            for name in outputs:
+                self._pending[name] = (node.name, fingerprint, cached_outputs, partitioned)
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str) -> None:
+        with self._lock:
+            pending = self._pending.pop(dataset_name, None)
+            if pending is None:
+                return
+            node_name, fingerprint, cached_outputs, partitioned = pending
+            if any(self._pending.get(name, (None,))[0] == node_name for name in cached_outputs):
+                return
+        self._write_cache(node_name, fingerprint, cached_outputs, partitioned)
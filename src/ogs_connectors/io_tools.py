@@ -5,12 +5,12 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def get_mongodb_client(mongodb_params: Dict, mongodb_credentials: Dict) -> pymongo.MongoClient:
+def get_mongodb_url(mongodb_params: Dict, mongodb_credentials: Dict) -> str:
     """
-    Instantiate pymongo client given params and credentials by formatting proper url.
+    Format the mongodb connection url given params and credentials.
     @param mongodb_params: dict, params, includes urls and connection params
     @param mongodb_credentials: dict, credentials, includes user and password
-    @return:
+    @return: str, connection url
     """
     # Base url
     full_url = "mongodb://"
@@ -38,5 +38,30 @@ def get_mongodb_client(mongodb_params: Dict, mongodb_credentials: Dict) -> pymon
             params=params
         )
 
+    return full_url
+
+
+def get_mongodb_client(mongodb_params: Dict, mongodb_credentials: Dict) -> pymongo.MongoClient:
+    """
+    Instantiate pymongo client given params and credentials by formatting proper url.
+    @param mongodb_params: dict, params, includes urls and connection params
+    @param mongodb_credentials: dict, credentials, includes user and password
+    @return:
+    """
+    full_url = get_mongodb_url(mongodb_params, mongodb_credentials)
     logger.info('Opening mongo client for url: %s' % full_url)
     return pymongo.MongoClient(full_url)
+
+
+def get_async_mongodb_client(mongodb_params: Dict, mongodb_credentials: Dict):
+    """
+    Instantiate motor (asyncio) client given params and credentials by formatting proper url.
+    @param mongodb_params: dict, params, includes urls and connection params
+    @param mongodb_credentials: dict, credentials, includes user and password
+    @return: motor.motor_asyncio.AsyncIOMotorClient
+    """
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    full_url = get_mongodb_url(mongodb_params, mongodb_credentials)
+    logger.info('Opening async mongo client for url: %s' % full_url)
+    return AsyncIOMotorClient(full_url)
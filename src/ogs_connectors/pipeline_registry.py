@@ -47,12 +47,27 @@ def register_pipelines() -> Dict[str, Pipeline]:
     ademe_pipeline = ademe.create_pipeline()
     gcp_pipeline = gcp.create_pipeline()
     wri_unfccc_pipeline = wri_unfccc.create_pipeline()
+    # Connector, validation and partitioning as separate nodes, with their intermediate datasets, for debugging
+    gcp_unfused_pipeline = gcp.create_pipeline(fused=False)
+    wri_unfccc_unfused_pipeline = wri_unfccc.create_pipeline(fused=False)
     mongodb_write_pipeline = mongodb_write.create_pipeline()
 
+    # Every connector, then mongodb_write once the staging partitions of its sources are saved. Connectors do not
+    # depend on each other: run with `kedro run --pipeline all --parallel` (or --runner HybridRunner, running
+    # mongodb_write in a thread) to run them concurrently, each one in its own process. Not with --async: the
+    # manifests of streamed partitions are filled while the partitions are saved, so that the outputs of a node must be
+    # saved in order.
+    all_pipeline = ademe_pipeline + gcp_pipeline + wri_unfccc_pipeline + mongodb_write.create_pipeline(
+        upstream=['gcp_partitions_manifest', 'wri_unfccc_partitions_manifest']
+    )
+
     return {
         "ademe": ademe_pipeline,
         "gcp": gcp_pipeline,
         "wri_unfccc": wri_unfccc_pipeline,
+        "gcp_unfused": gcp_unfused_pipeline,
+        "wri_unfccc_unfused": wri_unfccc_unfused_pipeline,
         "mongodb_write": mongodb_write_pipeline,
+        "all": all_pipeline,
         "__default__": ademe_pipeline,
     }
@@ -1,2 +1,3 @@
 from .partitioning_node import partitioning_node_constructor
 from .validation_node import schema_validation_node_constructor
+from .connector_spec import create_connector_pipeline, load_connector_spec
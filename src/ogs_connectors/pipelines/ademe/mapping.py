@@ -1,33 +1,28 @@
-import datetime
+from ogs_connectors.pipelines.records import Column, YearDate
 
 
-def row_mapping(row):
-    """
-    Given a pandas Dataframe rows, map to the desired dict format
-    :param row:
-    :return:
-    """
-    return {
-        'data_source:': {
-            'name': 'ademe',
-            'link': 'url'
-        },
-        'geo_component': {
-            'type': 'Country',
-            'iso_code': {
-                'code': 'FRA',
-                'type': 'alpha2'
-            }
-        },
-        'date': datetime.datetime(row['reporting_year'], 1, 1).strftime('%Y-%m-%d'),
-        'emission': {
-            'gas': row['gas'],
-            'value': row['value'],
-            'unit': 'tone',
-            'sector_name': row['scope_label'],
-            'sub_sector_name': row['label']
+# Staging record of a melted emissions row, built column by column, see ogs_connectors.pipelines.records
+record_template = {
+    'data_source:': {
+        'name': 'ademe',
+        'link': 'url'
+    },
+    'geo_component': {
+        'type': 'Country',
+        'iso_code': {
+            'code': 'FRA',
+            'type': 'alpha2'
         }
+    },
+    'date': YearDate('reporting_year'),
+    'emission': {
+        'gas': Column('gas'),
+        'value': Column('value'),
+        'unit': 'tone',
+        'sector_name': Column('scope_label'),
+        'sub_sector_name': Column('label')
     }
+}
 
 
 assessments_cols_mapping = {
@@ -1,6 +1,7 @@
 from kedro.pipeline import node
 import pandas as pd
-from .mapping import row_mapping, assessments_cols_mapping, assessments_cols, scope_items_cols_mapping, scope_items_cols
+from ogs_connectors.pipelines.records import build_records
+from .mapping import record_template, assessments_cols_mapping, assessments_cols, scope_items_cols_mapping, scope_items_cols
 
 pd.set_option('display.max_columns', 500)
 
@@ -64,10 +65,7 @@ def processing(emissions, assessments, scope_items):
         var_name='gas'
     )
 
-    clean_emissions['record'] = clean_emissions.apply(
-        lambda row: row_mapping(row),
-        axis=1
-    )
+    clean_emissions['record'] = build_records(clean_emissions, record_template)
 
     clean_emissions = clean_emissions[:10]
 
@@ -0,0 +1,140 @@
+from .quarantine import quarantine_record, COLUMN_VALIDATION_ERROR
+from pandas.api.types import infer_dtype, is_bool_dtype, is_integer_dtype, is_numeric_dtype
+from typing import Dict, Any, Tuple, List, Optional
+import numbers
+import numpy as np
+import pandas as pd
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def schema_field_checks(schema: dict, path: str = '', required: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Given a jsonschema, return the checks of each of its leaf fields: expected type, and whether the field is
+    required (i.e. required along its whole path). Required fields missing from the properties are only checked for
+    presence (type None).
+    @param schema: dict, jsonschema of an object
+    @param path: str, path of the schema in the root schema, fields separated by dots
+    @param required: bool, whether the schema itself is required
+    @return: dict, field path -> {'type': jsonschema type, 'required': bool}
+    """
+    checks = {}
+    required_fields = set(schema.get('required', []))
+    for field, field_schema in schema.get('properties', {}).items():
+        field_path = '%s.%s' % (path, field) if path else field
+        field_required = required and field in required_fields
+        if field_schema.get('type') == 'object':
+            checks.update(schema_field_checks(field_schema, field_path, field_required))
+        else:
+            checks[field_path] = {'type': field_schema.get('type'), 'required': field_required}
+
+    for field in sorted(required_fields - set(schema.get('properties', {}))):
+        field_path = '%s.%s' % (path, field) if path else field
+        checks[field_path] = {'type': None, 'required': required}
+    return checks
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, numbers.Integral) and not isinstance(value, bool)
+
+
+def type_mask(column: pd.Series, expected_type: str) -> np.ndarray:
+    """
+    Given a column and a jsonschema type, return the mask of the values of that type (missing values excluded).
+    Typed columns are checked at once from their dtype; object columns fall back to a check per value.
+    @param column: pandas Series
+    @param expected_type: str, jsonschema type
+    @return: boolean numpy array
+    """
+    present = column.notna().to_numpy()
+
+    if expected_type == 'string':
+        if infer_dtype(column, skipna=True) in ('string', 'empty'):
+            return present
+        return column.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+
+    if expected_type == 'number':
+        if is_numeric_dtype(column.dtype) and not is_bool_dtype(column.dtype):
+            return present
+        return (column.map(_is_number).to_numpy(dtype=bool)) & present
+
+    if expected_type == 'integer':
+        if is_integer_dtype(column.dtype) and not is_bool_dtype(column.dtype):
+            return present
+        return column.map(_is_integer).to_numpy(dtype=bool)
+
+    if expected_type == 'boolean':
+        if is_bool_dtype(column.dtype):
+            return present
+        return column.map(lambda value: isinstance(value, bool)).to_numpy(dtype=bool)
+
+    # Other types are not checked at the column level
+    return np.ones(len(column), dtype=bool)
+
+
+def validate_columns(df: pd.DataFrame, schema: dict, columns: Dict[str, str]) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Given a dataframe, a jsonschema and the mapping of schema fields to dataframe columns, run the schema
+    type and required checks on whole columns at once
+    @param df: pandas DataFrame, one row per future record
+    @param schema: dict, jsonschema of the records
+    @param columns: dict, schema field path -> dataframe column holding its value
+    @return: tuple, (mask of the valid rows, path of the first failing field for each invalid row)
+    """
+    checks = schema_field_checks(schema)
+    valid = np.ones(len(df), dtype=bool)
+    first_error = pd.Series(None, index=df.index, dtype=object)
+
+    for path, column_name in columns.items():
+        check = checks.get(path)
+        if check is None:
+            continue
+
+        column = df[column_name]
+        field_valid = type_mask(column, check['type'])
+        if check['required']:
+            field_valid = field_valid & column.notna().to_numpy()
+        else:
+            # Missing optional fields are valid
+            field_valid = field_valid | column.isna().to_numpy()
+
+        newly_invalid = valid & ~field_valid
+        first_error[newly_invalid] = path
+        valid &= field_valid
+
+    return valid, first_error[~valid]
+
+
+def column_error_message(path: str, expected_type: Optional[str]) -> str:
+    """
+    @param path: str, path of the failing field
+    @param expected_type: str, jsonschema type of the field, None if only its presence is checked
+    @return: str, error message
+    """
+    if expected_type is None:
+        return '%s is required' % path
+    return '%s is not a valid %s' % (path, expected_type)
+
+
+def filter_valid_rows(df: pd.DataFrame, schema: dict, columns: Dict[str, str]) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Given a dataframe, keep only the rows passing the column level schema checks
+    @param df: pandas DataFrame, one row per future record
+    @param schema: dict, jsonschema of the records
+    @param columns: dict, schema field path -> dataframe column holding its value
+    @return: tuple, (valid rows, quarantine records of the invalid rows)
+    """
+    valid, errors = validate_columns(df, schema, columns)
+    checks = schema_field_checks(schema)
+
+    rejected_rows = [
+        quarantine_record(row, COLUMN_VALIDATION_ERROR, path, column_error_message(path, checks[path]['type']))
+        for row, path in zip(df.loc[~valid].to_dict('records'), errors)
+    ]
+    return df.loc[valid], rejected_rows
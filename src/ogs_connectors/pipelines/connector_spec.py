@@ -0,0 +1,283 @@
+from .columnar_validation import filter_valid_rows
+from .partitioning_node import partitioning_node_constructor, manifest_partition_function_constructor
+from .records import Column, Mapped, YearDate, build_records, build_record_batches
+from .validation_node import schema_validation_node_constructor, validate_batches
+from kedro.pipeline import Pipeline, node
+from pathlib import Path
+from typing import Dict, List, Any, Tuple, Union, Iterator, Optional
+import pandas as pd
+import yaml
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_SPEC_KEYS = ('name', 'input', 'melt', 'record', 'partition_keys')
+
+# Field markers of the record template, in the connector spec
+COLUMN_MARKER = '$column'
+LOOKUP_MARKER = '$lookup'
+YEAR_MARKER = '$year'
+
+
+def load_connector_spec(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Given the path of a connector spec (yaml), load and check it
+    @param path: str or Path, connector spec file
+    @return: dict, connector spec
+    """
+    with open(path, encoding='utf8') as f:
+        spec = yaml.safe_load(f)
+
+    missing_keys = [key for key in REQUIRED_SPEC_KEYS if key not in spec]
+    if missing_keys:
+        raise ValueError('Connector spec %s is missing keys: %s' % (path, missing_keys))
+    return spec
+
+
+def compile_record_template(template: Any, lookups: Dict[str, Dict]) -> Any:
+    """
+    Given the record template of a connector spec, return the records template (see records.build_records):
+    {$column: name} is taken as is from a column, {$column: name, $lookup: table} is mapped through a lookup
+    table, {$year: name} is the first day of the year of a year column. Other leaves are constants.
+    @param template: record template of the spec, or sub template
+    @param lookups: dict, lookup tables of the spec, by name
+    @return: records template
+    """
+    if not isinstance(template, dict):
+        return template
+
+    if YEAR_MARKER in template:
+        return YearDate(template[YEAR_MARKER])
+    if COLUMN_MARKER in template:
+        if LOOKUP_MARKER in template:
+            return Mapped(template[COLUMN_MARKER], lookups[template[LOOKUP_MARKER]])
+        return Column(template[COLUMN_MARKER])
+
+    return {key: compile_record_template(value, lookups) for key, value in template.items()}
+
+
+def template_columns(template: Any, path: str = '') -> Dict[str, str]:
+    """
+    Given a records template, return the record fields taken as is from a column, to be checked at the column level
+    @param template: records template, or sub template
+    @param path: str, path of the sub template, fields separated by dots
+    @return: dict, record field path -> column name
+    """
+    if isinstance(template, dict):
+        columns = {}
+        for key, value in template.items():
+            columns.update(template_columns(value, '%s.%s' % (path, key) if path else key))
+        return columns
+    if type(template) is Column:
+        return {path: template.name}
+    return {}
+
+
+def filter_mask(df: pd.DataFrame, filters: List[Dict[str, Any]]) -> pd.Series:
+    """
+    Given a dataframe and the filters of a connector spec, return the mask of the rows passing all of them.
+    Each filter applies to a column: notna: true, in: [values] or not_in: [values].
+    @param df: pandas DataFrame
+    @param filters: list of dicts, filters
+    @return: boolean pandas Series
+    """
+    mask = pd.Series(True, index=df.index)
+    for row_filter in filters:
+        column = df[row_filter['column']]
+        if row_filter.get('notna'):
+            mask &= column.notna()
+        if 'in' in row_filter:
+            mask &= column.isin(row_filter['in'])
+        if 'not_in' in row_filter:
+            mask &= ~column.isin(row_filter['not_in'])
+    return mask
+
+
+class Connector:
+    """
+    Connector compiled from a connector spec: turns a source dataframe into staging records, column by column
+    (rename, melt, unit conversion, filters, column level schema checks, records construction)
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        @param spec: dict, connector spec
+        """
+        self.name = spec['name']
+        self._rename = spec.get('rename', {})
+        self._melt = spec['melt']
+        self._unit = spec.get('unit', {})
+        self._filters = spec.get('filters', [])
+        self.record_template = compile_record_template(spec['record'], spec.get('lookups', {}))
+        self.staging_columns = template_columns(self.record_template)
+
+    def value_factor(self) -> float:
+        """
+        @return: float, factor converting the source values in the staging unit
+        """
+        if 'divide_by' in self._unit:
+            return 1.0 / self._unit['divide_by']
+        return self._unit.get('multiply_by', 1.0)
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Given the source dataframe, return the filtered one row per emission dataframe
+        @param df: pandas DataFrame, source data
+        @return: pandas DataFrame
+        """
+        df = df.rename(columns=self._rename)
+
+        id_vars = self._melt['id_vars']
+        value_vars = self._melt.get('value_vars')
+        value_name = self._melt.get('value_name', 'value')
+        if value_vars is not None:
+            # Only the melted columns are needed
+            df = df[id_vars + value_vars]
+
+        # Unpivot dataframe so that one row is one emission
+        df = df.melt(
+            id_vars=id_vars,
+            value_vars=value_vars,
+            var_name=self._melt['var_name'],
+            value_name=value_name
+        )
+
+        factor = self.value_factor()
+        if factor != 1.0:
+            df[value_name] = factor * df[value_name]
+
+        if self._filters:
+            df = df.loc[filter_mask(df, self._filters)]
+        return df
+
+    def __call__(self, df: pd.DataFrame, schema: dict,
+                 params: Optional[dict] = None) -> Tuple[Union[List[Dict], Iterator[List[Dict]]], List[Dict]]:
+        """
+        Given the source dataframe and the staging schema, return the staging records
+        @param df: pandas DataFrame, source data
+        @param schema: dict, staging jsonschema, checked at the column level before records are created
+        @param params: dict, optional, streaming params. If enabled, records are lazily built by batches of
+        batch_size records instead of all at once
+        @return: tuple, (records or records batches, quarantine records of the rows failing the schema checks)
+        """
+        params = params or {}
+        df = self.transform(df)
+
+        # Drop rows failing the schema checks
+        df, rejected_rows = filter_valid_rows(df, schema, self.staging_columns)
+
+        if params.get('enabled', False):
+            return build_record_batches(df, self.record_template, params['batch_size']), rejected_rows
+        return build_records(df, self.record_template), rejected_rows
+
+
+class FusedConnector:
+    """
+    Connector, schema validation and partitioning fused in a single node: records are built, validated and
+    partitioned one batch at a time, without going through the catalog between the steps
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        @param spec: dict, connector spec
+        """
+        self.connector = Connector(spec)
+        self._partition = manifest_partition_function_constructor(spec['partition_keys'])
+
+    def __call__(self, df: pd.DataFrame, schema: dict, streaming_params: dict,
+                 validation_params: Optional[dict] = None) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict]]:
+        """
+        Given the source dataframe and the staging schema, return the staging partitions, their manifests and the
+        quarantine records. Partitions are streamed: the manifests and quarantine records are only complete once the
+        partitions are saved (they must be declared first).
+        @param df: pandas DataFrame, source data
+        @param schema: dict, staging jsonschema
+        @param streaming_params: dict, streaming params, records are processed by batches of batch_size
+        @param validation_params: dict, optional, validation params (see validation_node.validate_rows)
+        @return: tuple, (partitions, manifests, quarantine records)
+        """
+        batches, rejected_rows = self.connector(df, schema, dict(streaming_params, enabled=True))
+        rejected_rows = list(rejected_rows)
+        partitions, manifests = self._partition(
+            validate_batches(batches, schema, validation_params or {}, rejected_rows)
+        )
+        return partitions, manifests, rejected_rows
+
+
+def create_fused_connector_pipeline(spec: Dict[str, Any]) -> Pipeline:
+    """
+    Given a connector spec, return its pipeline as a single node (see FusedConnector), with the same inputs and outputs
+    as the connector, validation and partitioning nodes of create_connector_pipeline
+    @param spec: dict, connector spec
+    @return: kedro Pipeline
+    """
+    name = spec['name']
+
+    return Pipeline(
+        [
+            node(
+                func=FusedConnector(spec),
+                inputs=dict(
+                    df=spec['input'],
+                    schema='schema_staging',
+                    streaming_params='params:streaming',
+                    validation_params='params:%s_validation' % name
+                ),
+                # Partitions first: when they are saved, the manifests and quarantine records are completed
+                outputs=['%s_partitions' % name, '%s_partitions_manifest' % name, '%s_quarantine' % name],
+                name='%s_fused_connector' % name
+            )
+        ]
+    )
+
+
+def create_connector_pipeline(spec: Dict[str, Any], fused: bool = False) -> Pipeline:
+    """
+    Given a connector spec, return its pipeline: connector, schema validation and partitioning nodes, or the single
+    node fusing them if fused
+    @param spec: dict, connector spec
+    @param fused: bool, whether to fuse the nodes (see create_fused_connector_pipeline)
+    @return: kedro Pipeline
+    """
+    if fused:
+        return create_fused_connector_pipeline(spec)
+
+    name = spec['name']
+
+    connector_node = node(
+        func=Connector(spec),
+        inputs=dict(
+            df=spec['input'],
+            schema='schema_staging',
+            params='params:streaming'
+        ),
+        outputs=['%s_mapped' % name, '%s_rejected' % name],
+        name='%s_connector' % name
+    )
+
+    validation_node = schema_validation_node_constructor(
+        schema_dataset_name='schema_staging',
+        params_dataset_name='params:%s_validation' % name
+    )(
+        input_dataset_name='%s_mapped' % name,
+        output_dataset_name='%s_staging' % name,
+        quarantine_dataset_name='%s_quarantine' % name,
+        rejected_dataset_name='%s_rejected' % name
+    )
+
+    partitioning_node = partitioning_node_constructor(
+        keys=spec['partition_keys']
+    )(
+        input_dataset_name='%s_staging' % name,
+        output_dataset_name='%s_partitions' % name,
+        manifest_dataset_name='%s_partitions_manifest' % name
+    )
+
+    return Pipeline(
+        [
+            connector_node,
+            validation_node,
+            partitioning_node
+        ]
+    )
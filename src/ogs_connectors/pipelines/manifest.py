@@ -0,0 +1,206 @@
+from collections.abc import Sequence
+from ogs_connectors.pipelines.staging_table import StagingColumns
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def hash_row(row: Dict) -> str:
+    """
+    Given a staging row, return a hash of its content, independent of the keys ordering
+    @param row: dict, staging row
+    @return: str, hex digest
+    """
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+def hash_hashes(hashes: Iterable[str]) -> str:
+    """
+    Given hashes, return a single hash of the set of hashes, independent of their order
+    @param hashes: iterable of str, hex digests
+    @return: str, hex digest
+    """
+    sha = hashlib.sha1()
+    for digest in sorted(hashes):
+        sha.update(digest.encode('ascii'))
+    return sha.hexdigest()
+
+
+def row_group_key(row: Dict) -> str:
+    """
+    Given a staging row, return the key of the group it belongs to: its geo_component identifier and its date.
+    Groups are the unit of change detection within a partition.
+    @param row: dict, staging row
+    @return: str, group key
+    """
+    identifier = row['geo_component']['identifier']
+    return '{type}:{id}/{date}'.format(
+        type=identifier['type'],
+        id=identifier['id'],
+        date=row['date']
+    )
+
+
+def column_group_keys(batch: StagingColumns) -> List[str]:
+    """
+    Columnar counterpart of row_group_key: given a batch of staging rows stored column by column, return the group
+    key of each row, without building the rows
+    @param batch: StagingColumns, staging rows
+    @return: list of str, group keys
+    """
+    return [
+        '{type}:{id}/{date}'.format(type=identifier_type, id=identifier_id, date=date)
+        for identifier_type, identifier_id, date in zip(
+            batch.column('geo_component.identifier.type'), batch.column('geo_component.identifier.id'),
+            batch.column('date')
+        )
+    ]
+
+
+def parse_group_key(group: str) -> Tuple[str, str, str]:
+    """
+    Given a group key (see row_group_key), return the geo_component identifier and the date of its rows
+    @param group: str, group key
+    @return: tuple of str, (identifier type, identifier id, date)
+    """
+    identifier, date = group.rsplit('/', 1)
+    identifier_type, identifier_id = identifier.split(':', 1)
+    return identifier_type, identifier_id, date
+
+
+class ManifestBuilder:
+    """
+    Incremental manifest construction, so that the manifest of a partition can be built while its rows are streamed
+    """
+
+    def __init__(self):
+        self._group_row_hashes = {}
+        self._identifier_types = set()
+        self._data_sources = set()
+        self._count = 0
+
+    def add(self, row: Dict) -> None:
+        """
+        @param row: dict, staging row
+        """
+        self._group_row_hashes.setdefault(row_group_key(row), []).append(hash_row(row))
+        self._identifier_types.add(row['geo_component']['identifier']['type'])
+        self._data_sources.add(row['data_source']['name'])
+        self._count += 1
+
+    def manifest(self) -> Dict[str, Any]:
+        """
+        @return: dict, manifest of the rows added so far
+        """
+        groups = {
+            group: hash_hashes(row_hashes)
+            for group, row_hashes in self._group_row_hashes.items()
+        }
+
+        return {
+            'hash': hash_hashes(groups.values()),
+            'count': self._count,
+            'identifier_types': sorted(self._identifier_types),
+            'data_sources': sorted(self._data_sources),
+            'groups': groups
+        }
+
+
+def build_manifest(rows: Iterable[Dict]) -> Dict[str, Any]:
+    """
+    Given the rows of a partition, return its manifest: a content hash for the partition and for each row group,
+    along with the geo_component identifier types and data source names it references
+    @param rows: iterable of dicts, staging rows
+    @return: dict, manifest
+    """
+    builder = ManifestBuilder()
+    for row in rows:
+        builder.add(row)
+    return builder.manifest()
+
+
+def stream_with_manifest(rows: Iterable[Dict], manifest: Dict[str, Any]) -> Iterator[Dict]:
+    """
+    Given streamed rows and an empty dict, yield the rows and, once they are all consumed, fill the dict with
+    their manifest
+    @param rows: iterable of dicts, staging rows
+    @param manifest: dict, filled with the manifest of the rows when the stream is exhausted
+    @return: iterator of dicts, staging rows
+    """
+    builder = ManifestBuilder()
+    for row in rows:
+        builder.add(row)
+        yield row
+    manifest.update(builder.manifest())
+
+
+def changed_groups(manifest: Dict[str, Any], previous_manifest: Optional[Dict[str, Any]]) -> Set[str]:
+    """
+    Given a manifest and the previous one, return the keys of the new or changed groups
+    @param manifest: dict, current manifest
+    @param previous_manifest: dict, previous manifest, None if there is none
+    @return: set of str, keys of new or changed groups
+    """
+    if not previous_manifest:
+        return set(manifest['groups'])
+
+    previous_groups = previous_manifest.get('groups', {})
+    return {
+        group
+        for group, group_hash in manifest['groups'].items()
+        if previous_groups.get(group) != group_hash
+    }
+
+
+def outdated_groups(manifest: Dict[str, Any], previous_manifest: Optional[Dict[str, Any]]) -> Set[str]:
+    """
+    Given a manifest and the previous one, return the keys of the previous groups that changed or were removed: the
+    rows written for them are outdated
+    @param manifest: dict, current manifest
+    @param previous_manifest: dict, previous manifest, None if there is none
+    @return: set of str, keys of changed or removed groups
+    """
+    if not previous_manifest:
+        return set()
+
+    groups = manifest['groups']
+    return {
+        group
+        for group, group_hash in previous_manifest.get('groups', {}).items()
+        if groups.get(group) != group_hash
+    }
+
+
+def filter_rows_by_groups(rows: Iterable[Dict], groups: Set[str]) -> Iterator[Dict]:
+    """
+    Given rows and group keys, lazily keep only the rows belonging to one of the groups
+    @param rows: iterable of dicts, staging rows
+    @param groups: set of str, group keys to keep
+    @return: iterator of dicts, filtered rows
+    """
+    return (row for row in rows if row_group_key(row) in groups)
+
+
+def filter_batches_by_groups(items: Iterable[Any], groups: Set[str]) -> Iterator[Any]:
+    """
+    Streaming counterpart of filter_rows_by_groups: given rows or rows batches (see batching.iter_records), lazily
+    keep only the rows belonging to one of the groups, batches being filtered one at a time and kept as batches.
+    StagingColumns batches are filtered column by column, and stay columnar.
+    @param items: iterable of dicts, or of sequences of dicts, staging rows
+    @param groups: set of str, group keys to keep
+    @return: iterator of dicts or of lists of dicts (or StagingColumns), filtered rows
+    """
+    for item in items:
+        if isinstance(item, StagingColumns):
+            positions = [i for i, key in enumerate(column_group_keys(item)) if key in groups]
+            if positions:
+                yield item if len(positions) == len(item) else item.take(positions)
+        elif isinstance(item, Sequence):
+            batch = list(filter_rows_by_groups(item, groups))
+            if batch:
+                yield batch
+        elif row_group_key(item) in groups:
+            yield item
@@ -0,0 +1,344 @@
+from .incremental import is_unchanged, select_changed_emissions, outdated_documents_filters
+from .referential import ReferentialIndex, geo_components_query, data_sources_query, referential_indexes
+from .referential_cache import collection_fingerprint_queries
+from .writer import (
+    BaseEmissionsWriter, UPSERT_MODE, NATURAL_KEY_INDEX_NAME, NATURAL_KEY_INDEX_KEYS, MAX_DUPLICATE_EXAMPLES,
+    STAGING_PARTITION_INDEX_NAME, STAGING_PARTITION_INDEX_KEYS, get_write_errors, rejected_emissions,
+    upsert_requests, manifest_to_document, document_to_manifest, emission_batches, resolve_batch,
+    duplicate_natural_keys_pipeline, tag_documents, written_count
+)
+from ogs_connectors.pipelines.manifest import outdated_groups
+from ogs_connectors.pipelines.staging_table import StagingColumns
+from ogs_connectors.io_tools import get_async_mongodb_client
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from typing import List, Dict, Iterable, Tuple, Optional, Any, Callable, Union, Sequence
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT_BATCHES = 4
+
+
+async def get_collection_fingerprint_async(collection, query: Dict,
+                                           updated_at_field: Optional[str] = None) -> List[Any]:
+    """
+    Asyncio counterpart of get_collection_fingerprint
+    @param collection: motor collection
+    @param query: dict, referential filter
+    @param updated_at_field: str, optional, name of the update timestamp field
+    @return: list, fingerprint
+    """
+    fingerprint = [await collection.count_documents(query)]
+    for last_query, projection, field in collection_fingerprint_queries(query, updated_at_field):
+        last = await collection.find(last_query, projection).sort(field, -1).limit(1).to_list(length=1)
+        fingerprint.append(last[0].get(field) if last else None)
+    return fingerprint
+
+
+class AsyncEmissionsWriter(BaseEmissionsWriter):
+    """
+    Asyncio counterpart of EmissionsWriter, based on motor.
+    Keeps up to max_in_flight_batches bulk writes in flight, so that the process does not idle during each
+    mongodb round-trip. The client can be given, to run against a local mongod or an in-process stand-in.
+    """
+
+    def __init__(self, mongodb_params: Dict, mongodb_credentials: Dict, client=None,
+                 identifier_types: Optional[List[str]] = None, data_source_names: Optional[List[str]] = None):
+        """
+        @param mongodb_params: dict, mongodb connection parameters
+        @param mongodb_credentials: dict, mongodb credentials
+        @param client: motor client, optional, opened from params and credentials if None
+        @param identifier_types: list of str, optional, only load geo_components identified by one of these types
+        @param data_source_names: list of str, optional, only load these data_sources
+        """
+        super().__init__(mongodb_params, mongodb_credentials, identifier_types, data_source_names)
+        self._max_in_flight_batches = mongodb_params.get('max_in_flight_batches', DEFAULT_MAX_IN_FLIGHT_BATCHES)
+        self._client = client
+        self._owns_client = client is None
+
+    async def __aenter__(self) -> 'AsyncEmissionsWriter':
+        self.open()
+        await self.load_referential_index()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """
+        Open the motor client, if not already opened
+        """
+        if self._client is None:
+            self._client = get_async_mongodb_client(
+                mongodb_params=self._mongodb_params,
+                mongodb_credentials=self._mongodb_credentials
+            )
+
+    def close(self) -> None:
+        """
+        Close the motor client, if opened by the writer
+        """
+        if self._client is not None and self._owns_client:
+            self._client.close()
+            self._client = None
+
+    async def load_referential_index(self) -> ReferentialIndex:
+        """
+        Load the referential index, once per writer session
+        @return: ReferentialIndex
+        """
+        if self._referential_index is None:
+            geo_components_collection = self.get_collection('geo_components_collection_name')
+            data_sources_collection = self.get_collection('data_sources_collection_name')
+
+            # Index the lookup keys, then load projected and filtered referentials
+            geo_components_fields, data_sources_fields = referential_indexes(self._identifier_types)
+            await asyncio.gather(
+                *[geo_components_collection.create_index([(field, ASCENDING)], sparse=True)
+                  for field in geo_components_fields],
+                *[data_sources_collection.create_index([(field, ASCENDING)]) for field in data_sources_fields]
+            )
+
+            geo_components_filter, geo_components_projection = geo_components_query(self._identifier_types)
+            data_sources_filter, data_sources_projection = data_sources_query(self._data_source_names)
+
+            # Use the on-disk cache if the referentials fingerprint is unchanged
+            cache, key = self.referential_cache()
+            if cache is not None:
+                updated_at_field = self.referential_updated_at_field
+                fingerprint = list(await asyncio.gather(
+                    get_collection_fingerprint_async(geo_components_collection, geo_components_filter, updated_at_field),
+                    get_collection_fingerprint_async(data_sources_collection, data_sources_filter, updated_at_field)
+                ))
+                self._referential_index = cache.load(key, fingerprint)
+                if self._referential_index is not None:
+                    return self._referential_index
+
+            geo_components, data_sources = await asyncio.gather(
+                geo_components_collection.find(geo_components_filter, geo_components_projection).to_list(length=None),
+                data_sources_collection.find(data_sources_filter, data_sources_projection).to_list(length=None)
+            )
+            self._referential_index = ReferentialIndex(geo_components=geo_components, data_sources=data_sources)
+            if cache is not None:
+                cache.save(key, fingerprint, self._referential_index)
+        return self._referential_index
+
+    async def get_written_manifest(self, partition: str) -> Optional[Dict[str, Any]]:
+        """
+        Given a staging partition, return the manifest of its last complete write, None if never written
+        @param partition: str, staging partition key
+        @return: dict, manifest
+        """
+        return document_to_manifest(
+            await self.get_collection('manifests_collection_name').find_one({'_id': partition})
+        )
+
+    async def save_written_manifest(self, partition: str, manifest: Dict[str, Any]) -> None:
+        """
+        Given a staging partition and its manifest, record it as written
+        @param partition: str, staging partition key
+        @param manifest: dict, manifest of the written partition
+        """
+        await self.get_collection('manifests_collection_name').replace_one(
+            {'_id': partition},
+            manifest_to_document(partition, manifest),
+            upsert=True
+        )
+
+    async def ensure_natural_key_index(self) -> None:
+        """
+        Create the unique compound index on the emission natural key, used by upserts. Done once per session.
+        Duplicated natural keys are handled as by EmissionsWriter.ensure_natural_key_index.
+        """
+        if not self._natural_key_index_ready:
+            emissions_collection = self.get_collection('emissions_collection_name')
+            if NATURAL_KEY_INDEX_NAME not in await emissions_collection.index_information():
+                duplicates = emissions_collection.aggregate(duplicate_natural_keys_pipeline(), allowDiskUse=True)
+                ids = self.duplicates_to_delete(emissions_collection.name, await duplicates.to_list(
+                    length=None if self.deduplicate_natural_keys else MAX_DUPLICATE_EXAMPLES
+                ))
+                if ids:
+                    await emissions_collection.delete_many({'_id': {'$in': ids}})
+                    logger.warning('Removed %s emissions sharing their natural key with a later one.', len(ids))
+
+            await emissions_collection.create_index(NATURAL_KEY_INDEX_KEYS, unique=True, name=NATURAL_KEY_INDEX_NAME)
+            self._natural_key_index_ready = True
+
+    async def delete_documents(self, filters: List[Dict]) -> int:
+        """
+        Asyncio counterpart of EmissionsWriter.delete_documents
+        @param filters: list of dicts, mongodb filters on the staging partition, date and geo_component_id
+        @return: int, number of deleted documents
+        """
+        emissions_collection = self.get_collection('emissions_collection_name')
+        if not self._staging_partition_index_ready:
+            await emissions_collection.create_index(STAGING_PARTITION_INDEX_KEYS, name=STAGING_PARTITION_INDEX_NAME)
+            self._staging_partition_index_ready = True
+
+        results = await asyncio.gather(*[emissions_collection.delete_many(query) for query in filters])
+        return sum(result.deleted_count for result in results)
+
+    async def _write_batch(self, emissions_collection, documents: List[Dict]) -> Tuple[int, List[Dict]]:
+        """
+        Unordered bulk insert (or upsert, depending on the write_mode) of a batch of documents
+        @param emissions_collection: motor collection
+        @param documents: list of dicts, documents to write
+        @return: tuple, (number of written documents, write errors of the failed documents)
+        """
+        try:
+            if self._write_mode == UPSERT_MODE:
+                result = await emissions_collection.bulk_write(upsert_requests(documents), ordered=False)
+                return result.upserted_count + result.modified_count, []
+
+            result = await emissions_collection.insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            return written_count(e.details), get_write_errors(e)
+
+    async def insert_emissions(self, emissions: Iterable[Union[Dict, StagingColumns]],
+                               rejected_rows: Optional[List[Dict]] = None,
+                               partition: Optional[str] = None) -> Dict[str, int]:
+        """
+        Given emissions, insert (or upsert, depending on the write_mode) them into the emissions_collection
+        by batches of batch_size documents, keeping at most max_in_flight_batches batches in flight
+        @param emissions: iterable of dicts, emissions, or of StagingColumns batches whose documents are built from
+        the columns
+        @param rejected_rows: list, optional, receives the quarantine records of the emissions that failed
+        @param partition: str, optional, staging partition of the emissions, recorded on their documents
+        @return: dict, number of inserted and failed emissions
+        """
+        emissions_collection = self.get_collection('emissions_collection_name')
+        referential_index = await self.load_referential_index()
+        if self._write_mode == UPSERT_MODE:
+            await self.ensure_natural_key_index()
+
+        stats = {'inserted': 0, 'failed': 0}
+        in_flight = asyncio.Semaphore(self._max_in_flight_batches)
+
+        def reject(batch: Sequence[Dict], unresolved: List, write_errors: List[Dict],
+                   positions: Optional[List[int]]) -> None:
+            records = rejected_emissions(batch, unresolved, write_errors, positions)
+            if rejected_rows is not None:
+                rejected_rows.extend(records)
+            stats['failed'] += len(records)
+
+        async def write(batch: Sequence[Dict], documents: List[Dict], unresolved: List,
+                        positions: Optional[List[int]]) -> None:
+            try:
+                nb_inserted, write_errors = await self._write_batch(emissions_collection, documents)
+                stats['inserted'] += nb_inserted
+                reject(batch, unresolved, write_errors, positions)
+            finally:
+                in_flight.release()
+
+        # Emissions may be loaded lazily: batches are read in the default executor, not to block the event loop
+        loop = asyncio.get_running_loop()
+        batches = emission_batches(emissions, self._batch_size)
+
+        tasks = []
+        while True:
+            batch = await loop.run_in_executor(None, next, batches, None)
+            if batch is None:
+                break
+
+            # Create documents to insert out of emissions
+            documents, unresolved, positions = resolve_batch(referential_index, batch)
+            if partition is not None:
+                tag_documents(documents, partition)
+
+            if documents:
+                # Wait for a free slot before building the next batch, so that memory stays bounded
+                await in_flight.acquire()
+                tasks.append(asyncio.ensure_future(write(batch, documents, unresolved, positions)))
+            else:
+                reject(batch, unresolved, [], positions)
+
+        await asyncio.gather(*tasks)
+
+        logger.info('Succesfully wrote %s emissions.' % stats['inserted'])
+        if stats['failed']:
+            logger.warning('Failed to insert %s emissions.' % stats['failed'])
+
+        return stats
+
+
+async def write_partition_async(writer: AsyncEmissionsWriter, partition: str, load_partition: Callable,
+                                manifest: Optional[Dict], incremental: bool,
+                                rejected_rows: Optional[List[Dict]] = None) -> Dict[str, int]:
+    """
+    Asyncio counterpart of write_partition. Partitions are loaded in the default executor,
+    so that loads do not block the event loop.
+    @param writer: AsyncEmissionsWriter, writer session
+    @param partition: str, staging partition key
+    @param load_partition: callable, partition loader
+    @param manifest: dict, partition manifest, None if the partition has no manifest
+    @param incremental: bool, whether to write only what changed since the last run
+    @param rejected_rows: list, optional, receives the quarantine records of the emissions that failed
+    @return: dict, number of inserted and failed emissions
+    """
+    loop = asyncio.get_running_loop()
+
+    if not incremental:
+        logger.info('Inserting emissions for data source: %s.' % partition)
+        return await writer.insert_emissions(
+            await loop.run_in_executor(None, load_partition), rejected_rows, partition
+        )
+
+    written_manifest = await writer.get_written_manifest(partition)
+    if is_unchanged(partition, manifest, written_manifest):
+        return {'inserted': 0, 'failed': 0}
+
+    emissions, manifest = await loop.run_in_executor(
+        None, select_changed_emissions, partition, load_partition, manifest, written_manifest
+    )
+    deleted = await writer.delete_documents(outdated_documents_filters(
+        partition, outdated_groups(manifest, written_manifest), await writer.load_referential_index()
+    ))
+    if deleted:
+        logger.info('Deleted %s outdated emissions of data source: %s.' % (deleted, partition))
+    stats = await writer.insert_emissions(emissions, rejected_rows, partition)
+
+    # Only record complete writes, so that failed emissions are retried on the next run
+    if stats['failed']:
+        logger.warning('Data source: %s partially written, its manifest is not recorded.' % partition)
+    else:
+        await writer.save_written_manifest(partition, manifest)
+    return stats
+
+
+async def insert_partitions_async(emissions: Dict[str, Callable], manifests: Dict[str, Optional[Dict]],
+                                  mongodb_params: Dict, mongodb_credentials: Dict, incremental: bool,
+                                  max_workers: int, client=None, rejected_rows: Optional[List[Dict]] = None,
+                                  identifier_types: Optional[List[str]] = None,
+                                  data_source_names: Optional[List[str]] = None) -> List[Dict[str, int]]:
+    """
+    Write the given staging partitions with an AsyncEmissionsWriter, max_workers partitions at a time
+    @param emissions: partitioned dataset (dict): emissions dataset
+    @param manifests: dict, loaded manifest of each emissions partition (None if it has none)
+    @param mongodb_params: dict, mongodb params
+    @param mongodb_credentials: dict, mongodb credentials
+    @param incremental: bool, whether to write only what changed since the last run
+    @param max_workers: int, number of partitions written concurrently
+    @param client: motor client, optional, opened from params and credentials if None
+    @param rejected_rows: list, optional, receives the quarantine records of the emissions that failed
+    @param identifier_types: list of str, optional, only load geo_components identified by one of these types
+    @param data_source_names: list of str, optional, only load these data_sources
+    @return: list of dicts, number of inserted and failed emissions of each partition
+    """
+    partitions = asyncio.Semaphore(max_workers)
+
+    writer = AsyncEmissionsWriter(
+        mongodb_params, mongodb_credentials, client=client,
+        identifier_types=identifier_types, data_source_names=data_source_names
+    )
+
+    async with writer:
+        async def write(key: str) -> Dict[str, int]:
+            async with partitions:
+                return await write_partition_async(
+                    writer, key, emissions[key], manifests.get(key), incremental, rejected_rows
+                )
+
+        return await asyncio.gather(*[write(key) for key in emissions.keys()])
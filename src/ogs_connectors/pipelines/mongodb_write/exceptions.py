@@ -1,2 +1,19 @@
 class InsertEmissionError(Exception):
-    pass
+    """
+    Error raised when an emission can not be turned into a document to insert
+    """
+
+    def __init__(self, message: str, path: str = None):
+        """
+        @param message: str, error message
+        @param path: str, optional, path of the staging field in error
+        """
+        super().__init__(message)
+        self.path = path
+
+
+class DuplicateNaturalKeyError(Exception):
+    """
+    Error raised when the emissions collection holds several emissions with the same natural key, which prevents the
+    creation of the unique natural key index used by upserts
+    """
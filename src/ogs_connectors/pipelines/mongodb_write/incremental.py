@@ -0,0 +1,88 @@
+from .referential import ReferentialIndex
+from .writer import STAGING_PARTITION_FIELD
+from ogs_connectors.batching import iter_records
+from ogs_connectors.pipelines.manifest import build_manifest, changed_groups, filter_batches_by_groups, parse_group_key
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Iterator
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of a complete manifest. Manifests of streamed partitions are only filled once their partition is saved: if
+# saved concurrently (e.g. kedro run --async), a manifest may be saved empty, or partial.
+MANIFEST_FIELDS = ('hash', 'groups')
+
+
+def is_complete(manifest: Optional[Dict]) -> bool:
+    """
+    @param manifest: dict, partition manifest, None if unknown
+    @return: bool, whether the manifest can be compared to the written one
+    """
+    return manifest is not None and all(field in manifest for field in MANIFEST_FIELDS)
+
+
+def is_unchanged(partition: str, manifest: Optional[Dict], written_manifest: Optional[Dict]) -> bool:
+    """
+    Given a staging partition manifest and the manifest of its last complete write, return whether it is unchanged
+    @param partition: str, staging partition key
+    @param manifest: dict, partition manifest, None if unknown (incomplete manifests are unknown)
+    @param written_manifest: dict, manifest of the last complete write, None if never written
+    @return: bool
+    """
+    if not is_complete(manifest) or not is_complete(written_manifest) or manifest['hash'] != written_manifest['hash']:
+        return False
+
+    logger.info('Data source: %s unchanged since last write. Skipping.' % partition)
+    return True
+
+
+def select_changed_emissions(partition: str, load_partition: Callable[[], Any], manifest: Optional[Dict],
+                             written_manifest: Optional[Dict]) -> Tuple[Iterator[Any], Dict]:
+    """
+    Given the loader of a staging partition, lazily keep only the emissions of the groups that changed since its last
+    write. Emissions loaded by batches are filtered batch by batch.
+    @param partition: str, staging partition key
+    @param load_partition: callable, partition loader, returning emissions, possibly lazily or by batches
+    @param manifest: dict, partition manifest, computed from the emissions if None or incomplete
+    @param written_manifest: dict, manifest of the last complete write, None if never written
+    @return: tuple, (emissions to write, partition manifest)
+    """
+    emissions = load_partition()
+    if not is_complete(manifest):
+        if manifest is not None:
+            logger.warning('Manifest of partition %s is incomplete: computed from its emissions.' % partition)
+        manifest = build_manifest(iter_records(emissions))
+        if not isinstance(emissions, list):
+            # Lazy partitions are read twice rather than held in memory: once for the manifest, once to be written
+            emissions = load_partition()
+
+    groups = changed_groups(manifest, written_manifest)
+    logger.info('Inserting emissions for data source: %s (%s changed groups out of %s).' % (
+        partition, len(groups), len(manifest['groups'])
+    ))
+    return filter_batches_by_groups(emissions, groups), manifest
+
+
+def outdated_documents_filters(partition: str, groups: Set[str], referential_index: ReferentialIndex) -> List[Dict]:
+    """
+    Given a staging partition and the keys of its changed or removed groups (see manifest.outdated_groups), return the
+    filters of the emission documents written for these groups, one per date. Documents are matched on the partition
+    they were written from, as several partitions may share a group (e.g. wri_unfccc partitions by gas).
+    @param partition: str, staging partition key
+    @param groups: set of str, group keys
+    @param referential_index: ReferentialIndex, resolving the groups geo_component identifiers
+    @return: list of dicts, mongodb filters
+    """
+    geo_component_ids = {}
+    for group in sorted(groups):
+        identifier_type, identifier_id, date = parse_group_key(group)
+        geo_component_id = referential_index.find_geo_component(
+            {'identifier': {'type': identifier_type, 'id': identifier_id}}
+        )
+        # Unresolved groups have no written documents
+        if geo_component_id is not None:
+            geo_component_ids.setdefault(date, []).append(geo_component_id)
+
+    return [
+        {STAGING_PARTITION_FIELD: partition, 'date': date, 'geo_component_id': {'$in': ids}}
+        for date, ids in geo_component_ids.items()
+    ]
@@ -1,156 +1,17 @@
-from .exceptions import InsertEmissionError
-from ogs_connectors.io_tools import get_mongodb_client
-from tqdm import tqdm
-from typing import List, Dict, Optional, Callable
+from .async_writer import insert_partitions_async
+from .incremental import is_unchanged, select_changed_emissions, outdated_documents_filters
+from .referential import referential_filters
+from .writer import EmissionsWriter, UPSERT_MODE
+from ogs_connectors.pipelines.manifest import outdated_groups
+from ogs_connectors.pipelines.quarantine import log_rejected_rows, DEFAULT_MAX_EXAMPLES
+from concurrent.futures import ThreadPoolExecutor, Future
+import asyncio
+from typing import List, Dict, Callable, Optional
 import logging
-from kedro.framework.session import get_current_session
 
 logger = logging.getLogger(__name__)
 
 
-def get_geo_components(geo_components_collection) -> List[Dict]:
-    """
-    Get all documents from the geo_components_collection
-    @param geo_components_collection: pymongo collection
-    @return:
-    """
-    return list(geo_components_collection.find({}))
-
-
-def get_data_sources(data_sources_collection) -> List[Dict]:
-    """
-    Gel all documents from the data_sources_collection
-    @param data_sources_collection: pymongo collection
-    @return:
-    """
-    return list(data_sources_collection.find({}))
-
-
-def find_geo_component(geo_component: Dict, ref_geo_components: List[Dict]) -> Optional[str]:
-    """
-    Given a geo_component, return its id in the referential, None if not found
-    @param geo_component: dict, geo_component to find
-    @param ref_geo_components: list of dict, list of the geo_components to find among
-    @rtype: object
-    """
-    # Get geo_component identifier type
-    identifier_type = geo_component['identifier']['type']
-
-    for ref_geo_component in ref_geo_components:
-        # Check whether or not identifier is known for this ref_geo_component
-        if identifier_type not in ref_geo_component['identifiers']:
-            continue
-
-        if ref_geo_component['identifiers'][identifier_type] == geo_component['identifier']['id']:
-            return ref_geo_component['_id']
-
-    return None
-
-
-def find_data_source(data_source: Dict, ref_data_sources: List[Dict]) -> Optional[str]:
-    """
-    Given a data_source, return its id in the referential, None if not found
-    @param data_source: dict, data_source to find
-    @param ref_data_sources: list of dict, list of the data_sources to find among
-    """
-    for ref_data_source in ref_data_sources:
-        if data_source['name'] == ref_data_source['name']:
-            return ref_data_source['_id']
-
-    return None
-
-
-def create_document(emission: Dict, ref_geo_components: List[Dict], ref_data_sources: List[Dict]) -> Dict:
-    """
-    Given an emission and referentials, try to insert the emission
-    @param emission:
-    @param ref_geo_components:
-    @param ref_data_sources:
-    """
-    # Get geo_component id
-    geo_component_id = find_geo_component(
-        geo_component=emission['geo_component'],
-        ref_geo_components=ref_geo_components
-    )
-
-    if not geo_component_id:
-        raise InsertEmissionError('geo_component not found: %s' % emission['geo_component'])
-
-    # Get data_source id
-    data_source_id = find_data_source(
-        data_source=emission['data_source'],
-        ref_data_sources=ref_data_sources
-    )
-
-    if not data_source_id:
-        raise InsertEmissionError('data_source not found: %s' % emission['data_source'])
-
-    # Format document
-    emission_document = {
-        'geo_component_id': geo_component_id,
-        'data_source_id': data_source_id,
-        'date': emission['date'],
-        'gas': emission['emission']['gas'],
-        'value': emission['emission']['value'],
-        'unit': emission['emission']['unit'],
-        'sector': emission['emission']['sector'],
-    }
-
-    return emission_document
-
-
-def insert_emissions(emissions: List[Dict], mongodb_params: Dict) -> None:
-    """
-    Given a list of emissions, insert them into the emissions_collection
-    @param emissions: list of dicts, emissions
-    @param mongodb_params: dict, mongodb connection parameters
-    """
-    # Get credentials for current session
-    # TODO: find alternative (currently using private function)
-    session = get_current_session()
-    context = session.load_context()
-    credentials = context._get_config_credentials()
-
-    # Create mongodb clients from params and credentials
-    client = get_mongodb_client(
-        mongodb_params=mongodb_params,
-        mongodb_credentials=credentials['relational_mongodb']
-
-    )
-
-    # Get database and associated collections
-    db = client.get_database(mongodb_params.get('database_name'))
-    geo_components_collection = db[mongodb_params.get('geo_components_collection_name')]
-    data_sources_collection = db[mongodb_params.get('data_sources_collection_name')]
-    emissions_collection = db[mongodb_params.get('emissions_collection_name')]
-
-    # Load once referential collections
-    ref_geo_components = get_geo_components(geo_components_collection)
-    ref_data_sources = get_data_sources(data_sources_collection)
-
-    nb_inserted = 0
-    nb_failed = 0
-    documents_to_insert = []
-
-    # Create documents to insert out of emissions
-    for emission in tqdm(emissions):
-        try:
-            document = create_document(emission, ref_geo_components, ref_data_sources)
-            documents_to_insert.append(document)
-            nb_inserted += 1
-        except InsertEmissionError as e:
-            logger.error('Failed to insert emission: %s' % e)
-            nb_failed += 1
-
-    # Batch insert of created documents
-    if documents_to_insert:
-        emissions_collection.insert_many(documents_to_insert)
-
-    logger.info('Succesfully inserted %s emissions.' % nb_inserted)
-    if nb_failed:
-        logger.warning('Failed to insert %s emissions. See logs for details.' % nb_failed)
-
-
 def extract_data_source(dataset_name: str) -> str:
     """
     Given a dataset name, extracts the data source.
@@ -165,11 +26,13 @@ def extract_data_source(dataset_name: str) -> str:
 def filter_data_sources(partitioned_dataset: Dict[str, Callable], data_sources: List[str]) -> Dict[str, Callable]:
     """
     Given a partitioned dataset (dict of partitions: datasets) and a list of data sources,
-    Filter the dict so that only given data sources are kept
+    Filter the dict so that only the partitions of the given data sources are kept (a data source may have several
+    partitions)
     @param partitioned_dataset:
     @param data_sources:
     @return:
     """
+    found_data_sources = set()
     for dataset_name in list(partitioned_dataset):
         dataset_data_source = extract_data_source(dataset_name)
 
@@ -178,34 +41,229 @@ def filter_data_sources(partitioned_dataset: Dict[str, Callable], data_sources:
             partitioned_dataset.pop(dataset_name)
             continue
 
-        # Remove data_source from the list to find
-        data_sources.remove(dataset_data_source)
+        found_data_sources.add(dataset_data_source)
 
     # Warnings if some data_sources were not found
-    if data_sources:
-        for data_source in data_sources:
+    for data_source in data_sources:
+        if data_source not in found_data_sources:
             logger.warning('Data source: %s not found in dataset. Ignoring.' % data_source)
 
     return partitioned_dataset
 
 
-def insert_partitioned_emissions(emissions: Dict[str, Callable], mongodb_params: Dict, params: Dict) -> None:
+def write_partition(writer: EmissionsWriter, partition: str, load_partition: Callable,
+                    manifest: Optional[Dict], incremental: bool,
+                    rejected_rows: Optional[List[Dict]] = None) -> Dict[str, int]:
+    """
+    Given a staging partition, write its emissions into mongodb.
+    In incremental mode, the partition is skipped if its manifest did not change since its last complete write,
+    otherwise the documents of its changed or removed row groups are deleted, and its new or changed row groups
+    are written.
+    @param writer: EmissionsWriter, writer session
+    @param partition: str, staging partition key
+    @param load_partition: callable, partition loader
+    @param manifest: dict, partition manifest, None if the partition has no manifest
+    @param incremental: bool, whether to write only what changed since the last run
+    @param rejected_rows: list, optional, receives the quarantine records of the emissions that failed
+    @return: dict, number of inserted and failed emissions
+    """
+    if not incremental:
+        logger.info('Inserting emissions for data source: %s.' % partition)
+        return writer.insert_emissions(load_partition(), rejected_rows, partition)
+
+    written_manifest = writer.get_written_manifest(partition)
+    if is_unchanged(partition, manifest, written_manifest):
+        return {'inserted': 0, 'failed': 0}
+
+    emissions, manifest = select_changed_emissions(partition, load_partition, manifest, written_manifest)
+    deleted = writer.delete_documents(outdated_documents_filters(
+        partition, outdated_groups(manifest, written_manifest), writer.referential_index
+    ))
+    if deleted:
+        logger.info('Deleted %s outdated emissions of data source: %s.' % (deleted, partition))
+    stats = writer.insert_emissions(emissions, rejected_rows, partition)
+
+    # Only record complete writes, so that failed emissions are retried on the next run
+    if stats['failed']:
+        logger.warning('Data source: %s partially written, its manifest is not recorded.' % partition)
+    else:
+        writer.save_written_manifest(partition, manifest)
+    return stats
+
+
+def prefetch_partitions(partitioned_dataset: Dict[str, Callable], executor: ThreadPoolExecutor) -> Dict[str, Callable]:
+    """
+    Given a partitioned dataset (dict of partitions: loaders), return loaders that, when called, also start loading
+    the next partition in the background. The next partition load then overlaps with the current partition write.
+    @param partitioned_dataset: dict, partitions loaders, in writing order
+    @param executor: ThreadPoolExecutor, executor running the background loads
+    @return: dict, prefetching partitions loaders
+    """
+    partitions = list(partitioned_dataset)
+    futures: Dict[str, Future] = {}
+
+    def submit(position: int) -> None:
+        if position < len(partitions) and partitions[position] not in futures:
+            futures[partitions[position]] = executor.submit(partitioned_dataset[partitions[position]])
+
+    def loader_constructor(position: int) -> Callable:
+        def load():
+            # Drop prefetched partitions that were skipped
+            for skipped_partition in partitions[:position]:
+                futures.pop(skipped_partition, None)
+            submit(position)
+            submit(position + 1)
+            return futures.pop(partitions[position]).result()
+
+        return load
+
+    return {
+        partition: loader_constructor(position)
+        for position, partition in enumerate(partitions)
+    }
+
+
+def insert_partitioned_emissions(emissions: Dict[str, Callable], manifests: Dict[str, Callable],
+                                 mongodb_params: Dict, mongodb_credentials: Dict, params: Dict) -> List[Dict]:
     """
     Given emissions, a partitioned dataset, and a list of data sources, insert the different sub datasets
     into mongodb, making sure to insert only desired data sources
     @param emissions: partitioned dataset (dict): emissions dataset
+    @param manifests: partitioned dataset (dict): manifests of the emissions partitions
     @param mongodb_params: dict: mongodb params
+    @param mongodb_credentials: dict: mongodb credentials
     @param params: dict: process params
-    @return:
+    @return: list of dicts, quarantine records of the emissions that could not be written
     """
+    rejected_rows = []
+
     emissions = filter_data_sources(
         partitioned_dataset=emissions,
         data_sources=params['data_sources']
     )
 
-    for key in emissions.keys():
-        logger.info('Inserting emissions for data source: %s.' % key)
-        insert_emissions(
-            emissions=emissions[key](),
-            mongodb_params=mongodb_params
+    if not emissions:
+        logger.warning('No staging partition to write.')
+        return rejected_rows
+
+    incremental = params.get('incremental', False)
+    if incremental and mongodb_params.get('write_mode') != UPSERT_MODE:
+        raise ValueError('Incremental writes require the %s write_mode' % UPSERT_MODE)
+
+    # Manifests are small: load them once, to skip unchanged partitions and filter the referentials to load
+    manifests = {
+        key: manifests[key]() if key in manifests else None
+        for key in emissions.keys()
+    }
+    identifier_types, data_source_names = referential_filters(manifests.values())
+
+    max_workers = params.get('max_workers', 1)
+
+    if params.get('backend', 'pymongo') == 'motor':
+        # Asyncio writer, keeping several bulk batches in flight
+        partitions_stats = asyncio.run(insert_partitions_async(
+            emissions=emissions,
+            manifests=manifests,
+            mongodb_params=mongodb_params,
+            mongodb_credentials=mongodb_credentials,
+            incremental=incremental,
+            max_workers=max_workers,
+            rejected_rows=rejected_rows,
+            identifier_types=identifier_types,
+            data_source_names=data_source_names
+        ))
+    else:
+        partitions_stats = write_partitions(
+            emissions, manifests, mongodb_params, mongodb_credentials, params, incremental,
+            identifier_types, data_source_names, rejected_rows
         )
+
+    # Rejected emissions are summarized once, their details go to the quarantine dataset
+    log_rejected_rows(
+        rejected_rows,
+        total=sum(stats['inserted'] + stats['failed'] for stats in partitions_stats),
+        max_examples=params.get('max_error_examples', DEFAULT_MAX_EXAMPLES)
+    )
+    return rejected_rows
+
+
+def insert_staged_emissions(emissions: Dict[str, Callable], manifests: Dict[str, Callable], mongodb_params: Dict,
+                            mongodb_credentials: Dict, params: Dict, **upstream: Dict[str, Callable]) -> List[Dict]:
+    """
+    insert_partitioned_emissions, once the upstream datasets are saved: in a pipeline also running the connectors,
+    their staging outputs are inputs of the write node, so that it runs after them (they are not read)
+    @param emissions: partitioned dataset (dict): emissions dataset
+    @param manifests: partitioned dataset (dict): manifests of the emissions partitions
+    @param mongodb_params: dict: mongodb params
+    @param mongodb_credentials: dict: mongodb credentials
+    @param params: dict: process params
+    @param upstream: partitioned datasets (dicts), staging outputs of the connectors (e.g. gcp_partitions_manifest)
+    @return: list of dicts, quarantine records of the emissions that could not be written
+    """
+    logger.info('Staging datasets %s saved, writing emissions', sorted(upstream))
+    return insert_partitioned_emissions(emissions, manifests, mongodb_params, mongodb_credentials, params)
+
+
+def write_partitions(emissions: Dict[str, Callable], manifests: Dict[str, Optional[Dict]], mongodb_params: Dict,
+                     mongodb_credentials: Dict, params: Dict, incremental: bool, identifier_types: Optional[List[str]],
+                     data_source_names: Optional[List[str]], rejected_rows: List[Dict]) -> List[Dict[str, int]]:
+    """
+    Write the given staging partitions with a single EmissionsWriter session (client and referentials),
+    concurrently if max_workers > 1, otherwise sequentially
+    @param emissions: partitioned dataset (dict): emissions dataset
+    @param manifests: dict, loaded manifest of each emissions partition (None if it has none)
+    @param mongodb_params: dict, mongodb params
+    @param mongodb_credentials: dict, mongodb credentials
+    @param params: dict, process params
+    @param incremental: bool, whether to write only what changed since the last run
+    @param identifier_types: list of str, optional, geo_component identifier types to load
+    @param data_source_names: list of str, optional, data source names to load
+    @param rejected_rows: list, receives the quarantine records of the emissions that failed
+    @return: list of dicts, number of inserted and failed emissions of each partition (unchanged ones excluded)
+    """
+    max_workers = params.get('max_workers', 1)
+
+    writer = EmissionsWriter(
+        mongodb_params, mongodb_credentials,
+        identifier_types=identifier_types, data_source_names=data_source_names
+    )
+
+    with writer:
+        # Load referentials once, before partitions are written
+        writer.referential_index
+
+        if incremental:
+            # Skip unchanged partitions before they are loaded (or prefetched)
+            written_manifests = writer.get_written_manifests(list(emissions))
+            emissions = {
+                key: load_partition for key, load_partition in emissions.items()
+                if not is_unchanged(key, manifests[key], written_manifests.get(key))
+            }
+
+        if max_workers > 1:
+            # Partitions are loaded, resolved and written concurrently, over the client connection pool
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        write_partition, writer, key, emissions[key], manifests[key], incremental, rejected_rows
+                    )
+                    for key in emissions.keys()
+                ]
+                return [future.result() for future in futures]
+
+        # Sequential writes, loading the next partition while the current one is written
+        with ThreadPoolExecutor(max_workers=1) as prefetch_executor:
+            if params.get('prefetch', True):
+                emissions = prefetch_partitions(emissions, prefetch_executor)
+
+            return [
+                write_partition(
+                    writer=writer,
+                    partition=key,
+                    load_partition=emissions[key],
+                    manifest=manifests[key],
+                    incremental=incremental,
+                    rejected_rows=rejected_rows
+                )
+                for key in emissions.keys()
+            ]
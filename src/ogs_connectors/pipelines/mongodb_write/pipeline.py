@@ -1,20 +1,47 @@
+from typing import List, Optional
+
 from kedro.pipeline import Pipeline, node
-from .logic import insert_partitioned_emissions
+from ogs_connectors.hooks import SIDE_EFFECT_TAG
+from ogs_connectors.runner import IO_BOUND_TAG
+from .logic import insert_partitioned_emissions, insert_staged_emissions
+
+write_inputs = dict(
+    emissions='staging',
+    manifests='staging_manifest',
+    mongodb_params='params:relational_mongodb',
+    mongodb_credentials='mongodb_credentials',
+    params='params:mongodb_write'
+)
 
 gcp_write_node = node(
     func=insert_partitioned_emissions,
-    inputs=dict(
-        emissions='staging',
-        mongodb_params='params:relational_mongodb',
-        params='params:mongodb_write'
-    ),
-    outputs=None
+    inputs=write_inputs,
+    outputs='mongodb_write_quarantine',
+    tags=[SIDE_EFFECT_TAG, IO_BOUND_TAG]
 )
 
 
-def create_pipeline(**kwargs):
+def create_pipeline(upstream: Optional[List[str]] = None, **kwargs):
+    """
+    @param upstream: list of str, optional, staging datasets saved by the connectors (e.g. gcp_partitions_manifest).
+    The write node then depends on them, to run after the connectors in a pipeline combining them (see 'all')
+    @return: kedro Pipeline
+    """
+    if not upstream:
+        return Pipeline(
+            [
+                gcp_write_node
+            ]
+        )
+
     return Pipeline(
         [
-            gcp_write_node
+            node(
+                func=insert_staged_emissions,
+                inputs=dict(write_inputs, **{name: name for name in upstream}),
+                outputs='mongodb_write_quarantine',
+                name='mongodb_write',
+                tags=[SIDE_EFFECT_TAG, IO_BOUND_TAG]
+            )
         ]
     )
@@ -0,0 +1,234 @@
+from .exceptions import InsertEmissionError
+from ogs_connectors.pipelines.staging_table import StagingColumns
+from typing import List, Dict, Optional, Tuple, Iterable, Hashable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def geo_components_query(identifier_types: Optional[List[str]] = None) -> Tuple[Dict, Dict]:
+    """
+    Given identifier types, return the filter and projection loading only the geo_components identified by one of
+    these types, and only the fields used to resolve emissions. All geo_components are loaded if no types given.
+    @param identifier_types: list of str, optional, identifier types to load
+    @return: tuple of dicts, (filter, projection)
+    """
+    if identifier_types is None:
+        return {}, {'_id': 1, 'identifiers': 1}
+
+    return (
+        {'$or': [{'identifiers.%s' % identifier_type: {'$exists': True}} for identifier_type in identifier_types]},
+        dict({'_id': 1}, **{'identifiers.%s' % identifier_type: 1 for identifier_type in identifier_types})
+    )
+
+
+def data_sources_query(data_source_names: Optional[List[str]] = None) -> Tuple[Dict, Dict]:
+    """
+    Given data source names, return the filter and projection loading only these data_sources, and only the fields
+    used to resolve emissions. All data_sources are loaded if no names given.
+    @param data_source_names: list of str, optional, data source names to load
+    @return: tuple of dicts, (filter, projection)
+    """
+    if data_source_names is None:
+        return {}, {'_id': 1, 'name': 1}
+
+    return {'name': {'$in': list(data_source_names)}}, {'_id': 1, 'name': 1}
+
+
+def referential_indexes(identifier_types: Optional[List[str]] = None) -> Tuple[List[str], List[str]]:
+    """
+    Given identifier types, return the fields to index on the geo_components and data_sources collections,
+    so that filtered referential loads do not scan the collections
+    @param identifier_types: list of str, optional, identifier types used for lookups
+    @return: tuple of lists, (geo_components fields, data_sources fields)
+    """
+    geo_components_fields = ['identifiers.%s' % identifier_type for identifier_type in identifier_types or []]
+    return geo_components_fields, ['name']
+
+
+def get_geo_components(geo_components_collection, identifier_types: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Get documents from the geo_components_collection, projected on the fields used to resolve emissions
+    @param geo_components_collection: pymongo collection
+    @param identifier_types: list of str, optional, only load geo_components identified by one of these types
+    @return:
+    """
+    query, projection = geo_components_query(identifier_types)
+    return list(geo_components_collection.find(query, projection))
+
+
+def get_data_sources(data_sources_collection, data_source_names: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Gel documents from the data_sources_collection, projected on the fields used to resolve emissions
+    @param data_sources_collection: pymongo collection
+    @param data_source_names: list of str, optional, only load these data_sources
+    @return:
+    """
+    query, projection = data_sources_query(data_source_names)
+    return list(data_sources_collection.find(query, projection))
+
+
+def referential_filters(manifests: Iterable[Optional[Dict]]) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+    """
+    Given the manifests of the partitions to write, return the identifier types and data source names they reference.
+    If any partition has no manifest, no filter can be derived: (None, None) is returned.
+    @param manifests: iterable of dicts, partitions manifests (None for a partition without manifest)
+    @return: tuple, (identifier types, data source names)
+    """
+    identifier_types = set()
+    data_source_names = set()
+    for manifest in manifests:
+        if manifest is None or 'identifier_types' not in manifest or 'data_sources' not in manifest:
+            return None, None
+        identifier_types.update(manifest['identifier_types'])
+        data_source_names.update(manifest['data_sources'])
+
+    return sorted(identifier_types), sorted(data_source_names)
+
+
+class ReferentialIndex:
+    """
+    In-memory index of the geo_components and data_sources referentials.
+    Built once from the referential documents, it resolves emissions to referential ids with dict lookups
+    instead of scanning the referential lists for every emission.
+    """
+
+    def __init__(self, geo_components: List[Dict], data_sources: List[Dict]):
+        """
+        @param geo_components: list of dict, geo_components documents (needs _id and identifiers)
+        @param data_sources: list of dict, data_sources documents (needs _id and name)
+        """
+        # (identifier type, identifier id) -> geo_component _id
+        self._geo_components = {}
+        for geo_component in geo_components:
+            for identifier_type, identifier_id in geo_component.get('identifiers', {}).items():
+                if not isinstance(identifier_id, Hashable):
+                    continue
+                # Keep the first match, as the former linear search did
+                self._geo_components.setdefault((identifier_type, identifier_id), geo_component['_id'])
+
+        # data source name -> data_source _id
+        self._data_sources = {}
+        for data_source in data_sources:
+            self._data_sources.setdefault(data_source['name'], data_source['_id'])
+
+    def __len__(self) -> int:
+        return len(self._geo_components) + len(self._data_sources)
+
+    def find_geo_component(self, geo_component: Dict) -> Optional[str]:
+        """
+        Given a geo_component, return its id in the referential, None if not found
+        @param geo_component: dict, geo_component to find
+        @return: id of the geo_component in the referential
+        """
+        identifier = geo_component['identifier']
+        return self._geo_components.get((identifier['type'], identifier['id']))
+
+    def find_data_source(self, data_source: Dict) -> Optional[str]:
+        """
+        Given a data_source, return its id in the referential, None if not found
+        @param data_source: dict, data_source to find
+        @return: id of the data_source in the referential
+        """
+        return self._data_sources.get(data_source['name'])
+
+    def create_document(self, emission: Dict) -> Dict:
+        """
+        Given an emission, return the emission document to insert, referencing the referentials ids
+        @param emission: dict, staging emission
+        @return: dict, emission document
+        """
+        # Get geo_component id
+        geo_component_id = self.find_geo_component(emission['geo_component'])
+        if not geo_component_id:
+            raise InsertEmissionError(
+                'geo_component not found: %s' % emission['geo_component'], path='geo_component.identifier'
+            )
+
+        # Get data_source id
+        data_source_id = self.find_data_source(emission['data_source'])
+        if not data_source_id:
+            raise InsertEmissionError(
+                'data_source not found: %s' % emission['data_source'], path='data_source.name'
+            )
+
+        # Format document
+        return {
+            'geo_component_id': geo_component_id,
+            'data_source_id': data_source_id,
+            'date': emission['date'],
+            'gas': emission['emission']['gas'],
+            'value': emission['emission']['value'],
+            'unit': emission['emission']['unit'],
+            'sector': emission['emission']['sector'],
+        }
+
+    def resolve(self, emissions: Iterable[Dict]) -> Tuple[List[Dict], List[Tuple[Dict, InsertEmissionError]]]:
+        """
+        Resolve a batch of emissions against the referentials
+        @param emissions: iterable of dicts, staging emissions
+        @return: tuple, (documents to insert, list of (unresolved emission, error))
+        """
+        documents = []
+        unresolved = []
+        for emission in emissions:
+            try:
+                documents.append(self.create_document(emission))
+            except InsertEmissionError as e:
+                unresolved.append((emission, e))
+
+        return documents, unresolved
+
+    def resolve_columns(self, emissions: StagingColumns) -> Tuple[
+            List[Dict], List[Tuple[Dict, InsertEmissionError]], List[int]]:
+        """
+        Resolve a batch of emissions stored column by column against the referentials: referentials are looked up
+        once per distinct value, and documents are built from the columns. Emission records are only built for the
+        unresolved emissions.
+        @param emissions: StagingColumns, staging emissions
+        @return: tuple, (documents to insert, list of (unresolved emission, error), position of each document's
+        emission in the batch)
+        """
+        geo_component_keys = list(zip(
+            emissions.column('geo_component.identifier.type'),
+            emissions.column('geo_component.identifier.id')
+        ))
+        geo_component_ids = {key: self._geo_components.get(key) for key in set(geo_component_keys)}
+        data_source_names = emissions.column('data_source.name')
+        data_source_ids = {name: self._data_sources.get(name) for name in set(data_source_names)}
+
+        documents = []
+        unresolved = []
+        positions = []
+        for position, (geo_component_key, data_source_name, date, gas, value, unit, sector) in enumerate(zip(
+            geo_component_keys, data_source_names,
+            emissions.column('date'), emissions.column('emission.gas'), emissions.column('emission.value'),
+            emissions.records('emission.unit.'), emissions.records('emission.sector.')
+        )):
+            geo_component_id = geo_component_ids[geo_component_key]
+            data_source_id = data_source_ids[data_source_name]
+            if not geo_component_id or not data_source_id:
+                emission = emissions[position]
+                if not geo_component_id:
+                    error = InsertEmissionError(
+                        'geo_component not found: %s' % emission['geo_component'], path='geo_component.identifier'
+                    )
+                else:
+                    error = InsertEmissionError(
+                        'data_source not found: %s' % emission['data_source'], path='data_source.name'
+                    )
+                unresolved.append((emission, error))
+                continue
+
+            documents.append({
+                'geo_component_id': geo_component_id,
+                'data_source_id': data_source_id,
+                'date': date,
+                'gas': gas,
+                'value': value,
+                'unit': unit,
+                'sector': sector,
+            })
+            positions.append(position)
+
+        return documents, unresolved, positions
@@ -0,0 +1,155 @@
+from .referential import ReferentialIndex, geo_components_query, data_sources_query
+from pathlib import Path
+from typing import Dict, Optional, Any, List, Tuple
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def collection_fingerprint_queries(query: Dict, updated_at_field: Optional[str] = None) -> List[Tuple[Dict, Dict, str]]:
+    """
+    Given a referential filter, return the cheap queries fingerprinting the filtered documents: the max _id
+    and, if the collection has one, the max update timestamp. Each query is a (filter, projection, sort field) tuple,
+    to be run with a descending sort and a limit of 1. The documents count completes the fingerprint.
+    @param query: dict, referential filter
+    @param updated_at_field: str, optional, name of the update timestamp field
+    @return: list of tuples
+    """
+    fields = ['_id'] + ([updated_at_field] if updated_at_field else [])
+    return [(query, {field: 1}, field) for field in fields]
+
+
+def get_collection_fingerprint(collection, query: Dict, updated_at_field: Optional[str] = None) -> List[Any]:
+    """
+    Fingerprint the documents of a collection matching the query: count, max _id and max update timestamp.
+    Much cheaper than loading the documents themselves.
+    @param collection: pymongo collection
+    @param query: dict, referential filter
+    @param updated_at_field: str, optional, name of the update timestamp field
+    @return: list, fingerprint
+    """
+    fingerprint = [collection.count_documents(query)]
+    for last_query, projection, field in collection_fingerprint_queries(query, updated_at_field):
+        last = list(collection.find(last_query, projection).sort(field, -1).limit(1))
+        fingerprint.append(last[0].get(field) if last else None)
+    return fingerprint
+
+
+def get_referential_fingerprint(geo_components_collection, data_sources_collection,
+                                identifier_types: Optional[List[str]], data_source_names: Optional[List[str]],
+                                updated_at_field: Optional[str] = None) -> List[Any]:
+    """
+    Fingerprint the referentials loaded for the given identifier types and data source names
+    @param geo_components_collection: pymongo collection
+    @param data_sources_collection: pymongo collection
+    @param identifier_types: list of str, optional, identifier types to load
+    @param data_source_names: list of str, optional, data source names to load
+    @param updated_at_field: str, optional, name of the update timestamp field
+    @return: list, fingerprint
+    """
+    geo_components_filter, _ = geo_components_query(identifier_types)
+    data_sources_filter, _ = data_sources_query(data_source_names)
+    return [
+        get_collection_fingerprint(geo_components_collection, geo_components_filter, updated_at_field),
+        get_collection_fingerprint(data_sources_collection, data_sources_filter, updated_at_field)
+    ]
+
+
+class ReferentialCache:
+    """
+    On-disk cache of resolved referential indexes, stored as pickles.
+    An entry is identified by the referentials it was loaded from (cluster, database, collections and filters), and
+    is only used if its fingerprint matches the current referentials fingerprint.
+    Without an update timestamp field (referential_updated_at_field), the fingerprint only detects inserted and
+    deleted documents: after an in-place edit of a referential document, the cache directory must be purged.
+    Entries are written atomically, so the cache can be shared by parallel runner processes.
+    """
+
+    def __init__(self, cache_dir: str, updated_at_field: Optional[str] = None):
+        """
+        @param cache_dir: str, directory holding the cache entries
+        @param updated_at_field: str, optional, name of the update timestamp field of the referentials
+        """
+        self._cache_dir = Path(cache_dir)
+        self._updated_at_field = updated_at_field
+
+    @staticmethod
+    def entry_key(mongodb_params: Dict, mongodb_credentials: Dict, identifier_types: Optional[List[str]],
+                  data_source_names: Optional[List[str]]) -> str:
+        """
+        Given mongodb params and credentials and referential filters, return the key of the cache entry. The
+        connection target (clusters, user, connection params) is part of the key, so that databases of the same name
+        on different clusters do not share entries.
+        @param mongodb_params: dict, mongodb connection parameters
+        @param mongodb_credentials: dict, mongodb credentials
+        @param identifier_types: list of str, optional, identifier types to load
+        @param data_source_names: list of str, optional, data source names to load
+        @return: str, entry key (a hash: credentials are not written in the cache)
+        """
+        description = json.dumps([
+            sorted(mongodb_credentials.get('cluster_urls', [])),
+            mongodb_credentials.get('user'),
+            mongodb_params.get('connection_params'),
+            mongodb_params.get('database_name'),
+            mongodb_params.get('geo_components_collection_name'),
+            mongodb_params.get('data_sources_collection_name'),
+            identifier_types,
+            data_source_names
+        ])
+        return hashlib.sha1(description.encode('utf8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self._cache_dir / ('referential_%s.pkl' % key)
+
+    def load(self, key: str, fingerprint: List[Any]) -> Optional[ReferentialIndex]:
+        """
+        Given an entry key and the current referentials fingerprint, return the cached index, None if missing, stale
+        or unreadable (truncated, written by another version of the code, ...): the cache is never worth failing a run
+        @param key: str, entry key
+        @param fingerprint: list, current referentials fingerprint
+        @return: ReferentialIndex
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            cached_fingerprint, index = entry['fingerprint'], entry['index']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning('Ignoring unreadable referential cache entry %s: %r' % (path, e))
+            return None
+
+        if cached_fingerprint != fingerprint:
+            logger.info('Referential cache entry %s is stale.' % path)
+            return None
+
+        logger.info('Loaded referential index from cache: %s' % path)
+        if not self._updated_at_field:
+            logger.debug('No referential_updated_at_field: the referential cache only detects inserted and deleted '
+                         'referential documents. Purge the referential_cache_dir after editing documents in place.')
+        return index
+
+    def save(self, key: str, fingerprint: List[Any], index: ReferentialIndex) -> None:
+        """
+        Given an entry key, the referentials fingerprint and the resolved index, store the cache entry
+        @param key: str, entry key
+        @param fingerprint: list, referentials fingerprint
+        @param index: ReferentialIndex, resolved referential index
+        """
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file, then atomically replace: readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=str(self._cache_dir), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'fingerprint': fingerprint, 'index': index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
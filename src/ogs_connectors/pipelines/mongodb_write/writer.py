@@ -0,0 +1,552 @@
+from .exceptions import DuplicateNaturalKeyError
+from .referential import ReferentialIndex, get_geo_components, get_data_sources, referential_indexes
+from .referential_cache import ReferentialCache, get_referential_fingerprint
+from ogs_connectors.io_tools import get_mongodb_client
+from ogs_connectors.pipelines.quarantine import quarantine_record, UNRESOLVED_REFERENTIAL_ERROR, WRITE_ERROR
+from ogs_connectors.pipelines.staging_table import StagingColumns
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from tqdm import tqdm
+from typing import List, Dict, Iterable, Iterator, Tuple, Optional, Any, Union, Sequence
+from itertools import islice
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+
+# Write modes: plain inserts, or idempotent upserts keyed on the emission natural key
+INSERT_MODE = 'insert'
+UPSERT_MODE = 'upsert'
+WRITE_MODES = (INSERT_MODE, UPSERT_MODE)
+
+# Fields identifying an emission document
+NATURAL_KEY = ('geo_component_id', 'data_source_id', 'date', 'gas', 'sector')
+NATURAL_KEY_INDEX_NAME = 'emission_natural_key'
+NATURAL_KEY_INDEX_KEYS = [(key, ASCENDING) for key in NATURAL_KEY]
+# Staging partition an emission document was written from, used to delete the documents of its outdated row groups
+STAGING_PARTITION_FIELD = 'staging_partition'
+STAGING_PARTITION_INDEX_NAME = 'emission_staging_partition'
+STAGING_PARTITION_INDEX_KEYS = [
+    (STAGING_PARTITION_FIELD, ASCENDING), ('date', ASCENDING), ('geo_component_id', ASCENDING)
+]
+# Number of duplicated natural keys shown in the error raised when the natural key index can not be created
+MAX_DUPLICATE_EXAMPLES = 5
+
+
+def get_write_errors(error: BulkWriteError) -> List[Dict]:
+    """
+    Given a bulk write error, return its write errors, one per failed document
+    @param error: BulkWriteError
+    @return: list of dicts, write errors (index of the failed document in the batch and error message)
+    """
+    return error.details.get('writeErrors', [])
+
+
+def rejected_emissions(batch: Sequence[Dict], unresolved: List[Tuple[Dict, Exception]],
+                       write_errors: List[Dict], positions: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Given a batch of emissions, its emissions that could not be resolved against the referentials and the write
+    errors of its documents, return the quarantine records of the rejected emissions
+    @param batch: list of dicts or StagingColumns, staging emissions
+    @param unresolved: list of (emission, InsertEmissionError)
+    @param write_errors: list of dicts, write errors, indexed on the resolved emissions of the batch
+    @param positions: list of int, optional, position in the batch of each resolved emission
+    (see ReferentialIndex.resolve_columns)
+    @return: list of dicts, quarantine records
+    """
+    records = [
+        quarantine_record(emission, UNRESOLVED_REFERENTIAL_ERROR, e.path, str(e))
+        for emission, e in unresolved
+    ]
+    if write_errors and positions is not None:
+        resolved = [batch[position] for position in (positions[write_error['index']] for write_error in write_errors)]
+        records.extend(
+            quarantine_record(emission, WRITE_ERROR, message=write_error.get('errmsg'))
+            for emission, write_error in zip(resolved, write_errors)
+        )
+    elif write_errors:
+        unresolved_ids = {id(emission) for emission, _ in unresolved}
+        resolved = [emission for emission in batch if id(emission) not in unresolved_ids]
+        records.extend(
+            quarantine_record(resolved[write_error['index']], WRITE_ERROR, message=write_error.get('errmsg'))
+            for write_error in write_errors
+        )
+    return records
+
+
+def emission_batches(emissions: Iterable[Union[Dict, StagingColumns]],
+                     batch_size: int) -> Iterator[Union[List[Dict], StagingColumns]]:
+    """
+    Given emissions, yield them by batches of at most batch_size emissions. Emissions read column by column
+    (StagingColumns batches, e.g. from a Parquet staging partition) are kept as they are.
+    @param emissions: iterable of dicts or of StagingColumns
+    @param batch_size: int, maximum number of emissions per batch of dicts
+    @return: iterator of lists of dicts or of StagingColumns
+    """
+    batch = []
+    for emission in emissions:
+        if isinstance(emission, StagingColumns):
+            if batch:
+                yield batch
+                batch = []
+            yield emission
+            continue
+
+        batch.append(emission)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def resolve_batch(referential_index: ReferentialIndex, batch: Union[List[Dict], StagingColumns]) -> Tuple[
+        List[Dict], List[Tuple[Dict, Exception]], Optional[List[int]]]:
+    """
+    Given a batch of emissions, resolve it against the referentials, column by column for StagingColumns batches
+    @param referential_index: ReferentialIndex
+    @param batch: list of dicts or StagingColumns, staging emissions
+    @return: tuple, (documents to insert, list of (unresolved emission, error), positions of the documents
+    emissions in the batch, None for a batch of dicts)
+    """
+    if isinstance(batch, StagingColumns):
+        return referential_index.resolve_columns(batch)
+
+    documents, unresolved = referential_index.resolve(batch)
+    return documents, unresolved, None
+
+
+def duplicate_natural_keys_pipeline() -> List[Dict]:
+    """
+    @return: list of dicts, aggregation pipeline returning the natural keys shared by several emissions, with the
+    ids of these emissions (oldest first)
+    """
+    return [
+        {'$sort': {'_id': ASCENDING}},
+        {'$group': {
+            '_id': {key: '$' + key for key in NATURAL_KEY},
+            'count': {'$sum': 1},
+            'ids': {'$push': '$_id'}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+
+
+def duplicate_natural_keys_error(collection_name: str, duplicates: List[Dict]) -> DuplicateNaturalKeyError:
+    """
+    Given duplicated natural keys (see duplicate_natural_keys_pipeline), return the error explaining how to remove them
+    @param collection_name: str, emissions collection name
+    @param duplicates: list of dicts, examples of duplicated natural keys
+    @return: DuplicateNaturalKeyError
+    """
+    return DuplicateNaturalKeyError(
+        'Can not create the unique natural key index used by the upsert write_mode: collection %s holds several '
+        'emissions with the same natural key %s (e.g. %s), written by previous insert runs. Set '
+        'deduplicate_natural_keys: true in the relational_mongodb parameters to keep the last written emission of '
+        'each natural key and remove the others, for one run.'
+        % (collection_name, list(NATURAL_KEY), [duplicate['_id'] for duplicate in duplicates])
+    )
+
+
+def duplicate_ids(duplicates: Iterable[Dict]) -> List[Any]:
+    """
+    @param duplicates: iterable of dicts, duplicated natural keys (see duplicate_natural_keys_pipeline)
+    @return: list, ids of the emissions to remove, all but the last written of each natural key
+    """
+    return [emission_id for duplicate in duplicates for emission_id in duplicate['ids'][:-1]]
+
+
+def written_count(details: Dict[str, Any]) -> int:
+    """
+    Given the details of a BulkWriteError, return the number of documents written before it was raised
+    @param details: dict, BulkWriteError details
+    @return: int
+    """
+    return details.get('nInserted', 0) + details.get('nUpserted', 0) + details.get('nModified', 0)
+
+
+def tag_documents(documents: List[Dict], partition: str) -> None:
+    """
+    Record on emission documents the staging partition they are written from
+    @param documents: list of dicts, emission documents
+    @param partition: str, staging partition key
+    """
+    for document in documents:
+        document[STAGING_PARTITION_FIELD] = partition
+
+
+def upsert_requests(documents: List[Dict]) -> List[UpdateOne]:
+    """
+    Given emission documents, return the upsert requests matching them on their natural key
+    @param documents: list of dicts, emission documents
+    @return: list of UpdateOne
+    """
+    return [
+        UpdateOne(
+            {key: document[key] for key in NATURAL_KEY},
+            {'$set': document},
+            upsert=True
+        )
+        for document in documents
+    ]
+
+
+def manifest_to_document(partition: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Given a staging partition and its manifest, return the document recording it in the manifests collection
+    @param partition: str, staging partition key
+    @param manifest: dict, manifest
+    @return: dict, manifest document
+    """
+    # Groups are stored as a list, as group keys are not safe mongodb field names
+    return {
+        '_id': partition,
+        'hash': manifest['hash'],
+        'count': manifest.get('count'),
+        'groups': [{'key': key, 'hash': group_hash} for key, group_hash in manifest['groups'].items()]
+    }
+
+
+def document_to_manifest(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Given a document of the manifests collection, return the manifest it records, None if no document
+    @param document: dict, manifest document
+    @return: dict, manifest
+    """
+    if document is None:
+        return None
+
+    return {
+        'hash': document['hash'],
+        'count': document.get('count'),
+        'groups': {group['key']: group['hash'] for group in document['groups']}
+    }
+
+
+class BaseEmissionsWriter:
+    """
+    Writer session state and logic shared by EmissionsWriter (pymongo) and AsyncEmissionsWriter (motor), which only
+    implement the mongodb I/O
+    """
+
+    def __init__(self, mongodb_params: Dict, mongodb_credentials: Dict,
+                 identifier_types: Optional[List[str]] = None, data_source_names: Optional[List[str]] = None):
+        """
+        @param mongodb_params: dict, mongodb connection parameters
+        @param mongodb_credentials: dict, mongodb credentials
+        @param identifier_types: list of str, optional, only load geo_components identified by one of these types
+        @param data_source_names: list of str, optional, only load these data_sources
+        """
+        self._mongodb_params = mongodb_params
+        self._mongodb_credentials = mongodb_credentials
+        self._identifier_types = identifier_types
+        self._data_source_names = data_source_names
+        self._batch_size = mongodb_params.get('batch_size', DEFAULT_BATCH_SIZE)
+        self._write_mode = mongodb_params.get('write_mode', INSERT_MODE)
+        if self._write_mode not in WRITE_MODES:
+            raise ValueError('Unknown write_mode: %s (expected one of %s)' % (self._write_mode, WRITE_MODES))
+        self._client = None
+        self._referential_index = None
+        self._natural_key_index_ready = False
+        self._staging_partition_index_ready = False
+
+    def open(self) -> None:
+        raise NotImplementedError
+
+    def get_collection(self, collection_param: str):
+        """
+        Given a collection parameter name, return the associated collection of the database
+        @param collection_param: str, name of the parameter holding the collection name
+        @return: pymongo (or motor) collection
+        """
+        self.open()
+        db = self._client.get_database(self._mongodb_params.get('database_name'))
+        return db[self._mongodb_params.get(collection_param)]
+
+    @property
+    def write_mode(self) -> str:
+        return self._write_mode
+
+    @property
+    def referential_updated_at_field(self) -> Optional[str]:
+        return self._mongodb_params.get('referential_updated_at_field')
+
+    def referential_cache(self) -> Tuple[Optional[ReferentialCache], Optional[str]]:
+        """
+        @return: tuple, (on-disk referential cache, key of the session referentials), (None, None) without cache_dir
+        """
+        cache_dir = self._mongodb_params.get('referential_cache_dir')
+        if not cache_dir:
+            return None, None
+
+        cache = ReferentialCache(cache_dir, self.referential_updated_at_field)
+        return cache, cache.entry_key(
+            self._mongodb_params, self._mongodb_credentials, self._identifier_types, self._data_source_names
+        )
+
+    @property
+    def deduplicate_natural_keys(self) -> bool:
+        return self._mongodb_params.get('deduplicate_natural_keys', False)
+
+    def duplicates_to_delete(self, collection_name: str, duplicates: List[Dict]) -> List[Any]:
+        """
+        Given the emissions sharing a natural key, found before creating the natural key index, return the ids of the
+        emissions to delete if deduplicate_natural_keys is set, otherwise raise a DuplicateNaturalKeyError
+        @param collection_name: str, name of the emissions collection
+        @param duplicates: list of dicts, see duplicate_natural_keys_pipeline (at least MAX_DUPLICATE_EXAMPLES of them
+        if any, all of them if deduplicate_natural_keys is set)
+        @return: list, ids of the emissions to delete
+        """
+        if self.deduplicate_natural_keys:
+            return duplicate_ids(duplicates)
+        if duplicates:
+            raise duplicate_natural_keys_error(collection_name, duplicates[:MAX_DUPLICATE_EXAMPLES])
+        return []
+
+
+class EmissionsWriter(BaseEmissionsWriter):
+    """
+    Writer session shared by all the partitions of a mongodb_write run.
+    Opens a single (pooled) mongodb client and loads the referentials once, so that connection and
+    referential transfer costs do not grow with the number of partitions to insert.
+    """
+
+    def __init__(self, mongodb_params: Dict, mongodb_credentials: Dict,
+                 identifier_types: Optional[List[str]] = None, data_source_names: Optional[List[str]] = None):
+        """
+        @param mongodb_params: dict, mongodb connection parameters
+        @param mongodb_credentials: dict, mongodb credentials
+        @param identifier_types: list of str, optional, only load geo_components identified by one of these types
+        @param data_source_names: list of str, optional, only load these data_sources
+        """
+        super().__init__(mongodb_params, mongodb_credentials, identifier_types, data_source_names)
+        # The writer session is shared by concurrent partition writers
+        self._lock = threading.RLock()
+
+    def __enter__(self) -> 'EmissionsWriter':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def open(self) -> None:
+        """
+        Open the mongodb client, if not already opened
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = get_mongodb_client(
+                    mongodb_params=self._mongodb_params,
+                    mongodb_credentials=self._mongodb_credentials
+                )
+
+    def close(self) -> None:
+        """
+        Close the mongodb client and release the pooled connections
+        """
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def get_written_manifest(self, partition: str) -> Optional[Dict[str, Any]]:
+        """
+        Given a staging partition, return the manifest of its last complete write, None if never written
+        @param partition: str, staging partition key
+        @return: dict, manifest
+        """
+        return document_to_manifest(
+            self.get_collection('manifests_collection_name').find_one({'_id': partition})
+        )
+
+    def get_written_manifests(self, partitions: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Given staging partitions, return the manifests of their last complete writes, in a single query
+        @param partitions: list of str, staging partition keys
+        @return: dict, partition key -> manifest, for the written partitions
+        """
+        documents = self.get_collection('manifests_collection_name').find({'_id': {'$in': partitions}})
+        return {document['_id']: document_to_manifest(document) for document in documents}
+
+    def save_written_manifest(self, partition: str, manifest: Dict[str, Any]) -> None:
+        """
+        Given a staging partition and its manifest, record it as written
+        @param partition: str, staging partition key
+        @param manifest: dict, manifest of the written partition
+        """
+        self.get_collection('manifests_collection_name').replace_one(
+            {'_id': partition},
+            manifest_to_document(partition, manifest),
+            upsert=True
+        )
+
+    @property
+    def referential_index(self) -> ReferentialIndex:
+        """
+        Referential index, loaded once per writer session
+        """
+        if self._referential_index is None:
+            with self._lock:
+                if self._referential_index is None:
+                    self.ensure_referential_indexes()
+                    self._referential_index = self._load_referential_index()
+        return self._referential_index
+
+    def _load_referential_index(self) -> ReferentialIndex:
+        """
+        Load the referential index from the on-disk cache if its fingerprint is unchanged,
+        otherwise from the referential collections (and refresh the cache)
+        @return: ReferentialIndex
+        """
+        geo_components_collection = self.get_collection('geo_components_collection_name')
+        data_sources_collection = self.get_collection('data_sources_collection_name')
+
+        def fetch_referential_index() -> ReferentialIndex:
+            return ReferentialIndex(
+                geo_components=get_geo_components(geo_components_collection, self._identifier_types),
+                data_sources=get_data_sources(data_sources_collection, self._data_source_names)
+            )
+
+        cache, key = self.referential_cache()
+        if cache is None:
+            return fetch_referential_index()
+
+        fingerprint = get_referential_fingerprint(
+            geo_components_collection, data_sources_collection,
+            self._identifier_types, self._data_source_names,
+            updated_at_field=self.referential_updated_at_field
+        )
+
+        referential_index = cache.load(key, fingerprint)
+        if referential_index is None:
+            referential_index = fetch_referential_index()
+            cache.save(key, fingerprint, referential_index)
+        return referential_index
+
+    def ensure_referential_indexes(self) -> None:
+        """
+        Index the referential lookup keys, so that filtered referential loads stay fast as the referentials grow.
+        No-op for already existing indexes.
+        """
+        geo_components_fields, data_sources_fields = referential_indexes(self._identifier_types)
+        geo_components_collection = self.get_collection('geo_components_collection_name')
+        for field in geo_components_fields:
+            geo_components_collection.create_index([(field, ASCENDING)], sparse=True)
+
+        data_sources_collection = self.get_collection('data_sources_collection_name')
+        for field in data_sources_fields:
+            data_sources_collection.create_index([(field, ASCENDING)])
+
+    @staticmethod
+    def _insert_batch(emissions_collection, documents: List[Dict]) -> Tuple[int, List[Dict]]:
+        """
+        Unordered bulk insert of a batch of documents: a failing document does not stop the rest of the batch
+        @param emissions_collection: pymongo collection
+        @param documents: list of dicts, documents to insert
+        @return: tuple, (number of inserted documents, write errors of the failed documents)
+        """
+        try:
+            result = emissions_collection.insert_many(documents, ordered=False)
+            return len(result.inserted_ids), []
+        except BulkWriteError as e:
+            return written_count(e.details), get_write_errors(e)
+
+    @staticmethod
+    def _upsert_batch(emissions_collection, documents: List[Dict]) -> Tuple[int, List[Dict]]:
+        """
+        Unordered bulk upsert of a batch of documents, matched on their natural key.
+        Documents already present with the same content are left untouched.
+        @param emissions_collection: pymongo collection
+        @param documents: list of dicts, documents to upsert
+        @return: tuple, (number of inserted or updated documents, write errors of the failed documents)
+        """
+        try:
+            result = emissions_collection.bulk_write(upsert_requests(documents), ordered=False)
+            return result.upserted_count + result.modified_count, []
+        except BulkWriteError as e:
+            return written_count(e.details), get_write_errors(e)
+
+    def ensure_natural_key_index(self) -> None:
+        """
+        Create the unique compound index on the emission natural key, used by upserts. Done once per session.
+        If the index does not exist yet, emissions sharing a natural key (written in insert mode) are removed first
+        when deduplicate_natural_keys is set, otherwise a DuplicateNaturalKeyError is raised.
+        """
+        with self._lock:
+            if self._natural_key_index_ready:
+                return
+
+            emissions_collection = self.get_collection('emissions_collection_name')
+            if NATURAL_KEY_INDEX_NAME not in emissions_collection.index_information():
+                duplicates = emissions_collection.aggregate(duplicate_natural_keys_pipeline(), allowDiskUse=True)
+                if not self.deduplicate_natural_keys:
+                    duplicates = islice(duplicates, MAX_DUPLICATE_EXAMPLES)
+                ids = self.duplicates_to_delete(emissions_collection.name, list(duplicates))
+                if ids:
+                    emissions_collection.delete_many({'_id': {'$in': ids}})
+                    logger.warning('Removed %s emissions sharing their natural key with a later one.', len(ids))
+
+            emissions_collection.create_index(NATURAL_KEY_INDEX_KEYS, unique=True, name=NATURAL_KEY_INDEX_NAME)
+            self._natural_key_index_ready = True
+
+    def delete_documents(self, filters: List[Dict]) -> int:
+        """
+        Given the filters of outdated emission documents (see incremental.outdated_documents_filters), delete them
+        @param filters: list of dicts, mongodb filters on the staging partition, date and geo_component_id
+        @return: int, number of deleted documents
+        """
+        emissions_collection = self.get_collection('emissions_collection_name')
+        with self._lock:
+            if not self._staging_partition_index_ready:
+                emissions_collection.create_index(STAGING_PARTITION_INDEX_KEYS, name=STAGING_PARTITION_INDEX_NAME)
+                self._staging_partition_index_ready = True
+
+        return sum(emissions_collection.delete_many(query).deleted_count for query in filters)
+
+    def insert_emissions(self, emissions: Iterable[Union[Dict, StagingColumns]],
+                         rejected_rows: Optional[List[Dict]] = None,
+                         partition: Optional[str] = None) -> Dict[str, int]:
+        """
+        Given emissions, insert (or upsert, depending on the write_mode) them into the emissions_collection
+        by batches of batch_size documents, so that only one batch of documents is held in memory at a time
+        @param emissions: iterable of dicts, emissions, or of StagingColumns batches whose documents are built from
+        the columns
+        @param rejected_rows: list, optional, receives the quarantine records of the emissions that failed
+        @param partition: str, optional, staging partition of the emissions, recorded on their documents
+        @return: dict, number of inserted and failed emissions
+        """
+        emissions_collection = self.get_collection('emissions_collection_name')
+        stats = {'inserted': 0, 'failed': 0}
+
+        if self._write_mode == UPSERT_MODE:
+            self.ensure_natural_key_index()
+            write_batch = self._upsert_batch
+        else:
+            write_batch = self._insert_batch
+
+        for batch_number, batch in enumerate(emission_batches(tqdm(emissions), self._batch_size)):
+            # Create documents to insert out of emissions
+            documents, unresolved, positions = resolve_batch(self.referential_index, batch)
+            if partition is not None:
+                tag_documents(documents, partition)
+
+            nb_inserted, write_errors = (0, [])
+            if documents:
+                nb_inserted, write_errors = write_batch(emissions_collection, documents)
+
+            records = rejected_emissions(batch, unresolved, write_errors, positions)
+            if rejected_rows is not None:
+                rejected_rows.extend(records)
+            nb_failed = len(records)
+
+            logger.debug('Batch %s: inserted %s, failed %s.' % (batch_number, nb_inserted, nb_failed))
+            stats['inserted'] += nb_inserted
+            stats['failed'] += nb_failed
+
+        logger.info('Succesfully wrote %s emissions.' % stats['inserted'])
+        if stats['failed']:
+            logger.warning('Failed to insert %s emissions.' % stats['failed'])
+
+        return stats
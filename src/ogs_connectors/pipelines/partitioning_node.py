@@ -1,55 +1,321 @@
 from kedro.pipeline import node
-from typing import List, Any, Callable, Dict
+from typing import List, Any, Callable, Dict, Optional, Tuple, Union, Iterable, Iterator
+from urllib.parse import quote
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from .manifest import build_manifest, stream_with_manifest
+from ogs_connectors.batching import iter_records
 import logging
 
 logger = logging.getLogger(__name__)
 
+PARTITION_FILENAME = 'data.json'
 
-def partition_function_constructor(keys: List[str]) -> Callable:
+# Partition key markers: record field value ($field), or year of a %Y-%m-%d date field ($year)
+FIELD_MARKER = '$field'
+YEAR_MARKER = '$year'
+
+# Number of streamed records held in memory, all partitions together, before they are spilled to local files
+SPILL_MAX_RECORDS = 10000
+
+
+class FieldGetter:
+    """
+    Record field getter, picklable (see partition_key_getter)
+    """
+
+    def __init__(self, path: str):
+        """
+        @param path: str, record field path, fields separated by dots (e.g. emission.gas)
+        """
+        self._keys = path.split('.')
+
+    def __call__(self, record: Dict) -> Any:
+        for key in self._keys:
+            record = record[key]
+        return record
+
+
+class YearGetter(FieldGetter):
+    """
+    Getter of the year of a %Y-%m-%d date record field
+    """
+
+    def __call__(self, record: Dict) -> str:
+        return super().__call__(record)[:4]
+
+
+def partition_key_getter(key: Union[str, Dict[str, str]]) -> Tuple[Optional[str], Optional[Callable[[Dict], Any]]]:
+    """
+    Given a partition key, return its name and the function computing its value out of a record
+    @param key: str, constant partition key, or dict, data-driven partition key: {$field: path} or {$year: path},
+    with an optional name (default: last field of the path, or year)
+    @return: tuple, (name, value getter), (None, None) for a constant key
+    """
+    if isinstance(key, str):
+        return None, None
+
+    if FIELD_MARKER in key:
+        path = key[FIELD_MARKER]
+        return key.get('name', path.split('.')[-1]), FieldGetter(path)
+
+    if YEAR_MARKER in key:
+        return key.get('name', 'year'), YearGetter(key[YEAR_MARKER])
+
+    raise ValueError('Unknown partition key: %s' % key)
+
+
+def partition_path(keys: List[Union[str, Dict[str, str]]], values: Iterable[Any]) -> str:
+    """
+    Given partition keys and the values of the data-driven ones, return the partition path.
+    Data-driven keys are written as name=value (quoted, to be path safe), constant keys as they are.
+    @param keys: list, partition keys (see partition_key_getter)
+    @param values: iterable, value of each data-driven key, in order
+    @return: str, partition path (e.g. wri_unfccc/year=1990/gas=CO2/data.json)
     """
-    Given a list of keys, return a function that partitions according to the list of keys
-    @param keys: list of str, partition keys
-    @return:
+    values = iter(values)
+    segments = []
+    for key in keys:
+        name, _ = partition_key_getter(key)
+        segments.append(key if name is None else '%s=%s' % (name, quote(str(next(values)), safe='')))
+    return '/'.join(segments + [PARTITION_FILENAME])
+
+
+def group_records(records: Iterable[Dict], getters: List[Callable[[Dict], Any]]) -> Dict[Tuple, List[Dict]]:
+    """
+    Given records and the getters of the data-driven partition keys, group the records in a single pass
+    @param records: iterable of dicts, records
+    @param getters: list of callables, data-driven partition keys getters
+    @return: dict, partition key values -> records, in order
     """
-    def partition_function(content: Any) -> Dict[str, Any]:
+    groups = {}
+    if len(getters) == 1:
+        get = getters[0]
+        for record in records:
+            groups.setdefault((get(record),), []).append(record)
+        return groups
+
+    for record in records:
+        groups.setdefault(tuple(get(record) for get in getters), []).append(record)
+    return groups
+
+
+class SpilledGroups:
+    """
+    Streamed records grouped by partition key values. As records arrive, once max_records records are held in
+    memory (whatever the number of groups), every group is spilled to its local temporary file. Each group is then
+    read back once, while its partition is saved; its file is removed once read, and the directory when the groups
+    are garbage collected.
+    """
+
+    def __init__(self, max_records: int):
+        """
+        @param max_records: int, number of records held in memory, all groups together, before they are spilled
         """
-        Given content, returns a dictionary of a single key value pair.
-        Key being the complete partition, value being the content
-        @param content: any, content to partition
+        self._max_records = max_records
+        self._nb_records = 0
+        self._batches = {}
+        self._paths = {}
+        self._directory = tempfile.mkdtemp(prefix='ogs_partitions_')
+        weakref.finalize(self, shutil.rmtree, self._directory, ignore_errors=True)
+
+    def add(self, values: Tuple, record: Dict) -> None:
+        """
+        @param values: tuple, partition key values of the record
+        @param record: dict, record
+        """
+        self._batches.setdefault(values, []).append(record)
+        self._nb_records += 1
+        if self._nb_records >= self._max_records:
+            self._spill()
+
+    def _spill(self) -> None:
+        for values, batch in self._batches.items():
+            if not batch:
+                continue
+            path = self._paths.get(values)
+            if path is None:
+                path = self._paths[values] = os.path.join(self._directory, '%s.pickle' % len(self._paths))
+            with open(path, 'ab') as f:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._batches[values] = []
+        self._nb_records = 0
+
+    def keys(self) -> List[Tuple]:
+        """
+        @return: list of tuples, partition key values of the groups, in order of appearance
+        """
+        return list(self._batches)
+
+    def _read_group(self, values: Tuple) -> Iterator[Dict]:
+        path = self._paths.pop(values, None)
+        if path is not None:
+            try:
+                with open(path, 'rb') as f:
+                    while True:
+                        try:
+                            batch = pickle.load(f)
+                        except EOFError:
+                            break
+                        yield from batch
+            finally:
+                os.remove(path)
+        # Last records of the group, that were not spilled
+        batch = self._batches.pop(values)
+        self._nb_records -= len(batch)
+        yield from batch
+
+    def release(self, values: Tuple) -> Callable[[], Iterator[Dict]]:
+        """
+        Given partition key values, return a lazy partition: a callable yielding the records of the group, which is
+        dropped once it is consumed
+        @param values: tuple, partition key values of the group
+        @return: callable, returning an iterator of records
+        """
+        def load_group() -> Iterator[Dict]:
+            return self._read_group(values)
+
+        return load_group
+
+
+class PartitionFunction:
+    """
+    Partitioning according to a list of keys. Keys are constants (e.g. the data source), or record fields (see
+    partition_key_getter), records being then grouped in as many partitions as distinct values, under deterministic
+    paths. A class rather than a closure, so that nodes can be pickled (e.g. by the ParallelRunner).
+    """
+
+    def __init__(self, keys: List[Union[str, Dict[str, str]]], spill_max_records: int = SPILL_MAX_RECORDS):
+        """
+        @param keys: list of str or dicts, partition keys
+        @param spill_max_records: int, number of streamed records held in memory, all partitions together (see
+        SpilledGroups)
+        """
+        self.keys = keys
+        self._spill_max_records = spill_max_records
+        self._getters = [getter for _, getter in map(partition_key_getter, keys) if getter is not None]
+
+    def __call__(self, content: Any) -> Dict[str, Any]:
+        """
+        Given content, returns a dictionary of partitions: key being the complete partition, value being its
+        content. Without data-driven keys, the whole content is a single partition.
+        Streamed content is grouped in a single pass, its groups being spilled to local files as records arrive (see
+        SpilledGroups), and its partitions are callables yielding their records, read back while they are saved.
+        @param content: list of dicts, or streamed content (iterable of rows or of rows batches)
         @return: dict
         """
+        if not self._getters:
+            return {
+                partition_path(self.keys, []): content
+            }
+
+        if isinstance(content, list):
+            return {
+                partition_path(self.keys, values): records
+                for values, records in group_records(content, self._getters).items()
+            }
+
+        groups = SpilledGroups(self._spill_max_records)
+        for record in iter_records(content):
+            groups.add(tuple(get(record) for get in self._getters), record)
         return {
-            '{partitions}/data.json'.format(
-                partitions='/'.join(keys)
-            ): content
+            partition_path(self.keys, values): groups.release(values)
+            for values in groups.keys()
         }
 
-    return partition_function
+
+class ManifestPartitionFunction(PartitionFunction):
+    """
+    Partitioning according to a list of keys (as PartitionFunction), also returning the content-hash manifest of
+    each partition
+    """
+
+    def __call__(self, content: Any) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Given content, returns the partitions (as PartitionFunction) and their manifests, under the same keys.
+        Streamed content is kept lazy: each manifest is then built while its partition is saved, and is complete
+        once it is (partitions must be saved before manifests).
+        @param content: list of dicts, or streamed content (iterable of rows or of rows batches)
+        @return: tuple of dicts, (partitions, manifests)
+        """
+        partitions = super().__call__(content)
+
+        if not isinstance(content, list):
+            manifests = {partition: {} for partition in partitions}
+            partitions = {
+                partition: stream_with_manifest(
+                    iter_records(partition_content() if callable(partition_content) else partition_content),
+                    manifests[partition]
+                )
+                for partition, partition_content in partitions.items()
+            }
+            return partitions, manifests
+
+        manifests = {
+            partition: build_manifest(partition_content)
+            for partition, partition_content in partitions.items()
+        }
+        return partitions, manifests
 
 
-def partitioning_node_constructor(keys: List[str]) -> node:
+def partition_function_constructor(keys: List[Union[str, Dict[str, str]]]) -> PartitionFunction:
+    """
+    Given a list of keys, return a function that partitions according to the list of keys (see PartitionFunction)
+    @param keys: list of str or dicts, partition keys
+    @return: PartitionFunction
+    """
+    return PartitionFunction(keys)
+
+
+def manifest_partition_function_constructor(keys: List[Union[str, Dict[str, str]]]) -> ManifestPartitionFunction:
+    """
+    Given a list of keys, return a function that partitions according to the list of keys, and also returns the
+    content-hash manifest of each partition (see ManifestPartitionFunction)
+    @param keys: list of str or dicts, partition keys
+    @return: ManifestPartitionFunction
+    """
+    return ManifestPartitionFunction(keys)
+
+
+def partitioning_node_constructor(keys: List[Union[str, Dict[str, str]]]) -> node:
     """
     Given a list of partition keys, return a function that allows the creation of a partitioning node, from an input
     dataset to an output dataset
-    @param keys: list of str, list of keys to partition the dataset
+    @param keys: list of str or dicts, list of keys to partition the dataset (see partition_function_constructor)
     @return: callable, function returning a kedro node
     """
     partition_function = partition_function_constructor(keys)
+    manifest_partition_function = manifest_partition_function_constructor(keys)
 
-    def partitioning_node(input_dataset_name, output_dataset_name) -> Callable:
+    def partitioning_node(input_dataset_name, output_dataset_name, manifest_dataset_name: Optional[str] = None):
         """
         Given an input dataset name and an output dataset name (as defined in the data catalog), return a node that
         applies partitioning
         @param input_dataset_name: str, name of a dataset as defined in the data catalog
         @param output_dataset_name: str, name of a dataset as defined in the data catalog
+        @param manifest_dataset_name: str, optional, name of the dataset receiving the partitions manifests
         @return: kedro node, node to be added in a pipeline
         """
+        if manifest_dataset_name is None:
+            return node(
+                func=partition_function,
+                inputs=dict(
+                    content=input_dataset_name,
+                ),
+                outputs=output_dataset_name,
+                name='%s_partitioning' % input_dataset_name
+            )
+
         return node(
-            func=partition_function,
+            func=manifest_partition_function,
             inputs=dict(
                 content=input_dataset_name,
             ),
-            outputs=output_dataset_name
+            outputs=[output_dataset_name, manifest_dataset_name],
+            name='%s_partitioning' % input_dataset_name
         )
 
     return partitioning_node
@@ -0,0 +1,66 @@
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_EXAMPLES = 5
+
+# Reason codes of the quarantined rows
+COLUMN_VALIDATION_ERROR = 'column_validation'
+SCHEMA_VALIDATION_ERROR = 'schema_validation'
+UNRESOLVED_REFERENTIAL_ERROR = 'unresolved_referential'
+WRITE_ERROR = 'write_error'
+
+
+def quarantine_record(row: Any, reason: str, path: Optional[str] = None, message: Optional[str] = None) -> Dict:
+    """
+    Given a rejected row, return its quarantine record
+    @param row: rejected row, as received by the rejecting node
+    @param reason: str, reason code
+    @param path: str, optional, path of the field in error, fields separated by dots
+    @param message: str, optional, error message
+    @return: dict, quarantine record
+    """
+    return {
+        'reason': reason,
+        'path': path,
+        'message': message,
+        'row': row
+    }
+
+
+def summarize_rejected_rows(rejected_rows: List[Dict], max_examples: int = DEFAULT_MAX_EXAMPLES) -> Dict[str, Any]:
+    """
+    Given quarantine records, return a compact summary: number of records per reason and path,
+    and the messages of the first records
+    @param rejected_rows: list of dicts, quarantine records
+    @param max_examples: int, number of example messages
+    @return: dict, summary
+    """
+    counts = Counter(
+        '%s:%s' % (record['reason'], record['path']) if record['path'] else record['reason']
+        for record in rejected_rows
+    )
+    return {
+        'count': len(rejected_rows),
+        'errors': dict(counts.most_common()),
+        'examples': [record['message'] for record in rejected_rows[:max_examples]]
+    }
+
+
+def log_rejected_rows(rejected_rows: List[Dict], total: int, max_examples: int = DEFAULT_MAX_EXAMPLES) -> None:
+    """
+    Log the summary of the rejected rows, once, instead of one error per row
+    @param rejected_rows: list of dicts, quarantine records
+    @param total: int, number of rows processed, rejected ones included
+    @param max_examples: int, number of example messages
+    """
+    if not rejected_rows:
+        return
+
+    summary = summarize_rejected_rows(rejected_rows, max_examples)
+    logger.warning('Rejected %s rows (Out of %s), see the quarantine dataset for details: %s. First errors: %s' % (
+        summary['count'], total, summary['errors'], summary['examples']
+    ))
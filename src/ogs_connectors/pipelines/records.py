@@ -0,0 +1,139 @@
+from copy import deepcopy
+from operator import itemgetter
+from typing import Dict, List, Any, Callable, Tuple, Iterator, Sequence
+import datetime
+import pandas as pd
+
+
+class Column:
+    """
+    Record template field taken as is from a dataframe column
+    """
+
+    def __init__(self, name: str):
+        """
+        @param name: str, column name
+        """
+        self.name = name
+
+    def values(self, df: pd.DataFrame) -> List[Any]:
+        """
+        @param df: pandas DataFrame
+        @return: list, field value of each row
+        """
+        return df[self.name].tolist()
+
+
+class Mapped(Column):
+    """
+    Record template field mapped from a dataframe column through a dict (e.g. sector or gas names).
+    Each distinct value is looked up once; unknown values raise a KeyError, as a per row lookup would.
+    """
+
+    def __init__(self, name: str, mapping: Dict[Any, Any]):
+        """
+        @param name: str, column name
+        @param mapping: dict, column value -> field value
+        """
+        super().__init__(name)
+        self.mapping = mapping
+
+    def lookup(self, value: Any) -> Any:
+        return self.mapping[value]
+
+    def values(self, df: pd.DataFrame) -> List[Any]:
+        column = df[self.name]
+        lookup = {value: self.lookup(value) for value in column.unique()}
+        return column.map(lookup).tolist()
+
+
+class YearDate(Mapped):
+    """
+    Record template field holding the first day of the year of a year column, formatted as %Y-%m-%d.
+    Dates are formatted once per distinct year.
+    """
+
+    def __init__(self, name: str):
+        """
+        @param name: str, year column name
+        """
+        super().__init__(name, mapping={})
+
+    def lookup(self, value: Any) -> str:
+        return datetime.datetime(value, 1, 1).strftime('%Y-%m-%d')
+
+
+def _template_builder(template: Any, fields: List[Column]) -> Callable[[Sequence[Any]], Any]:
+    """
+    Given a record template, return the function building its value out of the fields values, fields being
+    referenced by their position
+    @param template: record template, or sub template
+    @param fields: list, receives the template fields, in order
+    @return: callable, builder taking the values of all the template fields
+    """
+    if isinstance(template, dict):
+        builders = [(key, _template_builder(value, fields)) for key, value in template.items()]
+        return lambda values: {key: build(values) for key, build in builders}
+    if isinstance(template, Column):
+        fields.append(template)
+        return itemgetter(len(fields) - 1)
+    if isinstance(template, (list, set)):
+        # Records do not share mutable constants
+        return lambda values: deepcopy(template)
+    return lambda values: template
+
+
+def compile_template(template: Dict) -> Tuple[Callable, List[Column]]:
+    """
+    Given a record template, a nested dict whose leaves are constants or fields (Column, Mapped, YearDate),
+    return a function building one record out of its fields values, and the fields
+    @param template: dict, record template
+    @return: tuple, (record builder taking the sequence of the fields values, fields)
+    """
+    fields = []
+    return _template_builder(deepcopy(template), fields), fields
+
+
+def _assemble_records(build_record: Callable, fields: List[Column], df: pd.DataFrame) -> List[Dict]:
+    """
+    Given a compiled template and a dataframe, compute each field for the whole dataframe, then assemble the records
+    @param build_record: callable, record builder taking the sequence of the fields values
+    @param fields: list, template fields
+    @param df: pandas DataFrame
+    @return: list of dicts, records
+    """
+    if not fields:
+        return [build_record(()) for _ in range(len(df))]
+
+    columns = [field.values(df) for field in fields]
+    return [build_record(values) for values in zip(*columns)]
+
+
+def build_records(df: pd.DataFrame, template: Dict) -> List[Dict]:
+    """
+    Given a dataframe and a record template, build one record per row.
+    Records are built column by column: each field is computed for the whole dataframe at once, then records are
+    assembled by the compiled template, row by row.
+    @param df: pandas DataFrame
+    @param template: dict, record template
+    @return: list of dicts, records
+    """
+    build_record, fields = compile_template(template)
+    return _assemble_records(build_record, fields, df)
+
+
+def build_record_batches(df: pd.DataFrame, template: Dict, batch_size: int) -> Iterator[List[Dict]]:
+    """
+    Given a dataframe and a record template, lazily build the records by batches of batch_size rows,
+    so that only one batch of records is held in memory at a time
+    @param df: pandas DataFrame
+    @param template: dict, record template
+    @param batch_size: int, number of records per batch
+    @return: iterator of lists of dicts, records batches
+    """
+    if batch_size < 1:
+        raise ValueError('batch_size must be a positive integer, got: %s' % batch_size)
+
+    build_record, fields = compile_template(template)
+    for start in range(0, len(df), batch_size):
+        yield _assemble_records(build_record, fields, df.iloc[start:start + batch_size])
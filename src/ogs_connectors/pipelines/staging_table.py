@@ -0,0 +1,140 @@
+from .records import Column, compile_template
+from collections.abc import Sequence
+from typing import Dict, List, Any, Iterable, Optional
+
+# Separator of the flattened field paths (e.g. emission.unit.unit_used)
+PATH_SEPARATOR = '.'
+
+
+def flatten_record(record: Dict, prefix: str = '', flat: Optional[Dict] = None) -> Dict[str, Any]:
+    """
+    Given a staging record, return its leaves by path
+    @param record: dict, staging record, or sub record
+    @param prefix: str, path of the sub record
+    @param flat: dict, optional, receives the leaves
+    @return: dict, leaf path -> value
+    """
+    flat = {} if flat is None else flat
+    for key, value in record.items():
+        path = prefix + key
+        if isinstance(value, dict):
+            flatten_record(value, path + PATH_SEPARATOR, flat)
+        else:
+            flat[path] = value
+    return flat
+
+
+def unflatten_paths(paths: Iterable[str], prefix: str = '') -> Dict:
+    """
+    Given leaf paths, return the record template (see records.build_records) taking each leaf from its column
+    @param paths: iterable of str, leaf paths, starting with prefix
+    @param prefix: str, path of the sub record to rebuild, '' for whole records
+    @return: dict, record template
+    """
+    template = {}
+    for path in paths:
+        keys = path[len(prefix):].split(PATH_SEPARATOR)
+        sub_template = template
+        for key in keys[:-1]:
+            sub_template = sub_template.setdefault(key, {})
+        sub_template[keys[-1]] = Column(path)
+    return template
+
+
+def _prune_nulls(record: Dict, keys: List[str]) -> None:
+    """
+    Remove a null leaf from a record, and the sub records it leaves empty
+    @param record: dict, record
+    @param keys: list of str, leaf path, split
+    """
+    if len(keys) == 1:
+        if record.get(keys[0], 0) is None:
+            del record[keys[0]]
+        return
+
+    sub_record = record.get(keys[0])
+    if isinstance(sub_record, dict):
+        _prune_nulls(sub_record, keys[1:])
+        if not sub_record:
+            del record[keys[0]]
+
+
+class StagingColumns(Sequence):
+    """
+    Batch of staging records stored column by column, one column per leaf path (e.g. emission.gas).
+    Missing fields are stored as nulls: the mapping to and from records is lossless, except for None values and
+    empty dicts, which are not kept. Records are only built when the batch is read as a sequence; columns can be
+    read directly (e.g. to build mongodb documents).
+    """
+
+    def __init__(self, columns: Dict[str, List[Any]]):
+        """
+        @param columns: dict, leaf path -> values, all of the same length
+        """
+        self.columns = columns
+        self._length = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> 'StagingColumns':
+        """
+        @param records: list of dicts, staging records
+        @return: StagingColumns
+        """
+        flat_records = [flatten_record(record) for record in records]
+        paths = {}
+        for flat_record in flat_records:
+            paths.update(dict.fromkeys(flat_record))
+        return cls({path: [flat_record.get(path) for flat_record in flat_records] for path in paths})
+
+    def __len__(self) -> int:
+        return self._length
+
+    def take(self, positions: List[int]) -> 'StagingColumns':
+        """
+        @param positions: list of int, positions of the records to keep, in order
+        @return: StagingColumns, batch of the kept records
+        """
+        return StagingColumns({path: [values[i] for i in positions] for path, values in self.columns.items()})
+
+    def column(self, path: str) -> List[Any]:
+        """
+        @param path: str, leaf path
+        @return: list, leaf values
+        """
+        return self.columns[path]
+
+    def records(self, prefix: str = '') -> List[Dict]:
+        """
+        Given a path prefix, build the sub records under it, column by column
+        @param prefix: str, path of the sub records (e.g. 'emission.unit.'), '' for whole records
+        @return: list of dicts, (sub) records
+        """
+        paths = [path for path in self.columns if path.startswith(prefix)]
+        build_record, fields = compile_template(unflatten_paths(paths, prefix))
+        if not fields:
+            return [build_record(()) for _ in range(len(self))]
+
+        records = [build_record(values) for values in zip(*[self.columns[field.name] for field in fields])]
+
+        nullable_paths = [path[len(prefix):].split(PATH_SEPARATOR) for path in paths if None in self.columns[path]]
+        if nullable_paths:
+            for record in records:
+                for keys in nullable_paths:
+                    _prune_nulls(record, keys)
+        return records
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return StagingColumns({path: values[position] for path, values in self.columns.items()})
+        record = {}
+        for path, values in self.columns.items():
+            if values[position] is not None:
+                keys = path.split(PATH_SEPARATOR)
+                sub_record = record
+                for key in keys[:-1]:
+                    sub_record = sub_record.setdefault(key, {})
+                sub_record[keys[-1]] = values[position]
+        return record
+
+    def __iter__(self):
+        return iter(self.records())
@@ -1,65 +1,246 @@
+from concurrent.futures import ProcessPoolExecutor
 from kedro.pipeline import node
-import jsonschema
-from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+from ogs_connectors.batching import iter_batches
+from ogs_connectors.extras.datasets.json_lines_dataset import parse_context
+from .quarantine import quarantine_record, log_rejected_rows, SCHEMA_VALIDATION_ERROR, DEFAULT_MAX_EXAMPLES
 from tqdm import tqdm
-from typing import List
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator, Union
+import hashlib
+import json
+import os
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 10000
 
-def validate_rows(rows: List[dict], schema: dict):
+# Compiled validators, by schema content hash
+_validators: Dict[str, object] = {}
+
+# Validator of a validation worker process, compiled once by the pool initializer
+_worker_validator = None
+
+
+def schema_hash(schema: dict) -> str:
+    """
+    Given a schema, return a hash of its content, independent of the keys ordering
+    @param schema: dict, jsonschema
+    @return: str, hex digest
+    """
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode('utf8')).hexdigest()
+
+
+def get_validator(schema: dict):
+    """
+    Given a schema, return its validator. The schema is checked and its validator built only once per run,
+    then reused for every row and every pipeline validating against the same schema.
+    @param schema: dict, jsonschema
+    @return: jsonschema validator
+    """
+    key = schema_hash(schema)
+    validator = _validators.get(key)
+    if validator is None:
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        validator = validator_class(schema)
+        _validators[key] = validator
+    return validator
+
+
+def error_record(row: dict, validator) -> Dict:
+    """
+    Given an invalid row and a validator, return the quarantine record of the row, built from its most relevant
+    validation error (the one jsonschema.validate would raise)
+    @param row: dict, invalid row
+    @param validator: jsonschema validator
+    @return: dict, quarantine record
+    """
+    error = best_match(validator.iter_errors(row))
+    path = '.'.join(str(field) for field in error.absolute_path)
+    return quarantine_record(row, SCHEMA_VALIDATION_ERROR, path or None, error.message)
+
+
+def _init_worker(schema: dict) -> None:
+    """
+    Validation worker initializer: compile the schema once per worker process
+    @param schema: dict, jsonschema
+    """
+    global _worker_validator
+    _worker_validator = get_validator(schema)
+
+
+def _validate_chunk(rows: List[dict]) -> Tuple[List[dict], List[Dict]]:
+    """
+    Validate a chunk of rows in a worker process
+    @param rows: list of dicts
+    @return: tuple, (valid rows, quarantine records of the invalid rows)
+    """
+    validated_rows = []
+    error_rows = []
+    for row in rows:
+        if _worker_validator.is_valid(row):
+            validated_rows.append(row)
+        else:
+            error_rows.append(error_record(row, _worker_validator))
+    return validated_rows, error_rows
+
+
+def validate_rows_parallel(rows: List[dict], schema: dict, workers: int,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[List[dict], List[Dict]]:
+    """
+    Validate rows by chunks across a pool of processes. Each worker compiles the schema once, and chunk results
+    are merged back in the original rows order. As the json_lines parsing pools, workers are not forked from the node
+    process, which may run other threads (e.g. under the thread runner).
+    Only used in strict mode: the shipped configuration (strict: false) validates at the column level instead.
+    @param rows: list of dicts
+    @param schema: dict, jsonschema
+    @param workers: int, number of worker processes
+    @param chunk_size: int, number of rows per chunk
+    @return: tuple, (valid rows, quarantine records of the invalid rows)
+    """
+    # Check the schema before starting the workers
+    get_validator(schema)
+
+    validated_rows = []
+    error_rows = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=parse_context(), initializer=_init_worker,
+                             initargs=(schema,)) as executor:
+        chunks = executor.map(_validate_chunk, iter_batches(rows, chunk_size))
+        for chunk_validated_rows, chunk_error_rows in tqdm(chunks, total=-(-len(rows) // chunk_size)):
+            validated_rows.extend(chunk_validated_rows)
+            error_rows.extend(chunk_error_rows)
+    return validated_rows, error_rows
+
+
+def validate_batches(batches: Iterable[List[dict]], schema: dict, params: dict,
+                     rejected_rows: List[Dict]) -> Iterator[List[dict]]:
+    """
+    Streaming counterpart of validate_rows: lazily validate batches of rows, one at a time.
+    The quarantine records of the invalid rows are appended to rejected_rows as batches are consumed, and the
+    summary is logged once they all are.
+    @param batches: iterable of lists of dicts, rows batches
+    @param schema: dict, jsonschema
+    @param params: dict, validation params (see validate_rows)
+    @param rejected_rows: list, quarantine records, receives those of the invalid rows
+    @return: iterator of lists of dicts, valid rows batches
+    """
+    strict = params.get('strict', True)
+    validator = get_validator(schema)
+    nb_rows = len(rejected_rows)
+
+    for batch in batches:
+        nb_rows += len(batch)
+        if not strict:
+            yield batch
+            continue
+
+        validated_rows = []
+        for row in batch:
+            if validator.is_valid(row):
+                validated_rows.append(row)
+            else:
+                rejected_rows.append(error_record(row, validator))
+        yield validated_rows
+
+    log_rejected_rows(
+        rejected_rows,
+        total=nb_rows,
+        max_examples=params.get('max_error_examples', DEFAULT_MAX_EXAMPLES)
+    )
+
+
+def validate_rows(rows: Union[List[dict], Iterable[List[dict]]], schema: dict, params: Optional[dict] = None,
+                  rejected_rows: Optional[List[Dict]] = None) -> Tuple[Union[List[dict], Iterator[List[dict]]],
+                                                                       List[Dict]]:
     """
     json validation for list of jsons
     Given rows, a list of dict and schema, a dict representing a jsonschema, validates objects one by one.
-    Only valid objects are returned
-    @param rows: list of dic
+    Valid objects are returned along with the quarantine records of the invalid ones. Errors are not logged
+    per row: a summary is logged once.
+    @param rows: list of dic, or iterator of lists of dicts when streaming: rows are then validated lazily, batch by
+    batch, by validate_batches. The quarantine records are only complete once the valid batches are consumed: the
+    valid output must be saved (and so, declared) before the quarantine output.
     @param schema:
-    @return:
+    @param params: dict, optional, validation params. Rows are only validated one by one in strict mode
+    (the default), otherwise they are expected to be validated at the column level by the connector.
+    Rows are validated by chunks of chunk_size across workers processes if workers > 1 (null uses all cores).
+    @param rejected_rows: list of dicts, optional, quarantine records of the rows already rejected upstream
+    (e.g. by the connector column level checks), added to the quarantine output
+    @return: tuple, (valid rows, quarantine records)
     """
-    validated_rows = []
-    error_rows = []
+    params = params or {}
+    rejected_rows = list(rejected_rows or [])
 
-    for row in tqdm(rows):
-        try:
-            jsonschema.validate(row, schema)
-            validated_rows.append(row)
-        except ValidationError as e:
-            logger.error('ValidationError: %s' % e)
-            error_rows.append(row)
+    if not isinstance(rows, list):
+        return validate_batches(rows, schema, params, rejected_rows), rejected_rows
+
+    if not params.get('strict', True):
+        validated_rows = rows
+    else:
+        workers = params.get('workers', 1) or os.cpu_count()
+        chunk_size = params.get('chunk_size', DEFAULT_CHUNK_SIZE)
+
+        if workers > 1 and len(rows) > chunk_size:
+            validated_rows, error_rows = validate_rows_parallel(rows, schema, workers, chunk_size)
+        else:
+            validator = get_validator(schema)
+            validated_rows = []
+            error_rows = []
 
-    if error_rows:
-        logger.warning('Failed to validate %s rows (Out of %s)' % (len(error_rows), len(rows)))
+            for row in tqdm(rows):
+                if validator.is_valid(row):
+                    validated_rows.append(row)
+                else:
+                    error_rows.append(error_record(row, validator))
+        rejected_rows.extend(error_rows)
 
-    # return validated_rows, error_rows
-    return validated_rows
+    log_rejected_rows(
+        rejected_rows,
+        total=len(validated_rows) + len(rejected_rows),
+        max_examples=params.get('max_error_examples', DEFAULT_MAX_EXAMPLES)
+    )
 
+    return validated_rows, rejected_rows
 
-def schema_validation_node_constructor(schema_dataset_name):
+
+def schema_validation_node_constructor(schema_dataset_name, params_dataset_name=None):
     """
     Given a schema dataset name (as defined in the data catalog), return a function that allows the creation of a
     schema validation node, from an input dataset to an output dataset
     @param schema_dataset_name: str, name of the dataset as defined in the data catalog
+    @param params_dataset_name: str, optional, name of the validation parameters (e.g. params:gcp_validation)
     @return: callable, function returning a kedro node
     """
 
-    def validation_node(input_dataset_name, output_dataset_name):
+    def validation_node(input_dataset_name, output_dataset_name, quarantine_dataset_name,
+                        rejected_dataset_name=None):
         """
         Given an input dataset name and an output dataset name (as defined in the data catalog), return a node that
         executes the schema validation: function validate_rows
         @param input_dataset_name: str, name of a dataset as defined in the data catalog
         @param output_dataset_name: str, name of a dataset as defined in the data catalog
+        @param quarantine_dataset_name: str, name of the dataset receiving the rejected rows
+        @param rejected_dataset_name: str, optional, name of the dataset holding the rows rejected upstream
         @return: kedro node, node to be added in a pipeline
         """
+        inputs = dict(
+            rows=input_dataset_name,
+            schema=schema_dataset_name
+        )
+        if params_dataset_name is not None:
+            inputs['params'] = params_dataset_name
+        if rejected_dataset_name is not None:
+            inputs['rejected_rows'] = rejected_dataset_name
+
         return node(
             func=validate_rows,
-            inputs=dict(
-                rows=input_dataset_name,
-                schema=schema_dataset_name
-            ),
-            outputs=output_dataset_name,
-            name='%s_validation' % schema_dataset_name
+            inputs=inputs,
+            # Valid rows first: when streaming, they must be saved (consumed) before the quarantine records are complete
+            outputs=[output_dataset_name, quarantine_dataset_name],
+            name='%s_validation' % input_dataset_name
         )
 
     return validation_node
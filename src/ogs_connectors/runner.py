@@ -0,0 +1,127 @@
+"""
+Runners of the project, selected by name by ``kedro run --runner`` (see cli.py).
+The sequential and thread runners create intermediate datasets that pass their data as is: Kedro default
+MemoryDataSets deep copy the data on every save and load, which costs more than the nodes themselves for millions of
+records (and cannot copy generators). Nodes must then not mutate their inputs, see hooks.InputMutationGuardHooks.
+The ParallelRunner keeps its default datasets, shared across processes, as the HybridRunner, which runs the nodes
+tagged io_bound in threads and the others in processes.
+"""
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import chain
+from typing import Set
+
+from kedro.io import AbstractDataSet, DataCatalog, MemoryDataSet
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+from kedro.runner import ParallelRunner
+from kedro.runner import SequentialRunner as KedroSequentialRunner
+from kedro.runner import ThreadRunner as KedroThreadRunner
+from kedro.runner.parallel_runner import _run_node_synchronization
+from kedro.runner.runner import run_node
+
+# Tag of the nodes waiting on I/O (network, s3) rather than on cpu: the HybridRunner runs them in threads
+IO_BOUND_TAG = 'io_bound'
+
+
+class SequentialRunner(KedroSequentialRunner):
+    def create_default_data_set(self, ds_name: str) -> AbstractDataSet:
+        """
+        @param ds_name: str, name of the missing dataset
+        @return: MemoryDataSet, passing its data as is
+        """
+        return MemoryDataSet(copy_mode='assign')
+
+
+class ThreadRunner(KedroThreadRunner):
+    def create_default_data_set(self, ds_name: str) -> AbstractDataSet:
+        """
+        @param ds_name: str, name of the missing dataset
+        @return: MemoryDataSet, passing its data as is
+        """
+        return MemoryDataSet(copy_mode='assign')
+
+
+def node_catalog(catalog: DataCatalog, node: Node) -> DataCatalog:
+    """
+    Given a catalog and a node, return the catalog of the node datasets only, sent to the process running the node.
+    Datasets used by the nodes run in the main process are not sent: once loaded, some can not be pickled (e.g. a
+    PartitionedDataSet caches its partitions list).
+    @param catalog: kedro DataCatalog, run catalog
+    @param node: kedro Node
+    @return: kedro DataCatalog
+    """
+    # pylint: disable=protected-access
+    return DataCatalog({name: catalog._data_sets[name] for name in node.inputs + node.outputs})
+
+
+class HybridRunner(ParallelRunner):
+    """
+    ParallelRunner running the nodes tagged io_bound (e.g. mongodb_write) in threads of the main process, and the
+    others (e.g. the connectors mapping records) in processes: an io_bound node does not need a process of its own,
+    nor serializable inputs and outputs, and does not compete with the cpu bound nodes for the process pool.
+    Datasets are shared as with the ParallelRunner.
+    """
+
+    def _run(self, pipeline: Pipeline, catalog: DataCatalog, run_id: str = None) -> None:
+        """
+        Run the pipeline nodes as soon as their dependencies are done, each one in the pool matching its tags
+        @param pipeline: kedro Pipeline
+        @param catalog: kedro DataCatalog
+        @param run_id: str, id of the run
+        """
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from kedro.framework.session.session import get_current_session
+
+        nodes = pipeline.nodes
+        self._validate_catalog(catalog, pipeline)
+        self._validate_nodes([node for node in nodes if IO_BOUND_TAG not in node.tags])
+
+        load_counts = Counter(chain.from_iterable(node.inputs for node in nodes))
+        node_dependencies = pipeline.node_dependencies
+        todo_nodes = set(node_dependencies.keys())
+        done_nodes = set()  # type: Set[Node]
+        futures = set()  # type: Set[Future]
+        max_workers = self._get_required_workers_count(pipeline)
+
+        session = get_current_session(silent=True)
+        # pylint: disable=protected-access
+        package_name = session._package_name if session else None
+        conf_logging = session._get_logging_config() if session else None
+
+        with ProcessPoolExecutor(max_workers=max_workers) as processes, \
+                ThreadPoolExecutor(max_workers=max_workers) as threads:
+            while True:
+                ready = {node for node in todo_nodes if node_dependencies[node] <= done_nodes}
+                todo_nodes -= ready
+                for node in ready:
+                    if IO_BOUND_TAG in node.tags:
+                        futures.add(threads.submit(run_node, node, catalog, self._is_async, run_id))
+                    else:
+                        futures.add(processes.submit(
+                            _run_node_synchronization, node, node_catalog(catalog, node), self._is_async, run_id,
+                            package_name=package_name, conf_logging=conf_logging
+                        ))
+                if not futures:
+                    if todo_nodes:
+                        raise RuntimeError('Unable to schedule new tasks although some nodes have not been run: %s'
+                                           % sorted(node.name for node in todo_nodes))
+                    break
+
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        node = future.result()
+                    except Exception:
+                        self._suggest_resume_scenario(pipeline, done_nodes)
+                        raise
+                    done_nodes.add(node)
+
+                    # Release the datasets no other node will load
+                    for data_set in node.inputs:
+                        load_counts[data_set] -= 1
+                        if load_counts[data_set] < 1 and data_set not in pipeline.inputs():
+                            catalog.release(data_set)
+                    for data_set in node.outputs:
+                        if load_counts[data_set] < 1 and data_set not in pipeline.outputs():
+                            catalog.release(data_set)
@@ -32,6 +32,15 @@ from ogs_connectors.hooks import ProjectHooks
 # Instantiate and list your project hooks here
 HOOKS = (ProjectHooks(),)
 
+# Skip the nodes whose function and inputs did not change since their last run (delete data/memoization to run them
+# all again). Nodes with external side effects (mongodb_write) always run.
+# from ogs_connectors.hooks import NodeMemoizationHooks
+# HOOKS = (ProjectHooks(), NodeMemoizationHooks())
+
+# Check that nodes do not mutate their inputs, which are not copied between nodes (costly, hashes every node input)
+# from ogs_connectors.hooks import InputMutationGuardHooks
+# HOOKS = (ProjectHooks(), InputMutationGuardHooks())
+
 # List the installed plugins for which to disable auto-registry
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
 
@@ -48,6 +48,7 @@ setup(
     name="ogs_connectors",
     version="0.1",
     packages=find_packages(exclude=["tests"]),
+    package_data={"ogs_connectors": ["pipelines/*/connector.yml"]},
     entry_points={"console_scripts": [entry_point]},
     install_requires=requires,
     extras_require={
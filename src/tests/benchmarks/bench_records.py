@@ -0,0 +1,101 @@
+"""
+Benchmark of the staging records construction on a synthetic gcp melt: DataFrame.apply(row_mapping) (former
+behaviour) against build_records, which builds the records column by column from the gcp connector spec.
+Both outputs are checked to be equal.
+
+Run from the project root:
+    python src/tests/benchmarks/bench_records.py --rows 1000000
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+import pandas as pd
+
+from ogs_connectors.pipelines.gcp.pipeline import connector_spec
+from ogs_connectors.pipelines.connector_spec import Connector
+from ogs_connectors.pipelines.records import build_records
+
+mapped_sectors = connector_spec['lookups']['sectors']
+
+
+def row_mapping(row):
+    """
+    Former gcp records construction, from a pandas Dataframe row
+    """
+    return {
+        'data_source': {
+            'name': 'gcp',
+            'link': 'https://www.globalcarbonproject.org/carbonbudget/20/data.html'
+        },
+        'geo_component': {
+            'scale': 'Country',
+            'identifier': {
+                'id': row['country_alpha-3'],
+                'type': 'alpha3'
+            }
+        },
+        'date': datetime.datetime(row['Year'], 1, 1).strftime('%Y-%m-%d'),
+        'emission': {
+            'gas': 'CO2',
+            'value': row['value'],
+            'unit': {
+                'unit_used': 'MtC'
+            },
+            'sector': {
+                'sector_origin_name': row['sector'],
+                'sector_mapped_name': mapped_sectors[row['sector']]
+            }
+        }
+    }
+
+
+def gcp_melt(nb_rows: int) -> pd.DataFrame:
+    """
+    Synthetic melted gcp dataframe, one row per emission
+    @param nb_rows: int, number of rows
+    @return: pandas DataFrame
+    """
+    rng = np.random.default_rng(0)
+    sectors = list(mapped_sectors)
+    countries = ['C%03d' % i for i in range(230)]
+    return pd.DataFrame({
+        'Year': rng.integers(1750, 2020, nb_rows),
+        'country_name': 'Country',
+        'country_alpha-3': rng.choice(countries, nb_rows),
+        'sector': rng.choice(sectors, nb_rows),
+        'value': rng.random(nb_rows)
+    })
+
+
+def apply_row_mapping(df: pd.DataFrame):
+    """
+    Former records construction: one pandas Series and one row_mapping call per row
+    """
+    return df.apply(lambda row: row_mapping(row), axis=1).to_list()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = gcp_melt(args.rows)
+    record_template = Connector(connector_spec).record_template
+
+    outputs = []
+    for name, build in [
+        ('DataFrame.apply(row_mapping)', apply_row_mapping),
+        ('build_records', lambda df: build_records(df, record_template))
+    ]:
+        start = time.perf_counter()
+        outputs.append(build(df))
+        elapsed = time.perf_counter() - start
+        print('%-30s %10.0f rows/sec' % (name, len(df) / elapsed))
+
+    assert outputs[0] == outputs[1], 'build_records output differs from row_mapping'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the staging schema validation: per-row jsonschema.validate (former behaviour) against
+validate_rows, which reuses a compiled validator.
+
+Run from the project root:
+    python src/tests/benchmarks/bench_validation.py --rows 20000
+"""
+import argparse
+import json
+import logging
+import time
+
+import jsonschema
+
+from ogs_connectors.pipelines.validation_node import validate_rows
+
+
+def staging_rows(nb_rows: int):
+    """
+    Synthetic staging rows, shaped like the gcp connector output
+    @param nb_rows: int, number of rows
+    @return: list of dicts
+    """
+    return [
+        {
+            'data_source': {'name': 'gcp', 'link': 'https://www.globalcarbonproject.org/'},
+            'geo_component': {'scale': 'Country', 'identifier': {'id': 'FRA', 'type': 'alpha3'}},
+            'date': '%s-01-01' % (1900 + i % 120),
+            'emission': {
+                'gas': 'CO2',
+                'value': float(i),
+                'unit': {'unit_used': 'MtC'},
+                'sector': {'sector_origin_name': 'Coal', 'sector_mapped_name': 'fossil_emissions_coal'}
+            }
+        }
+        for i in range(nb_rows)
+    ]
+
+
+def per_row_validate(rows, schema):
+    """
+    Former validation: the schema is checked and a validator built for every row
+    """
+    for row in rows:
+        jsonschema.validate(row, schema)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--schema', default='data/schemas/staging.json')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with open(args.schema) as f:
+        schema = json.load(f)
+    rows = staging_rows(args.rows)
+
+    for name, validate in [('jsonschema.validate per row', per_row_validate), ('validate_rows', validate_rows)]:
+        start = time.perf_counter()
+        validate(rows, schema)
+        elapsed = time.perf_counter() - start
+        print('%-30s %10.0f rows/sec' % (name, len(rows) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Connector sources, and the catalog of a connectors run writing its staging outputs under a local directory
+"""
+import json
+from pathlib import Path
+from typing import Callable, Dict
+
+import pandas as pd
+import pytest
+from kedro.io import DataCatalog, MemoryDataSet, PartitionedDataSet
+
+from ogs_connectors.extras.datasets.json_lines_dataset import JSONLinesDataSet
+
+SCHEMA_PATH = Path(__file__).parents[2] / 'data' / 'schemas' / 'staging.json'
+SOURCES = ['gcp', 'wri_unfccc']
+
+
+def gcp_source() -> pd.DataFrame:
+    return pd.DataFrame({
+        'Year': [1990, 1990, 2000, 2000],
+        'Country': ['France', 'Germany', 'France', 'Germany'],
+        'ISO 3166-1 alpha-3': ['FRA', 'DEU', 'FRA', None],
+        'Coal': [10.0, 20.0, 11.0, 21.0],
+        'Oil': [5.0, None, 6.0, 7.0],
+        'Gas': [1.0, 2.0, 3.0, 4.0],
+        'Cement': [0.1, 0.2, 0.3, 0.4],
+        'Flaring': [0.0, 0.0, 0.0, 0.0],
+        'Other': [None, None, 1.0, 1.0],
+    })
+
+
+def wri_unfccc_source() -> pd.DataFrame:
+    return pd.DataFrame({
+        'country': ['FRA', 'DEU', 'ANNEXI', 'FRA'],
+        'source': ['UNFCCC_AI', 'UNFCCC_AI', 'UNFCCC_AI', 'UNFCCC_AI'],
+        'sector': ['Energy', 'Waste', 'Energy', 'Agriculture'],
+        'gas': ['CO2', 'CH4', 'CO2', 'N2O'],
+        1990: [300.0, 10.0, 1000.0, 5.0],
+        2000: [310.0, None, 1100.0, 6.0],
+    })
+
+
+def create_catalog(output_path: Path, streaming: bool = False) -> DataCatalog:
+    with open(SCHEMA_PATH) as f:
+        schema = json.load(f)
+
+    data_sets = {
+        'gcp_mtco2_flat': MemoryDataSet(gcp_source()),
+        'wri_unfccc_cw_ghg': MemoryDataSet(wri_unfccc_source()),
+        'schema_staging': MemoryDataSet(schema),
+        'params:streaming': MemoryDataSet({'enabled': streaming, 'batch_size': 3}),
+    }
+    for source in SOURCES:
+        data_sets.update({
+            'params:%s_validation' % source: MemoryDataSet({'strict': True, 'workers': 1, 'chunk_size': 2}),
+            '%s_partitions' % source: PartitionedDataSet(
+                path=str(output_path / 'staging'),
+                dataset='ogs_connectors.extras.datasets.json_lines_dataset.JSONLinesDataSet'
+            ),
+            '%s_partitions_manifest' % source: PartitionedDataSet(
+                path=str(output_path / 'staging_manifest'),
+                dataset='ogs_connectors.extras.datasets.json_file_dataset.JSONFileDataSet'
+            ),
+            '%s_quarantine' % source: JSONLinesDataSet(filepath=str(output_path / ('%s_quarantine.json' % source)))
+        })
+    return DataCatalog(data_sets)
+
+
+def read_outputs(output_path: Path) -> Dict[str, str]:
+    return {
+        str(path.relative_to(output_path)): path.read_text()
+        for path in sorted(output_path.rglob('*')) if path.is_file()
+    }
+
+
+@pytest.fixture
+def sources() -> list:
+    return SOURCES
+
+
+@pytest.fixture
+def catalog_factory() -> Callable[[Path], DataCatalog]:
+    """
+    @return: callable, given an output directory (and whether to stream the records), returns the catalog of a gcp
+    and wri_unfccc run writing under it
+    """
+    return create_catalog
+
+
+@pytest.fixture
+def outputs_reader() -> Callable[[Path], Dict[str, str]]:
+    """
+    @return: callable, given an output directory, returns the content of its files by relative path
+    """
+    return read_outputs
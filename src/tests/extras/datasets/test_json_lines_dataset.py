@@ -0,0 +1,49 @@
+import pytest
+
+from ogs_connectors.extras.datasets import json_lines_dataset
+from ogs_connectors.extras.datasets.json_lines_dataset import JSONLinesDataSet
+
+RECORDS = [{'id': i, 'name': 'record %s' % i, 'values': list(range(i % 7))} for i in range(500)]
+
+
+@pytest.mark.parametrize('filename', ['data.json', 'data.json.gz', 'data.json.bz2'])
+def test_round_trip(tmp_path, filename):
+    data_set = JSONLinesDataSet(filepath=str(tmp_path / filename), save_args={'buffer_size': 64})
+    # Streamed data: batches of records
+    data_set.save(iter([RECORDS[:100], RECORDS[100:]]))
+
+    assert data_set.load() == RECORDS
+    lazy_data_set = JSONLinesDataSet(filepath=str(tmp_path / filename), load_args={'lazy': True, 'block_size': 100})
+    assert list(lazy_data_set.load()) == RECORDS
+
+
+def test_range_parsing(tmp_path):
+    filepath = str(tmp_path / 'data.json')
+    JSONLinesDataSet(filepath=filepath).save(RECORDS)
+
+    # Ranges do not fall on line boundaries
+    data_set = JSONLinesDataSet(filepath=filepath, load_args={'workers': 2, 'range_size': 1000, 'lazy': True})
+    assert data_set._parse_workers(filepath) == 2
+    assert list(data_set.load()) == RECORDS
+
+
+def test_small_file_parsed_sequentially(tmp_path, monkeypatch):
+    filepath = str(tmp_path / 'data.json')
+    JSONLinesDataSet(filepath=filepath).save(RECORDS[:10])
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError('A one range file must not start a pool')
+
+    monkeypatch.setattr(json_lines_dataset, 'ProcessPoolExecutor', no_pool)
+    data_set = JSONLinesDataSet(filepath=filepath, load_args={'workers': None})
+    assert data_set._parse_workers(filepath) == 1
+    assert data_set.load() == RECORDS[:10]
+
+
+def test_compressed_file_parsed_sequentially(tmp_path):
+    filepath = str(tmp_path / 'data.json.gz')
+    data_set = JSONLinesDataSet(filepath=filepath, load_args={'workers': 4, 'range_size': 100})
+    data_set.save(RECORDS)
+
+    assert data_set._parse_workers(filepath) == 1
+    assert data_set.load() == RECORDS
@@ -0,0 +1,74 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ogs_connectors.extras.datasets.parquet_staging_dataset import ParquetStagingDataSet
+
+
+def staging_record(year: int, value=1.0, **fields) -> dict:
+    record = {
+        'data_source': {'name': 'gcp'},
+        'geo_component': {'scale': 'country', 'identifier': {'type': 'alpha3', 'id': 'FRA'}},
+        'date': '%s-01-01' % year,
+        'emission': {'gas': 'CO2', 'value': value, 'unit': {'unit_used': 'MtCO2'}, 'sector': {'sector_name': 'Coal'}},
+    }
+    record.update(fields)
+    return record
+
+
+def test_round_trip_across_row_groups(tmp_path):
+    filepath = str(tmp_path / 'data.json.parquet')
+    records = [
+        # First row group: values are all null, no data source link
+        staging_record(1990, value=None),
+        staging_record(1991, value=None),
+        # Fields appearing in later row groups
+        staging_record(1992, data_source={'name': 'gcp', 'link': 'https://www.globalcarbonproject.org'}),
+        staging_record(1993, value=2.5),
+        staging_record(1994),
+    ]
+    data_set = ParquetStagingDataSet(filepath=filepath, save_args={'row_group_size': 2})
+    # Streamed data: batches of records
+    data_set.save(iter([records[:3], records[3:]]))
+
+    parquet_file = pq.ParquetFile(filepath)
+    assert parquet_file.num_row_groups == 3
+    assert parquet_file.schema_arrow.field('emission.value').type == pa.float64()
+    assert parquet_file.schema_arrow.field('data_source.link').type == pa.string()
+
+    # Null values are not kept
+    expected_records = [staging_record(1990), staging_record(1991)] + records[2:]
+    for record in expected_records[:2]:
+        del record['emission']['value']
+    assert data_set.load() == expected_records
+
+    lazy_data_set = ParquetStagingDataSet(filepath=filepath, load_args={
+        'lazy': True, 'batch_size': 2, 'columns': ['date', 'data_source'], 'filters': [['date', '>=', '1992-01-01']]
+    })
+    assert [record for batch in lazy_data_set.load() for record in batch] == [
+        {'date': record['date'], 'data_source': record['data_source']} for record in records[2:]
+    ]
+
+
+def test_save_empty(tmp_path):
+    data_set = ParquetStagingDataSet(filepath=str(tmp_path / 'data.json.parquet'))
+    data_set.save([])
+    assert data_set.load() == []
+
+
+def test_lazy_load_by_row_groups(tmp_path, monkeypatch):
+    filepath = str(tmp_path / 'data.json.parquet')
+    records = [staging_record(1990 + i % 5, value=float(i)) for i in range(20)]
+    ParquetStagingDataSet(filepath=filepath, save_args={'row_group_size': 4}).save(records)
+
+    # The file is scanned batch by batch, never read as a whole
+    monkeypatch.setattr(pq, 'read_table', None)
+    lazy_data_set = ParquetStagingDataSet(filepath=filepath, load_args={
+        'lazy': True, 'batch_size': 3, 'columns': ['emission.value'],
+        'filters': [[['date', '=', '1990-01-01']], [['emission.value', '>', 17.0]]]
+    })
+    batches = list(lazy_data_set.load())
+
+    assert all(len(batch) <= 3 for batch in batches)
+    assert [record for batch in batches for record in batch] == [
+        {'emission': {'value': float(i)}} for i in range(20) if i % 5 == 0 or i > 17
+    ]
@@ -0,0 +1,72 @@
+"""
+Mongodb stand-ins (mongomock, mongomock_motor) with geo_components and data_sources referentials, and staging emissions
+"""
+from typing import Dict
+
+import asyncio
+
+import mongomock
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from ogs_connectors.pipelines.mongodb_write import writer
+
+GEO_COMPONENTS = [{'_id': 'geo_%s' % code, 'identifiers': {'alpha3': code}} for code in ('FRA', 'DEU', 'ITA')]
+DATA_SOURCES = [{'_id': 'data_source_gcp', 'name': 'gcp'}]
+
+
+def staging_emission(country: str = 'FRA', year: int = 2000, sector: str = 'Coal', value: float = 1.0,
+                     data_source: str = 'gcp') -> Dict:
+    return {
+        'data_source': {'name': data_source},
+        'geo_component': {'scale': 'Country', 'identifier': {'id': country, 'type': 'alpha3'}},
+        'date': '%s-01-01' % year,
+        'emission': {
+            'gas': 'CO2',
+            'value': value,
+            'unit': {'unit_used': 'MtC'},
+            'sector': {'sector_origin_name': sector, 'sector_mapped_name': sector.lower()}
+        }
+    }
+
+
+@pytest.fixture
+def emission_factory():
+    return staging_emission
+
+
+@pytest.fixture
+def mongodb_params() -> Dict:
+    return dict(
+        database_name='emissions',
+        geo_components_collection_name='geo_components',
+        data_sources_collection_name='data_sources',
+        emissions_collection_name='emissions',
+        manifests_collection_name='write_manifests',
+        batch_size=2,
+        write_mode='upsert'
+    )
+
+
+@pytest.fixture
+def mongodb_client(monkeypatch, mongodb_params):
+    client = mongomock.MongoClient()
+    database = client[mongodb_params['database_name']]
+    database[mongodb_params['geo_components_collection_name']].insert_many(GEO_COMPONENTS)
+    database[mongodb_params['data_sources_collection_name']].insert_many(DATA_SOURCES)
+    monkeypatch.setattr(writer, 'get_mongodb_client', lambda mongodb_params, mongodb_credentials: client)
+    return client
+
+
+@pytest.fixture
+def emissions_collection(mongodb_client, mongodb_params):
+    return mongodb_client[mongodb_params['database_name']][mongodb_params['emissions_collection_name']]
+
+
+@pytest.fixture
+def async_mongodb_client(mongodb_params):
+    client = AsyncMongoMockClient()
+    database = client.get_database(mongodb_params['database_name'])
+    asyncio.run(database[mongodb_params['geo_components_collection_name']].insert_many(GEO_COMPONENTS))
+    asyncio.run(database[mongodb_params['data_sources_collection_name']].insert_many(DATA_SOURCES))
+    return client
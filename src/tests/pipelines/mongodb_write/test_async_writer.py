@@ -0,0 +1,99 @@
+import asyncio
+
+from ogs_connectors.pipelines.mongodb_write.async_writer import AsyncEmissionsWriter, insert_partitions_async
+
+
+class ConcurrencyProbe:
+    """
+    Client wrapper delaying the bulk writes of the emissions collection, recording how many are in flight
+    """
+
+    def __init__(self, client, collection_name: str):
+        self._client = client
+        self._collection_name = collection_name
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_database(self, name: str):
+        return ProbedDatabase(self, self._client.get_database(name))
+
+    def close(self):
+        self._client.close()
+
+
+class ProbedDatabase:
+    def __init__(self, probe: ConcurrencyProbe, database):
+        self._probe = probe
+        self._database = database
+
+    def __getitem__(self, name: str):
+        if name == self._probe._collection_name:
+            return ProbedCollection(self._probe, self._database[name])
+        return self._database[name]
+
+
+class ProbedCollection:
+    def __init__(self, probe: ConcurrencyProbe, collection):
+        self._probe = probe
+        self._collection = collection
+
+    def __getattr__(self, name: str):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, *args, **kwargs):
+        self._probe.in_flight += 1
+        self._probe.max_in_flight = max(self._probe.max_in_flight, self._probe.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await self._collection.bulk_write(*args, **kwargs)
+        finally:
+            self._probe.in_flight -= 1
+
+
+def find_emissions(client, mongodb_params):
+    collection = client.get_database(mongodb_params['database_name'])[mongodb_params['emissions_collection_name']]
+    return asyncio.run(collection.find({}, {'_id': 0}).to_list(length=None))
+
+
+def test_upsert(async_mongodb_client, mongodb_params, emission_factory):
+    client = async_mongodb_client
+    emissions = [emission_factory(year=year) for year in range(2000, 2005)]
+
+    async def write(values):
+        async with AsyncEmissionsWriter(mongodb_params, {}, client=client) as writer:
+            return await writer.insert_emissions(values)
+
+    assert asyncio.run(write(emissions)) == {'inserted': 5, 'failed': 0}
+    # Upserts are idempotent: writing again does not duplicate emissions, changed values are updated
+    asyncio.run(write(emissions[:4] + [emission_factory(year=2004, value=9.0)]))
+
+    documents = find_emissions(client, mongodb_params)
+    assert len(documents) == 5
+    assert sorted(document['value'] for document in documents) == [1.0, 1.0, 1.0, 1.0, 9.0]
+
+
+def test_failed_emissions(async_mongodb_client, mongodb_params, emission_factory):
+    client = async_mongodb_client
+    emissions = [emission_factory(country=country) for country in ('FRA', 'XXX', 'DEU', 'YYY', 'ITA')]
+    rejected_rows = []
+
+    async def write():
+        async with AsyncEmissionsWriter(mongodb_params, {}, client=client) as writer:
+            return await writer.insert_emissions(emissions, rejected_rows)
+
+    assert asyncio.run(write()) == {'inserted': 3, 'failed': 2}
+    assert len(find_emissions(client, mongodb_params)) == 3
+    assert [row['row']['geo_component']['identifier']['id'] for row in rejected_rows] == ['XXX', 'YYY']
+
+
+def test_max_in_flight_batches(async_mongodb_client, mongodb_params, emission_factory):
+    probe = ConcurrencyProbe(async_mongodb_client, mongodb_params['emissions_collection_name'])
+    emissions = [emission_factory(year=year) for year in range(2000, 2020)]
+    params = dict(mongodb_params, batch_size=2, max_in_flight_batches=3)
+
+    stats = asyncio.run(insert_partitions_async(
+        {'gcp/data.json': lambda: emissions}, {}, params, {}, incremental=False, max_workers=1, client=probe
+    ))
+
+    assert stats == [{'inserted': 20, 'failed': 0}]
+    assert probe.max_in_flight == 3
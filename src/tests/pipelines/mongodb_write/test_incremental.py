@@ -0,0 +1,74 @@
+from ogs_connectors.pipelines.manifest import build_manifest
+from ogs_connectors.pipelines.mongodb_write.incremental import is_unchanged, select_changed_emissions
+from ogs_connectors.pipelines.mongodb_write.logic import insert_partitioned_emissions
+
+PARTITION = 'gcp/year=2000/data.json'
+
+
+def test_incomplete_manifests(emission_factory):
+    emissions = [emission_factory(country='FRA'), emission_factory(country='DEU')]
+    manifest = build_manifest(emissions)
+
+    # Manifests saved before their streamed partition was consumed are empty
+    assert not is_unchanged(PARTITION, {}, manifest)
+    assert not is_unchanged(PARTITION, manifest, {})
+    assert is_unchanged(PARTITION, manifest, manifest)
+
+    selected_emissions, selected_manifest = select_changed_emissions(PARTITION, lambda: emissions, {}, None)
+    assert selected_manifest == manifest
+    assert list(selected_emissions) == emissions
+
+    # Lazy partitions are loaded again rather than held in memory, and filtered batch by batch
+    loads = []
+
+    def load_batches():
+        loads.append(PARTITION)
+        return iter([emissions[:1], emissions[1:]])
+
+    selected_emissions, selected_manifest = select_changed_emissions(PARTITION, load_batches, {}, manifest)
+    assert selected_manifest == manifest
+    assert list(selected_emissions) == []
+    assert len(loads) == 2
+    changed_manifest = dict(manifest, groups=dict(manifest['groups'], **{'alpha3:FRA/2000-01-01': 'changed'}))
+    selected_emissions, _ = select_changed_emissions(PARTITION, load_batches, changed_manifest, manifest)
+    assert list(selected_emissions) == [[emissions[0]]]
+
+
+def test_incremental_write_with_empty_manifests(mongodb_client, mongodb_params, emissions_collection,
+                                                emission_factory):
+    emissions = {PARTITION: lambda: [emission_factory(country='FRA'), emission_factory(country='DEU')]}
+    manifests = {PARTITION: lambda: {}}
+    params = {'data_sources': ['gcp'], 'incremental': True}
+
+    assert insert_partitioned_emissions(emissions, manifests, mongodb_params, {}, params) == []
+    assert insert_partitioned_emissions(emissions, manifests, mongodb_params, {}, params) == []
+    assert emissions_collection.count_documents({}) == 2
+
+
+def test_removed_rows_and_groups(mongodb_client, mongodb_params, emissions_collection, emission_factory):
+    params = {'data_sources': ['gcp'], 'incremental': True}
+    other_partition = 'gcp/year=2001/data.json'
+    partitions = {
+        PARTITION: [emission_factory('FRA', sector='Coal'), emission_factory('FRA', sector='Oil'),
+                    emission_factory('DEU'), emission_factory('ITA')],
+        other_partition: [emission_factory('FRA', year=2001)],
+    }
+
+    def write():
+        emissions = {key: (lambda rows=rows: rows) for key, rows in partitions.items()}
+        manifests = {key: (lambda rows=rows: build_manifest(rows)) for key, rows in partitions.items()}
+        assert insert_partitioned_emissions(emissions, manifests, mongodb_params, {}, params) == []
+
+    write()
+    assert emissions_collection.count_documents({}) == 5
+
+    # A row removed from the FRA group, a changed natural key in the DEU group, the ITA group removed
+    partitions[PARTITION] = [emission_factory('FRA', sector='Coal'), emission_factory('DEU', sector='Gas')]
+    write()
+
+    assert sorted(
+        (document['geo_component_id'], document['date'], document['sector']['sector_origin_name'])
+        for document in emissions_collection.find()
+    ) == [
+        ('geo_DEU', '2000-01-01', 'Gas'), ('geo_FRA', '2000-01-01', 'Coal'), ('geo_FRA', '2001-01-01', 'Coal'),
+    ]
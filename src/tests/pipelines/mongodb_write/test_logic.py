@@ -0,0 +1,65 @@
+from collections import Counter
+
+import pytest
+
+from ogs_connectors.pipelines.manifest import build_manifest
+from ogs_connectors.pipelines.mongodb_write.logic import insert_partitioned_emissions
+
+COUNTRIES = ['FRA', 'DEU', 'ITA', 'ESP']
+
+
+@pytest.fixture
+def partitions(emission_factory):
+    # ESP is not in the referentials: one rejected emission per partition
+    return {
+        'gcp/year=%s/data.json' % year: [emission_factory(country, year) for country in COUNTRIES]
+        for year in range(2000, 2006)
+    }
+
+
+def partitioned_datasets(partitions, loads):
+    def loader(key):
+        def load():
+            loads[key] += 1
+            return partitions[key]
+        return load
+
+    emissions = {key: loader(key) for key in partitions}
+    manifests = {key: (lambda rows=rows: build_manifest(rows)) for key, rows in partitions.items()}
+    return emissions, manifests
+
+
+@pytest.mark.parametrize('params', [
+    {'max_workers': 3},
+    {'max_workers': 1, 'prefetch': True},
+    {'max_workers': 1, 'prefetch': False},
+])
+def test_write_partitions(mongodb_client, mongodb_params, emissions_collection, partitions, params):
+    loads = Counter()
+    emissions, manifests = partitioned_datasets(partitions, loads)
+
+    rejected_rows = insert_partitioned_emissions(emissions, manifests, mongodb_params, {},
+                                                 dict(params, data_sources=['gcp']))
+
+    # Every partition loaded and written once, rejected rows of every partition aggregated
+    assert loads == Counter(dict.fromkeys(partitions, 1))
+    assert emissions_collection.count_documents({}) == 3 * len(partitions)
+    assert sorted(record['row']['date'] for record in rejected_rows) == [
+        '%s-01-01' % year for year in range(2000, 2006)
+    ]
+    assert {record['row']['geo_component']['identifier']['id'] for record in rejected_rows} == {'ESP'}
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_unchanged_partitions_not_loaded(mongodb_client, mongodb_params, partitions, emission_factory, max_workers):
+    # Manifests are only recorded for complete writes
+    partitions = {key: rows[:3] for key, rows in partitions.items()}
+    params = {'data_sources': ['gcp'], 'incremental': True, 'max_workers': max_workers, 'prefetch': True}
+    insert_partitioned_emissions(*partitioned_datasets(partitions, Counter()), mongodb_params, {}, params)
+
+    changed_partition = 'gcp/year=2003/data.json'
+    partitions[changed_partition] = partitions[changed_partition] + [emission_factory('FRA', 2003, sector='Oil')]
+    loads = Counter()
+    insert_partitioned_emissions(*partitioned_datasets(partitions, loads), mongodb_params, {}, params)
+
+    assert loads == Counter({changed_partition: 1})
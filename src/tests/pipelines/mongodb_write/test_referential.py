@@ -0,0 +1,47 @@
+from ogs_connectors.pipelines.mongodb_write.referential import ReferentialIndex, referential_filters
+from ogs_connectors.pipelines.staging_table import StagingColumns
+
+GEO_COMPONENTS = [
+    {'_id': 'geo_fra', 'identifiers': {'alpha3': 'FRA', 'name': 'France'}},
+    # Duplicated identifier: the first geo_component is kept
+    {'_id': 'geo_fra_duplicate', 'identifiers': {'alpha3': 'FRA'}},
+    {'_id': 'geo_deu', 'identifiers': {'alpha3': 'DEU', 'names': ['Germany', 'Deutschland']}},
+]
+DATA_SOURCES = [{'_id': 'data_source_gcp', 'name': 'gcp'}]
+
+
+def test_resolve(emission_factory):
+    index = ReferentialIndex(GEO_COMPONENTS, DATA_SOURCES)
+    emissions = [emission_factory('FRA'), emission_factory('ITA'), emission_factory('DEU', data_source='unknown')]
+
+    documents, unresolved = index.resolve(emissions)
+
+    assert [(document['geo_component_id'], document['data_source_id']) for document in documents] == [
+        ('geo_fra', 'data_source_gcp')
+    ]
+    assert [(emission, error.path) for emission, error in unresolved] == [
+        (emissions[1], 'geo_component.identifier'), (emissions[2], 'data_source.name')
+    ]
+
+
+def test_resolve_columns(emission_factory):
+    index = ReferentialIndex(GEO_COMPONENTS, DATA_SOURCES)
+    emissions = [emission_factory('FRA'), emission_factory('ITA'), emission_factory('DEU', year=2001)]
+
+    documents, unresolved, positions = index.resolve_columns(StagingColumns.from_records(emissions))
+
+    # Same documents as when resolved row by row
+    assert documents == index.resolve(emissions)[0]
+    assert positions == [0, 2]
+    assert [(emission, error.path) for emission, error in unresolved] == [(emissions[1], 'geo_component.identifier')]
+
+
+def test_referential_filters():
+    manifests = [
+        {'identifier_types': ['alpha3'], 'data_sources': ['gcp']},
+        {'identifier_types': ['alpha3', 'nuts2'], 'data_sources': ['wri_unfccc']},
+    ]
+    assert referential_filters(manifests) == (['alpha3', 'nuts2'], ['gcp', 'wri_unfccc'])
+    # Any partition without a (complete) manifest may reference any referential
+    assert referential_filters(manifests + [None]) == (None, None)
+    assert referential_filters(manifests + [{}]) == (None, None)
@@ -0,0 +1,71 @@
+import pickle
+from ogs_connectors.pipelines.mongodb_write.referential import ReferentialIndex
+from ogs_connectors.pipelines.mongodb_write.referential_cache import ReferentialCache, get_referential_fingerprint
+from ogs_connectors.pipelines.mongodb_write.writer import EmissionsWriter
+
+
+def test_entry_key_connection_target(mongodb_params):
+    credentials = {'cluster_urls': ['cluster-a:27017'], 'user': 'writer', 'password': 'secret'}
+    key = ReferentialCache.entry_key(mongodb_params, credentials, ['alpha3'], ['gcp'])
+
+    assert key == ReferentialCache.entry_key(mongodb_params, dict(credentials), ['alpha3'], ['gcp'])
+    assert key != ReferentialCache.entry_key(
+        mongodb_params, dict(credentials, cluster_urls=['cluster-b:27017']), ['alpha3'], ['gcp']
+    )
+    assert key != ReferentialCache.entry_key(mongodb_params, dict(credentials, user='reader'), ['alpha3'], ['gcp'])
+    assert key != ReferentialCache.entry_key(mongodb_params, credentials, ['alpha3'], None)
+    assert 'secret' not in key
+
+
+def test_cache_entry(tmp_path):
+    cache = ReferentialCache(str(tmp_path))
+    index = ReferentialIndex(geo_components=[{'_id': 'geo_FRA', 'identifiers': {'alpha3': 'FRA'}}], data_sources=[])
+
+    assert cache.load('key', [1]) is None
+    cache.save('key', [1], index)
+    assert cache.load('key', [1]) is not None
+    # Stale entry
+    assert cache.load('key', [2]) is None
+
+
+def test_fingerprint(mongodb_client, mongodb_params):
+    database = mongodb_client[mongodb_params['database_name']]
+    geo_components = database[mongodb_params['geo_components_collection_name']]
+    data_sources = database[mongodb_params['data_sources_collection_name']]
+
+    def fingerprint(updated_at_field=None):
+        return get_referential_fingerprint(geo_components, data_sources, ['alpha3'], ['gcp'], updated_at_field)
+
+    initial_fingerprint = fingerprint()
+    initial_updated_at_fingerprint = fingerprint('updated_at')
+    geo_components.update_one({'_id': 'geo_FRA'}, {'$set': {'identifiers.alpha3': 'FXX', 'updated_at': 1}})
+
+    # In-place edits are only detected with an update timestamp field
+    assert fingerprint() == initial_fingerprint
+    assert fingerprint('updated_at') != initial_updated_at_fingerprint
+
+    geo_components.insert_one({'_id': 'geo_ESP', 'identifiers': {'alpha3': 'ESP'}})
+    assert fingerprint() != initial_fingerprint
+
+
+def test_writer_uses_cache(mongodb_client, mongodb_params, emission_factory, tmp_path):
+    params = dict(mongodb_params, referential_cache_dir=str(tmp_path))
+    with EmissionsWriter(params, {'cluster_urls': ['cluster-a:27017']}) as writer:
+        writer.insert_emissions([emission_factory()])
+    assert len(list(tmp_path.glob('referential_*.pkl'))) == 1
+
+    # Another cluster: another entry
+    with EmissionsWriter(params, {'cluster_urls': ['cluster-b:27017']}) as writer:
+        writer.insert_emissions([emission_factory()])
+    assert len(list(tmp_path.glob('referential_*.pkl'))) == 2
+
+
+def test_unreadable_cache_entry(tmp_path):
+    cache = ReferentialCache(str(tmp_path))
+    index = ReferentialIndex(geo_components=[], data_sources=[])
+    cache.save('key', [1], index)
+
+    # Truncated entry, entry pickled from a module that no longer exists, entry of another format
+    for content in [b'\x80\x04', pickle.dumps(index).replace(b'referential', b'referentiel'), pickle.dumps([1])]:
+        (tmp_path / 'referential_key.pkl').write_bytes(content)
+        assert cache.load('key', [1]) is None
@@ -0,0 +1,65 @@
+import pytest
+
+from ogs_connectors.pipelines.mongodb_write.exceptions import DuplicateNaturalKeyError
+from ogs_connectors.pipelines.mongodb_write.writer import EmissionsWriter, NATURAL_KEY_INDEX_NAME
+from ogs_connectors.pipelines.staging_table import StagingColumns
+
+
+def test_natural_key_index_created_once(mongodb_client, mongodb_params, emissions_collection, emission_factory,
+                                        monkeypatch):
+    calls = []
+    create_index = type(emissions_collection).create_index
+
+    def counted_create_index(self, *args, **kwargs):
+        calls.append(kwargs.get('name'))
+        return create_index(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(emissions_collection), 'create_index', counted_create_index)
+    with EmissionsWriter(mongodb_params, {}) as writer:
+        writer.insert_emissions([emission_factory(year=2000)])
+        writer.insert_emissions([emission_factory(year=2001)])
+
+    assert calls.count(NATURAL_KEY_INDEX_NAME) == 1
+    assert NATURAL_KEY_INDEX_NAME in emissions_collection.index_information()
+
+
+def test_duplicated_natural_keys(mongodb_client, mongodb_params, emissions_collection, emission_factory):
+    # Emissions written twice by insert runs
+    with EmissionsWriter(dict(mongodb_params, write_mode='insert'), {}) as writer:
+        writer.insert_emissions([emission_factory(value=1.0)])
+        writer.insert_emissions([emission_factory(value=2.0)])
+
+    with pytest.raises(DuplicateNaturalKeyError, match='deduplicate_natural_keys'):
+        with EmissionsWriter(mongodb_params, {}) as writer:
+            writer.insert_emissions([emission_factory(year=2001)])
+    assert emissions_collection.count_documents({}) == 2
+
+    with EmissionsWriter(dict(mongodb_params, deduplicate_natural_keys=True), {}) as writer:
+        stats = writer.insert_emissions([emission_factory(year=2001)])
+
+    assert stats == {'inserted': 1, 'failed': 0}
+    # The last written emission of the duplicated natural key is kept
+    assert [document['value'] for document in emissions_collection.find({'date': '2000-01-01'})] == [2.0]
+
+
+def test_insert_rows_and_columns(mongodb_client, mongodb_params, emissions_collection, emission_factory):
+    emissions = [emission_factory(country, year) for country in ('FRA', 'DEU', 'ITA') for year in (2000, 2001)]
+    rejected_rows = []
+
+    with EmissionsWriter(mongodb_params, {}) as writer:
+        rows_stats = writer.insert_emissions(emissions + [emission_factory('ESP')], rejected_rows)
+    rows_documents = list(emissions_collection.find({}, {'_id': False}))
+
+    assert rows_stats == {'inserted': 6, 'failed': 1}
+    assert [(record['reason'], record['row']) for record in rejected_rows] == [
+        ('unresolved_referential', emission_factory('ESP'))
+    ]
+
+    # Upserted again, as column batches: same documents, no duplicate
+    with EmissionsWriter(mongodb_params, {}) as writer:
+        columns_stats = writer.insert_emissions([StagingColumns.from_records(emissions[:4]),
+                                                 StagingColumns.from_records(emissions[4:])])
+
+    # Unchanged documents are not counted as written
+    assert columns_stats == {'inserted': 0, 'failed': 0}
+    assert list(emissions_collection.find({}, {'_id': False})) == rows_documents
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from ogs_connectors.pipelines.columnar_validation import schema_field_checks, filter_valid_rows
+
+SCHEMA = {
+    'type': 'object',
+    'required': ['date', 'emission'],
+    'properties': {
+        'date': {'type': 'string'},
+        'comment': {'type': 'string'},
+        'emission': {
+            'type': 'object',
+            'required': ['value', 'sector'],
+            'properties': {
+                'value': {'type': 'number'},
+                'sector': {
+                    'type': 'object',
+                    # Required, but not described in the properties
+                    'required': ['sector_origin_name'],
+                    'properties': {'sector_name': {'type': 'string'}}
+                }
+            }
+        }
+    }
+}
+
+COLUMNS = {
+    'date': 'date',
+    'comment': 'comment',
+    'emission.value': 'value',
+    'emission.sector.sector_origin_name': 'sector'
+}
+
+
+def test_schema_field_checks():
+    assert schema_field_checks(SCHEMA) == {
+        'date': {'type': 'string', 'required': True},
+        'comment': {'type': 'string', 'required': False},
+        'emission.value': {'type': 'number', 'required': True},
+        'emission.sector.sector_name': {'type': 'string', 'required': False},
+        'emission.sector.sector_origin_name': {'type': None, 'required': True},
+    }
+
+
+def test_filter_valid_rows():
+    df = pd.DataFrame({
+        'date': ['2000-01-01', '2000-01-01', None, '2000-01-01', '2000-01-01'],
+        'comment': [None, 'ok', 'ok', 'ok', 1],
+        'value': [1.0, 2.0, 3.0, 4.0, 5.0],
+        'sector': ['Coal', None, 'Coal', 'Oil', 'Oil'],
+    })
+
+    valid_rows, rejected_rows = filter_valid_rows(df, SCHEMA, COLUMNS)
+
+    assert valid_rows['value'].tolist() == [1.0, 4.0]
+    assert [(row['path'], row['message']) for row in rejected_rows] == [
+        ('emission.sector.sector_origin_name', 'emission.sector.sector_origin_name is required'),
+        ('date', 'date is not a valid string'),
+        ('comment', 'comment is not a valid string'),
+    ]
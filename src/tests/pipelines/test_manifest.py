@@ -0,0 +1,73 @@
+from ogs_connectors.pipelines.manifest import (
+    build_manifest, changed_groups, filter_batches_by_groups, filter_rows_by_groups, hash_row, row_group_key,
+    stream_with_manifest
+)
+from ogs_connectors.pipelines.staging_table import StagingColumns
+
+
+def staging_row(country: str = 'FRA', year: int = 2000, gas: str = 'CO2', value: float = 1.0) -> dict:
+    return {
+        'data_source': {'name': 'gcp'},
+        'geo_component': {'scale': 'Country', 'identifier': {'id': country, 'type': 'alpha3'}},
+        'date': '%s-01-01' % year,
+        'emission': {'gas': gas, 'value': value},
+    }
+
+
+ROWS = [staging_row('FRA', 2000, 'CO2'), staging_row('FRA', 2000, 'CH4'), staging_row('DEU', 2000)]
+
+
+def test_hash_row():
+    row = staging_row()
+    reordered_row = {key: row[key] for key in reversed(list(row))}
+    assert hash_row(reordered_row) == hash_row(row)
+    assert hash_row(staging_row(value=2.0)) != hash_row(row)
+
+
+def test_build_manifest():
+    manifest = build_manifest(ROWS)
+
+    assert manifest['count'] == 3
+    assert manifest['identifier_types'] == ['alpha3']
+    assert manifest['data_sources'] == ['gcp']
+    assert sorted(manifest['groups']) == ['alpha3:DEU/2000-01-01', 'alpha3:FRA/2000-01-01']
+    # Independent of the rows order
+    assert build_manifest(reversed(ROWS)) == manifest
+
+
+def test_stream_with_manifest():
+    manifest = {}
+    rows = stream_with_manifest(iter(ROWS), manifest)
+
+    # Filled once the rows are consumed
+    assert manifest == {}
+    assert list(rows) == ROWS
+    assert manifest == build_manifest(ROWS)
+
+
+def test_changed_groups():
+    manifest = build_manifest(ROWS)
+    changed_rows = [ROWS[0], staging_row('FRA', 2000, 'CH4', value=2.0), ROWS[2], staging_row('ITA', 2000)]
+    changed_manifest = build_manifest(changed_rows)
+
+    assert changed_groups(manifest, None) == set(manifest['groups'])
+    groups = changed_groups(changed_manifest, manifest)
+    assert groups == {'alpha3:FRA/2000-01-01', 'alpha3:ITA/2000-01-01'}
+    assert [row_group_key(row) for row in filter_rows_by_groups(changed_rows, groups)] == [
+        'alpha3:FRA/2000-01-01', 'alpha3:FRA/2000-01-01', 'alpha3:ITA/2000-01-01'
+    ]
+
+
+def test_filter_batches_by_groups():
+    groups = {'alpha3:FRA/2000-01-01', 'alpha3:ITA/2000-01-01'}
+    rows = [staging_row('FRA'), staging_row('DEU'), staging_row('ITA'), staging_row('DEU', 2001)]
+    expected_rows = list(filter_rows_by_groups(rows, groups))
+
+    batches = list(filter_batches_by_groups([rows[:2], rows[2:], rows[3:]], groups))
+    assert batches == [[rows[0]], [rows[2]]]
+
+    # Columnar batches are filtered column by column
+    columns = [StagingColumns.from_records(rows[:3]), StagingColumns.from_records(rows[3:])]
+    batches = list(filter_batches_by_groups(columns, groups))
+    assert all(isinstance(batch, StagingColumns) for batch in batches)
+    assert [row for batch in batches for row in batch] == expected_rows
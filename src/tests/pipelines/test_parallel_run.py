@@ -0,0 +1,100 @@
+"""
+The gcp and wri_unfccc pipelines run in the same ParallelRunner run, one process per source, as in the all pipeline
+"""
+import os
+
+import pytest
+from kedro.pipeline import Pipeline, node
+from kedro.runner import ParallelRunner
+
+from ogs_connectors.pipeline_registry import register_pipelines
+from ogs_connectors.pipelines.gcp.pipeline import create_pipeline as create_gcp_pipeline
+from ogs_connectors.pipelines.wri_unfccc.pipeline import create_pipeline as create_wri_unfccc_pipeline
+from ogs_connectors.runner import HybridRunner, IO_BOUND_TAG, SequentialRunner
+
+
+@pytest.fixture
+def pipeline():
+    return create_gcp_pipeline() + create_wri_unfccc_pipeline()
+
+
+def test_sources_run_concurrently(pipeline, sources):
+    # Both source nodes are ready at the start of the run: the runner can give each one its process
+    assert len(pipeline.grouped_nodes) == 1
+    assert {node.name for node in pipeline.grouped_nodes[0]} == {
+        '%s_fused_connector' % source for source in sources
+    }
+    assert ParallelRunner(max_workers=2)._get_required_workers_count(pipeline) == 2
+
+
+def test_parallel_run(pipeline, catalog_factory, outputs_reader, tmp_path):
+    sequential_path = tmp_path / 'sequential'
+    parallel_path = tmp_path / 'parallel'
+
+    SequentialRunner().run(pipeline, catalog_factory(sequential_path))
+    # Fails if a node function or a dataset cannot be pickled
+    ParallelRunner(max_workers=2).run(pipeline, catalog_factory(parallel_path))
+
+    sequential_outputs = outputs_reader(sequential_path)
+    assert any(name.startswith('staging/gcp/') for name in sequential_outputs)
+    assert any(name.startswith('staging/wri_unfccc/') for name in sequential_outputs)
+    assert outputs_reader(parallel_path) == sequential_outputs
+
+
+def test_parallel_unfused_run(catalog_factory, outputs_reader, tmp_path):
+    pipelines = register_pipelines()
+    pipeline = pipelines['gcp_unfused'] + pipelines['wri_unfccc_unfused']
+    sequential_path = tmp_path / 'sequential'
+    parallel_path = tmp_path / 'parallel'
+
+    # Intermediate datasets (e.g. gcp_mapped) are not in the catalog: each runner creates them
+    SequentialRunner().run(pipeline, catalog_factory(sequential_path))
+    # The ParallelRunner rejects MemoryDataSets as node outputs
+    ParallelRunner(max_workers=2).run(pipeline, catalog_factory(parallel_path))
+
+    sequential_outputs = outputs_reader(sequential_path)
+    staging_partitions = {
+        'gcp/year=1990', 'gcp/year=2000',
+        'wri_unfccc/year=1990/gas=CH4', 'wri_unfccc/year=1990/gas=CO2', 'wri_unfccc/year=1990/gas=N2O',
+        'wri_unfccc/year=2000/gas=CO2', 'wri_unfccc/year=2000/gas=N2O'
+    }
+    assert {name[len('staging/'):-len('/data.json')] for name in sequential_outputs
+            if name.startswith('staging/')} == staging_partitions
+    assert {name[len('staging_manifest/'):-len('/data.json')] for name in sequential_outputs
+            if name.startswith('staging_manifest/')} == staging_partitions
+    # Every row passes the strict validation: the quarantine outputs are saved, and empty
+    assert sequential_outputs['gcp_quarantine.json'] == ''
+    assert sequential_outputs['wri_unfccc_quarantine.json'] == ''
+    assert outputs_reader(parallel_path) == sequential_outputs
+
+
+def test_all_pipeline(sources):
+    pipeline = register_pipelines()['all']
+
+    # Connectors run concurrently, then mongodb_write once the staging partitions of its sources are saved
+    assert len(pipeline.grouped_nodes) == 2
+    assert [node.name for node in pipeline.grouped_nodes[1]] == ['mongodb_write']
+    assert {'%s_fused_connector' % source for source in sources} <= {
+        node.name for node in pipeline.grouped_nodes[0]
+    }
+
+
+def process_id(*inputs) -> int:
+    return os.getpid()
+
+
+def test_hybrid_run(pipeline, catalog_factory, outputs_reader, tmp_path):
+    sequential_path = tmp_path / 'sequential'
+    hybrid_path = tmp_path / 'hybrid'
+    pid_nodes = Pipeline([
+        node(process_id, 'gcp_partitions_manifest', 'mapping_pid', name='mapping'),
+        node(process_id, 'wri_unfccc_partitions_manifest', 'writing_pid', name='writing', tags=IO_BOUND_TAG)
+    ])
+
+    SequentialRunner().run(pipeline, catalog_factory(sequential_path))
+    outputs = HybridRunner(max_workers=2).run(pipeline + pid_nodes, catalog_factory(hybrid_path))
+
+    # io_bound nodes run in threads of the main process, the others in processes
+    assert outputs['writing_pid'] == os.getpid()
+    assert outputs['mapping_pid'] != os.getpid()
+    assert outputs_reader(hybrid_path) == outputs_reader(sequential_path)
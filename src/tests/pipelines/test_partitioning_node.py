@@ -0,0 +1,63 @@
+import weakref
+
+from ogs_connectors.pipelines.partitioning_node import PartitionFunction, ManifestPartitionFunction
+
+KEYS = ['gcp', {'$year': 'date'}, {'$field': 'emission.gas', 'name': 'gas'}]
+
+
+class Record(dict):
+    """
+    Staging record that can be weakly referenced, to follow how long records are held in memory
+    """
+
+
+def staging_record(year: int, gas: str, value: float) -> Record:
+    return Record({
+        'data_source': {'name': 'gcp'},
+        'geo_component': {'scale': 'country', 'identifier': {'type': 'alpha3', 'id': 'FRA'}},
+        'date': '%s-01-01' % year,
+        'emission': {'gas': gas, 'value': value},
+    })
+
+
+def test_partition_records():
+    records = [staging_record(1990, 'CO2', 1.0), staging_record(1990, 'CH4', 2.0), staging_record(1990, 'CO2', 3.0)]
+    partitions = PartitionFunction(KEYS)(records)
+
+    assert partitions == {
+        'gcp/year=1990/gas=CO2/data.json': [records[0], records[2]],
+        'gcp/year=1990/gas=CH4/data.json': [records[1]],
+    }
+
+
+def test_streamed_records_spilled():
+    references = []
+    peak = 0
+
+    def stream():
+        nonlocal peak
+        for i in range(1000):
+            peak = max(peak, sum(reference() is not None for reference in references))
+            record = staging_record(1950 + i % 25, ['CO2', 'CH4'][i // 25 % 2], float(i))
+            references.append(weakref.ref(record))
+            yield [record]
+
+    partitions = PartitionFunction(KEYS, spill_max_records=20)(stream())
+
+    # 50 partitions, but at most 20 records held in memory, whatever their partition (and the current record)
+    assert len(partitions) == 50
+    assert 0 < peak <= 20 + 1
+    records = list(partitions['gcp/year=1951/gas=CO2/data.json']())
+    assert [record['emission']['value'] for record in records] == [
+        float(i) for i in range(1000) if i % 25 == 1 and i // 25 % 2 == 0
+    ]
+
+
+def test_streamed_manifests():
+    records = [staging_record(1990 + i % 3, 'CO2', float(i)) for i in range(10)]
+    partitions, manifests = ManifestPartitionFunction(KEYS[:2], spill_max_records=2)(iter([records]))
+    expected_partitions, expected_manifests = ManifestPartitionFunction(KEYS[:2])(records)
+
+    # Manifests of streamed partitions are built while the partitions are consumed
+    assert {key: list(partition) for key, partition in partitions.items()} == expected_partitions
+    assert manifests == expected_manifests
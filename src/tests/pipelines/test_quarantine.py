@@ -0,0 +1,33 @@
+import logging
+
+from ogs_connectors.pipelines.quarantine import (
+    COLUMN_VALIDATION_ERROR, SCHEMA_VALIDATION_ERROR, log_rejected_rows, quarantine_record, summarize_rejected_rows
+)
+
+REJECTED_ROWS = [
+    quarantine_record({'Year': 1990}, COLUMN_VALIDATION_ERROR, 'emission.value', 'emission.value is not a number'),
+    quarantine_record({'Year': 1991}, COLUMN_VALIDATION_ERROR, 'emission.value', 'emission.value is not a number'),
+    quarantine_record({'Year': 1992}, SCHEMA_VALIDATION_ERROR, message="'date' is a required property"),
+]
+
+
+def test_summarize_rejected_rows():
+    assert REJECTED_ROWS[2] == {
+        'reason': SCHEMA_VALIDATION_ERROR, 'path': None, 'message': "'date' is a required property",
+        'row': {'Year': 1992}
+    }
+    assert summarize_rejected_rows(REJECTED_ROWS, max_examples=2) == {
+        'count': 3,
+        'errors': {'column_validation:emission.value': 2, 'schema_validation': 1},
+        'examples': ['emission.value is not a number', 'emission.value is not a number'],
+    }
+
+
+def test_log_rejected_rows(caplog):
+    with caplog.at_level(logging.WARNING):
+        log_rejected_rows([], total=10)
+        log_rejected_rows(REJECTED_ROWS, total=10)
+
+    # A single summary for all the rejected rows
+    assert len(caplog.records) == 1
+    assert 'Rejected 3 rows (Out of 10)' in caplog.records[0].getMessage()
@@ -0,0 +1,108 @@
+"""
+Records built column by column (build_records) are those the former DataFrame.apply(row_mapping) built, for each
+connector
+"""
+import datetime
+
+import pandas as pd
+import pytest
+
+from ogs_connectors.pipelines.ademe.mapping import record_template as ademe_record_template
+from ogs_connectors.pipelines.connector_spec import Connector
+from ogs_connectors.pipelines.gcp.pipeline import connector_spec as gcp_spec
+from ogs_connectors.pipelines.records import Column, build_records, build_record_batches
+from ogs_connectors.pipelines.wri_unfccc.pipeline import connector_spec as wri_unfccc_spec
+
+from tests.conftest import gcp_source, wri_unfccc_source
+
+
+def year_date(year) -> str:
+    return datetime.datetime(year, 1, 1).strftime('%Y-%m-%d')
+
+
+def gcp_row_mapping(row):
+    return {
+        'data_source': {'name': 'gcp', 'link': 'https://www.globalcarbonproject.org/carbonbudget/20/data.html'},
+        'geo_component': {'scale': 'Country', 'identifier': {'id': row['country_alpha-3'], 'type': 'alpha3'}},
+        'date': year_date(row['Year']),
+        'emission': {
+            'gas': 'CO2',
+            'value': row['value'],
+            'unit': {'unit_used': 'MtC'},
+            'sector': {
+                'sector_origin_name': row['sector'],
+                'sector_mapped_name': gcp_spec['lookups']['sectors'][row['sector']]
+            }
+        }
+    }
+
+
+def wri_unfccc_row_mapping(row):
+    return {
+        'data_source': {
+            'name': 'wri-unfccc',
+            'link': 'https://www.climatewatchdata.org/',
+            'properties': {'scenario': row['source']}
+        },
+        'geo_component': {'scale': 'Country', 'identifier': {'id': row['country'], 'type': 'alpha3'}},
+        'date': year_date(row['year']),
+        'emission': {
+            'gas': wri_unfccc_spec['lookups']['gases'][row['gas']],
+            'value': row['value'],
+            'unit': {'unit_used': 'Mt co2eq'},
+            'sector': {
+                'sector_origin_name': row['sector'],
+                'sector_mapped_name': wri_unfccc_spec['lookups']['sectors'][row['sector']]
+            }
+        }
+    }
+
+
+def ademe_row_mapping(row):
+    return {
+        'data_source:': {'name': 'ademe', 'link': 'url'},
+        'geo_component': {'type': 'Country', 'iso_code': {'code': 'FRA', 'type': 'alpha2'}},
+        'date': year_date(row['reporting_year']),
+        'emission': {
+            'gas': row['gas'],
+            'value': row['value'],
+            'unit': 'tone',
+            'sector_name': row['scope_label'],
+            'sub_sector_name': row['label']
+        }
+    }
+
+
+def ademe_melt() -> pd.DataFrame:
+    return pd.DataFrame({
+        'reporting_year': [2011, 2011, 2016],
+        'scope_label': ['Scope 1', 'Scope 2', 'Scope 1'],
+        'label': ['Fixed sources', 'Electricity', 'Mobile sources'],
+        'gas': ['co2', 'ch4', 'total'],
+        'value': [12.5, 0.25, 40.0]
+    })
+
+
+@pytest.mark.parametrize('df, row_mapping, template', [
+    (Connector(gcp_spec).transform(gcp_source()), gcp_row_mapping, Connector(gcp_spec).record_template),
+    (Connector(wri_unfccc_spec).transform(wri_unfccc_source()), wri_unfccc_row_mapping,
+     Connector(wri_unfccc_spec).record_template),
+    (ademe_melt(), ademe_row_mapping, ademe_record_template)
+], ids=['gcp', 'wri_unfccc', 'ademe'])
+def test_build_records(df, row_mapping, template):
+    expected = df.apply(row_mapping, axis=1).to_list()
+
+    assert len(expected) > 1
+    assert build_records(df, template) == expected
+    assert [record for batch in build_record_batches(df, template, 2) for record in batch] == expected
+
+
+def test_template_constants():
+    template = {'name': {"'); __import__('os').system('true'); ('": Column('name')}, 'tags': ['staging']}
+    records = build_records(pd.DataFrame({'name': ['a', 'b']}), template)
+
+    # Keys are never evaluated, and records do not share mutable constants
+    assert records[0]['name'] == {"'); __import__('os').system('true'); ('": 'a'}
+    records[0]['tags'].append('updated')
+    assert records[1]['tags'] == ['staging']
+    assert template['tags'] == ['staging']
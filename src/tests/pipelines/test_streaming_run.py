@@ -0,0 +1,23 @@
+"""
+Streamed runs, records going through the pipelines by batches, write the same staging outputs as runs passing whole
+lists of records
+"""
+from ogs_connectors.pipeline_registry import register_pipelines
+from ogs_connectors.runner import SequentialRunner
+
+
+def test_streaming_run(catalog_factory, outputs_reader, tmp_path):
+    pipelines = register_pipelines()
+    unfused_pipeline = pipelines['gcp_unfused'] + pipelines['wri_unfccc_unfused']
+    fused_pipeline = pipelines['gcp'] + pipelines['wri_unfccc']
+
+    SequentialRunner().run(unfused_pipeline, catalog_factory(tmp_path / 'batch', streaming=False))
+    SequentialRunner().run(unfused_pipeline, catalog_factory(tmp_path / 'streaming', streaming=True))
+    # Fused connectors always stream
+    SequentialRunner().run(fused_pipeline, catalog_factory(tmp_path / 'fused', streaming=False))
+
+    batch_outputs = outputs_reader(tmp_path / 'batch')
+    assert any(name.startswith('staging/gcp/') for name in batch_outputs)
+    assert any(name.startswith('staging_manifest/wri_unfccc/') for name in batch_outputs)
+    assert outputs_reader(tmp_path / 'streaming') == batch_outputs
+    assert outputs_reader(tmp_path / 'fused') == batch_outputs
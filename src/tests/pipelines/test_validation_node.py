@@ -0,0 +1,18 @@
+from ogs_connectors.pipelines.validation_node import validate_rows
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {'value': {'type': 'number'}},
+    'required': ['value']
+}
+
+
+def test_parallel_validation():
+    rows = [{'id': i, 'value': i} if i % 7 else {'id': i, 'value': str(i)} for i in range(100)]
+    sequential = validate_rows(rows, SCHEMA, {'strict': True, 'workers': 1, 'chunk_size': 8})
+    parallel = validate_rows(rows, SCHEMA, {'strict': True, 'workers': 3, 'chunk_size': 8})
+
+    # Same valid rows and quarantine records, in the rows order
+    assert parallel == sequential
+    assert [row['id'] for row in parallel[0]] == [i for i in range(100) if i % 7]
+    assert len(parallel[1]) == 15
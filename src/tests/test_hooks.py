@@ -0,0 +1,138 @@
+"""
+Nodes whose function and inputs did not change are skipped by NodeMemoizationHooks, and nodes mutating their inputs
+are caught by InputMutationGuardHooks
+"""
+import pytest
+from kedro.framework.hooks import get_hook_manager
+from kedro.io import DataCatalog, MemoryDataSet
+from kedro.pipeline import Pipeline, node
+from kedro.runner import SequentialRunner
+
+from ogs_connectors.hooks import InputMutationGuardHooks, NodeMemoizationHooks, SIDE_EFFECT_TAG
+from ogs_connectors.pipeline_registry import register_pipelines
+from ogs_connectors.pipelines.connector_spec import FusedConnector
+from ogs_connectors.pipelines.gcp.pipeline import create_pipeline as create_gcp_pipeline
+from ogs_connectors.runner import SequentialRunner as ProjectSequentialRunner
+
+
+@pytest.fixture
+def memoization_hooks(tmp_path):
+    hooks = NodeMemoizationHooks(cache_dir=str(tmp_path / 'cache'))
+    hook_manager = get_hook_manager()
+    hook_manager.register(hooks)
+    yield hooks
+    hook_manager.unregister(hooks)
+
+
+@pytest.fixture
+def connector_calls(monkeypatch):
+    calls = []
+    call = FusedConnector.__call__
+
+    def counted_call(self, *args, **kwargs):
+        calls.append(self.connector.name)
+        return call(self, *args, **kwargs)
+
+    monkeypatch.setattr(FusedConnector, '__call__', counted_call)
+    return calls
+
+
+def test_node_memoization(memoization_hooks, connector_calls, catalog_factory, outputs_reader, tmp_path):
+    pipeline = create_gcp_pipeline()
+    output_path = tmp_path / 'output'
+
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    outputs = outputs_reader(output_path)
+    assert len(connector_calls) == 1
+
+    # Unchanged inputs: skipped, outputs kept
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    assert len(connector_calls) == 1
+    assert outputs_reader(output_path) == outputs
+
+    # Changed parameters: run again
+    catalog = catalog_factory(output_path)
+    catalog.add('params:gcp_validation', MemoryDataSet({'strict': False}), replace=True)
+    SequentialRunner().run(pipeline, catalog)
+    assert len(connector_calls) == 2
+
+
+def test_deleted_outputs(memoization_hooks, connector_calls, catalog_factory, outputs_reader, tmp_path):
+    pipeline = create_gcp_pipeline()
+    output_path = tmp_path / 'output'
+
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    outputs = outputs_reader(output_path)
+    for path in (output_path / 'staging').rglob('*.json'):
+        path.unlink()
+
+    # Partitions are not cached: the node runs again to write them
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    assert len(connector_calls) == 2
+    assert outputs_reader(output_path) == outputs
+
+
+def test_deleted_partition(memoization_hooks, connector_calls, catalog_factory, outputs_reader, tmp_path):
+    pipeline = create_gcp_pipeline()
+    output_path = tmp_path / 'output'
+
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    outputs = outputs_reader(output_path)
+    partitions = sorted((output_path / 'staging').rglob('*.json'))
+    assert len(partitions) > 1
+    partitions[0].unlink()
+
+    # Every partition saved by the node is checked, not only the dataset
+    SequentialRunner().run(pipeline, catalog_factory(output_path))
+    assert len(connector_calls) == 2
+    assert outputs_reader(output_path) == outputs
+
+
+WRITES = []
+
+
+def write(value):
+    WRITES.append(value)
+    return value
+
+
+def test_side_effect_nodes(memoization_hooks):
+    pipeline = Pipeline([
+        node(write, 'value', 'copy', name='copy'),
+        node(write, 'value', 'written', name='write', tags=SIDE_EFFECT_TAG),
+    ])
+    for _ in range(2):
+        SequentialRunner().run(pipeline, DataCatalog({
+            'value': MemoryDataSet(1), 'copy': MemoryDataSet(), 'written': MemoryDataSet()
+        }))
+
+    # The untagged node is skipped on the second run, the write always runs
+    assert len(WRITES) == 3
+
+
+@pytest.fixture
+def input_mutation_guard():
+    hooks = InputMutationGuardHooks()
+    hook_manager = get_hook_manager()
+    hook_manager.register(hooks)
+    yield hooks
+    hook_manager.unregister(hooks)
+
+
+def test_input_mutation_guard(input_mutation_guard, catalog_factory, outputs_reader, tmp_path):
+    pipelines = register_pipelines()
+    pipeline = pipelines['gcp_unfused'] + pipelines['wri_unfccc_unfused']
+
+    # Intermediate datasets are not copied: no node of the connectors mutates its inputs
+    ProjectSequentialRunner().run(pipeline, catalog_factory(tmp_path / 'output'))
+    assert any(name.startswith('staging/gcp/') for name in outputs_reader(tmp_path / 'output'))
+
+    def add_total(records):
+        records.append({'total': sum(record['value'] for record in records)})
+        return records
+
+    catalog = DataCatalog({'records': MemoryDataSet([{'value': 1.0}, {'value': 2.0}])})
+    with pytest.raises(RuntimeError, match="add_total mutated its inputs: \\['records'\\]"):
+        ProjectSequentialRunner().run(
+            Pipeline([node(add_total, 'records', 'total_records', name='add_total')]), catalog
+        )